@@ -3,6 +3,10 @@ from flask_sqlalchemy import SQLAlchemy
 from .config import Config
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
+from .utils.cache_candidats import CacheCandidats
+from .utils.dumps_candidats import DumpsCandidats
+from .utils.compteur_requetes import activer_compteur_requetes
+from .utils.metriques import activer_metriques
 
 app = Flask(
     __name__, 
@@ -19,5 +23,31 @@ login.login_message = "Vous devez être connecté pour afficher cette page."
 csrf = CSRFProtect(app)
 csrf.init_app(app)
 
+# Nombre et durée des requêtes SQL par requête HTTP (en-têtes X-Requetes-SQL et X-Duree-SQL-ms),
+# détection des requêtes répétées (N+1) et budgets de requêtes des routes
+activer_compteur_requetes(app)
+
+# Durées par route et par phase (bases de données, appels HTTP sortants, prétraitement, rendu), exposées sur /metrics
+activer_metriques(app, db)
+
+cache_candidats = CacheCandidats(
+    ttl_secondes=app.config['CACHE_CANDIDATS_TTL_MINUTES'] * 60,
+    taille_max=app.config['CACHE_CANDIDATS_TAILLE_MAX']
+)
+
+# Dumps locaux des entités Wikidata des candidats (désactivés si le dossier n'est pas configuré)
+dumps_candidats = None
+if app.config['DOSSIER_DUMPS_CANDIDATS']:
+    dumps_candidats = DumpsCandidats(
+        dossier_dumps=app.config['DOSSIER_DUMPS_CANDIDATS'],
+        fichier_labels=app.config['FICHIER_LABELS_ENTITES']
+    )
+
 from .routes import generales, validation
-#ne pas oublier d'ajouter les autres .py de /routes lorsque complétés
\ No newline at end of file
+#ne pas oublier d'ajouter les autres .py de /routes lorsque complétés
+from . import commandes
+from .utils.balayage_verrous import demarrer_balayage_verrous
+
+# Nettoyage périodique des verrous expirés des entités TMS
+if app.config['BALAYAGE_VERROUS_MINUTES'] > 0:
+    demarrer_balayage_verrous(app, app.config['BALAYAGE_VERROUS_MINUTES'])
@@ -0,0 +1,67 @@
+import click
+
+from .app import app, dumps_candidats
+from .models.base_principale import TableTMS, StatistiquesDomaines
+from .utils.balayage_verrous import liberer_verrous_expires
+from .utils.details_candidats import remplir_details_candidats
+from .utils.migrations import appliquer_migrations
+from .utils.verification_index import verifier_index
+
+
+@app.cli.command("calculer-priorites")
+@click.option("--tms-id", "tms_ids", type=int, multiple=True,
+              help="Identifiant d'une entité TMS à recalculer (option répétable, toutes les entités par défaut).")
+def calculer_priorites(tms_ids):
+    """Recalcule les priorités de la file de validation (table_tms.priorite_max_flag et priorite_moyenne)."""
+    succes, message = TableTMS.calculer_priorites(list(tms_ids) or None)
+    click.echo(message)
+    if not succes:
+        raise SystemExit(1)
+
+
+@app.cli.command("liberer-verrous")
+def liberer_verrous():
+    """Supprime les verrous des entités TMS expirés (antérieurs à TIMER_INACTIVITE_MINUTES)."""
+    succes, message = liberer_verrous_expires(app)
+    click.echo(message)
+    if not succes:
+        raise SystemExit(1)
+
+
+@app.cli.command("reconstruire-statistiques")
+def reconstruire_statistiques():
+    """Recalcule les statistiques par domaine et par statut de la page /preferences à partir de table_tms."""
+    succes, message = StatistiquesDomaines.reconstruire()
+    click.echo(message)
+    if not succes:
+        raise SystemExit(1)
+
+
+@app.cli.command("migrer")
+def migrer():
+    """Applique les migrations du dossier migrations qui ne l'ont pas encore été (table schema_migrations)."""
+    succes, message, _ = appliquer_migrations()
+    click.echo(message)
+    if not succes:
+        raise SystemExit(1)
+
+
+@app.cli.command("verifier-index")
+def verifier_index_requetes():
+    """Vérifie avec EXPLAIN que les requêtes principales de l'application utilisent leurs index."""
+    succes, rapport = verifier_index()
+    for ligne in rapport:
+        click.echo(ligne)
+    if not succes:
+        raise SystemExit(1)
+
+
+@app.cli.command("remplir-details-candidats")
+@click.option("--age-max-jours", type=int, default=None,
+              help="Actualise aussi les données plus anciennes que ce nombre de jours (par défaut, seuls les candidats sans données).")
+def remplir_details(age_max_jours):
+    """Remplit la table candidats_details des données Wikidata précalculées des candidats (dumps locaux, sinon SPARQL)."""
+    succes, message = remplir_details_candidats(age_max_jours=age_max_jours, dumps=dumps_candidats)
+    click.echo(message)
+    if not succes:
+        raise SystemExit(1)
@@ -20,4 +20,15 @@ class Config():
             minutes=int(os.environ.get("PERMANENT_SESSION_LIFETIME_MINUTES"))
         )
     SESSION_PERMANENT = os.environ.get("SESSION_PERMANENT")
-
+    CACHE_CANDIDATS_TTL_MINUTES = int(os.environ.get("CACHE_CANDIDATS_TTL_MINUTES", 60)) # durée de vie des données Wikidata des candidats en cache
+    CACHE_CANDIDATS_TAILLE_MAX = int(os.environ.get("CACHE_CANDIDATS_TAILLE_MAX", 5000)) # nombre maximal de candidats conservés en cache
+    SPARQL_ENDPOINT = os.environ.get("SPARQL_ENDPOINT", "https://query.wikidata.org/sparql") # point d'accès SPARQL des données des candidats (point d'accès factice pour les tests de charge)
+    DOSSIER_DUMPS_CANDIDATS = os.environ.get("DOSSIER_DUMPS_CANDIDATS") # dossier json_full_dump_entites des entités Wikidata des candidats
+    FICHIER_LABELS_ENTITES = os.environ.get("FICHIER_LABELS_ENTITES") # fichier JSON des labels des entités référencées par les candidats
+    PRECHARGEMENT_ENTITE_SUIVANTE = os.environ.get("PRECHARGEMENT_ENTITE_SUIVANTE", "True") == "True" # préchargement en arrière-plan des candidats de la prochaine entité
+    BALAYAGE_VERROUS_MINUTES = int(os.environ.get("BALAYAGE_VERROUS_MINUTES", 5)) # intervalle du nettoyage des verrous expirés (0 pour le désactiver)
+    INTERVALLE_MAINTIEN_VERROU_SECONDES = int(os.environ.get("INTERVALLE_MAINTIEN_VERROU_SECONDES", 60)) # intervalle minimal entre deux prolongations du verrou depuis la page de validation
+    TAILLE_BAIL_ENTITES = int(os.environ.get("TAILLE_BAIL_ENTITES", 5)) # nombre d'entités TMS verrouillées à la fois pour un utilisateur
+    TAILLE_MAX_LOT_DECISIONS = int(os.environ.get("TAILLE_MAX_LOT_DECISIONS", 100)) # nombre maximal de décisions par requête de /validation/decisions
+    SEUIL_REQUETES_REPETEES = int(os.environ.get("SEUIL_REQUETES_REPETEES", 5)) # nombre d'exécutions d'une même requête SQL signalé comme N+1 probable (0 pour désactiver)
+    METRIQUES_JETON = os.environ.get("METRIQUES_JETON") # jeton attendu sur /metrics (en-tête Authorization: Bearer), route désactivée (404) si absent
@@ -1,8 +1,22 @@
 from ..app import app, db, login
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
-from sqlalchemy import Column, Text, text
-from sqlalchemy.dialects.postgresql import JSON, JSONB
+from sqlalchemy import Column, Text, text, or_, func, cast, case, select, insert, update, delete, literal, exists, Numeric
+from sqlalchemy.dialects.postgresql import JSON, JSONB, insert as pg_insert
+
+# Clé du verrou consultatif Postgres réservé au nettoyage des verrous expirés (TableTMS.liberer_verrous_expires)
+CLE_VERROU_BALAYAGE = 2_040_001
+
+# Statut de validation appliqué à l'entité TMS pour chaque décision (None = statut inchangé)
+STATUTS_DECISIONS = {"valider": "aligne", "refuser": "non_aligne", "passer": None}
+# Action enregistrée dans l'historique pour chaque candidat (décision "valider" : "valide" ou "refuse" selon la sélection)
+ACTIONS_DECISIONS = {"refuser": "refuse", "passer": "passe"}
+
+# Statistiques par domaine (StatistiquesDomaines) : statut des entités sans statut_validation,
+# domaine des entités sans dossiers_documentation et libellés des statuts affichés sur /preferences
+STATUT_A_TRAITER = "a_traiter"
+DOMAINE_AUTRES = "autres"
+LIBELLES_STATUTS = {"a_traiter": "A traiter", "aligne": "Aligné", "non_aligne": "Non aligné"}
 
 class TableTMS(db.Model):
     """
@@ -23,6 +37,10 @@ class TableTMS(db.Model):
         Date et heure du verrouillage de l'entité TMS.
     dossiers_documentation : sqlalchemy.sql.schema.Column
         Dossiers de documentation associés à l'entité TMS (au format JSONB).
+    priorite_max_flag : sqlalchemy.sql.schema.Column
+        score_flag maximal (entre -5 et 5) des candidats de l'entité TMS, utilisé pour l'ordre de la file de validation.
+    priorite_moyenne : sqlalchemy.sql.schema.Column
+        Moyenne des score_flag des candidats de l'entité TMS, utilisée pour départager les entités de même priorite_max_flag.
     """
     __tablename__ = "table_tms"
     tms_id = db.Column(db.Integer, primary_key=True, nullable=False)
@@ -32,6 +50,8 @@ class TableTMS(db.Model):
     verrouille_par = db.Column(db.Integer, db.ForeignKey('utilisateurs.id_utilisateur'), nullable=True)
     date_heure_verrouillage = db.Column(db.DateTime, nullable=True)
     dossiers_documentation =db.Column(JSONB, nullable=True)
+    priorite_max_flag = db.Column(db.Integer, nullable=True)
+    priorite_moyenne = db.Column(db.Numeric, nullable=True)
 
     # relations 
     utilisateur_verrou = db.relationship("Utilisateurs", backref="tms_verrouilles", foreign_keys=[verrouille_par])
@@ -49,15 +69,13 @@ class TableTMS(db.Model):
             tuple: (success: bool, message: str)
         """
         try:
-            # Récupération de l'entité TMS
-            entite_tms = db.session.query(TableTMS).filter_by(tms_id=tms_id).first()
+            # Mise à jour du statut (et des statistiques par domaine)
+            entite_tms = TableTMS.modifier_entite(tms_id, {'statut_validation': nouveau_statut})
             
-            if not entite_tms:
+            if entite_tms is None:
+                db.session.rollback()
                 return False, "Entité TMS introuvable"
             
-            # Mise à jour du statut
-            entite_tms.statut_validation = nouveau_statut
-            
             # Validation en base
             db.session.commit()
             
@@ -67,6 +85,375 @@ class TableTMS(db.Model):
             db.session.rollback()
             return False, f"Erreur lors du changement de statut : {str(e)}"
 
+    @staticmethod
+    def modifier_entite(tms_id, valeurs, verrouille_par=None):
+        """
+        Met à jour une entité TMS, sans valider la transaction, et répercute un changement
+        de statut de validation sur les statistiques par domaine (StatistiquesDomaines).
+
+        L'ancien statut est lu dans la même requête (UPDATE ... FROM (SELECT ... FOR UPDATE) ... RETURNING).
+
+        Args:
+            tms_id (int): Identifiant de l'entité TMS
+            valeurs (dict): Colonnes à mettre à jour
+            verrouille_par (int): Si renseigné, l'entité n'est modifiée que si elle est verrouillée par cet utilisateur
+
+        Returns:
+            Row: displayname, dossiers_documentation, statut_validation et ancien_statut de l'entité
+            ou None si l'entité est introuvable (ou n'est pas verrouillée par verrouille_par)
+        """
+        conditions = [TableTMS.tms_id == tms_id]
+        if verrouille_par is not None:
+            conditions.append(TableTMS.verrouille_par == verrouille_par)
+
+        ancienne = select(
+            TableTMS.tms_id, TableTMS.statut_validation
+        ).where(
+            *conditions
+        ).with_for_update().subquery("ancienne")
+
+        entite = db.session.execute(
+            update(TableTMS).where(
+                TableTMS.tms_id == ancienne.c.tms_id
+            ).values(**valeurs).returning(
+                TableTMS.displayname,
+                TableTMS.dossiers_documentation,
+                TableTMS.statut_validation,
+                ancienne.c.statut_validation.label("ancien_statut")
+            ).execution_options(synchronize_session=False)
+        ).first()
+
+        if entite is not None and entite.ancien_statut != entite.statut_validation:
+            StatistiquesDomaines.appliquer_changement_statut(
+                entite.dossiers_documentation, entite.ancien_statut, entite.statut_validation
+            )
+        return entite
+
+    @staticmethod
+    def requete_file_validation(id_utilisateur, preferences, seuil, tms_ids_exclus=()):
+        """
+        Construit la requête de la file de validation d'un utilisateur, triée par priorité.
+
+        L'entité ne doit pas avoir de statut de validation, ne doit pas avoir été passée par l'utilisateur,
+        ne doit pas être verrouillée par un autre utilisateur (verrou antérieur au seuil = verrou expiré)
+        et doit respecter les préférences de domaines de l'utilisateur.
+        Les entités sont triées en fonction du score_flag des candidats associés,
+        en priorisant les entités ayant des candidats avec un score_flag de 5, puis 4, etc., jusqu'à -5,
+        puis la moyenne des score_flag de ses candidats (colonnes priorite_max_flag et priorite_moyenne,
+        précalculées par calculer_priorites).
+
+        Args:
+            id_utilisateur (int): Identifiant de l'utilisateur
+            preferences (list): Préférences de domaines de l'utilisateur
+            seuil (datetime): Date et heure avant laquelle un verrou est considéré comme expiré
+            tms_ids_exclus (iterable): Identifiants des entités TMS à ne pas proposer
+
+        Returns:
+            sqlalchemy.orm.Query: Requête sur TableTMS triée par priorité décroissante
+        """
+        filtrer_par_preferences = 'tous' not in preferences
+
+        # TMS déjà passés par l'utilisateur : anti-jointure sur la clé primaire de entites_passees
+        tms_passe = exists().where(
+            EntitesPassees.id_utilisateur == id_utilisateur,
+            EntitesPassees.tms_id == TableTMS.tms_id
+        )
+
+        # Requête principale avec tous les filtres sauf tri
+        query = db.session.query(TableTMS).filter(
+            TableTMS.statut_validation.is_(None),
+            ~tms_passe,
+            or_(
+                TableTMS.verrouille_par.is_(None),
+                TableTMS.date_heure_verrouillage < seuil,
+                TableTMS.verrouille_par == id_utilisateur
+            )
+        )
+
+        if tms_ids_exclus:
+            query = query.filter(~TableTMS.tms_id.in_(list(tms_ids_exclus)))
+
+        if filtrer_par_preferences and preferences:
+            conditions = []
+            prefs_specifiques = [pref for pref in preferences if pref != 'autres']
+            if prefs_specifiques:
+                conditions.extend([
+                    TableTMS.dossiers_documentation.contains([pref]) for pref in prefs_specifiques
+                ])
+            if 'autres' in preferences:
+                conditions.append(TableTMS.dossiers_documentation.is_(None))
+            query = query.filter(or_(*conditions))
+
+        # Tri sur les priorités précalculées (voir calculer_priorites) : parcours de l'index de la file de validation
+        return query.filter(
+            TableTMS.priorite_max_flag.isnot(None)
+        ).order_by(
+            TableTMS.priorite_max_flag.desc(),
+            TableTMS.priorite_moyenne.desc(),
+            TableTMS.tms_id
+        )
+
+    @staticmethod
+    def selectionner_entite(id_utilisateur, preferences, seuil, tms_ids_exclus=()):
+        """
+        Sélectionne, sans la verrouiller, l'entité TMS en tête de la file de validation d'un utilisateur
+        (voir requete_file_validation).
+
+        Args:
+            id_utilisateur (int): Identifiant de l'utilisateur
+            preferences (list): Préférences de domaines de l'utilisateur
+            seuil (datetime): Date et heure avant laquelle un verrou est considéré comme expiré
+            tms_ids_exclus (iterable): Identifiants des entités TMS à ne pas proposer
+
+        Returns:
+            TableTMS: L'entité TMS correspondante ou None si aucune entité ne correspond.
+        """
+        return TableTMS.requete_file_validation(
+            id_utilisateur, preferences, seuil, tms_ids_exclus
+        ).limit(1).first()
+
+    @staticmethod
+    def verrouiller_entite(id_utilisateur, preferences, seuil, date_verrouillage, taille_bail=1):
+        """
+        Retourne l'entité TMS à afficher à un utilisateur en la prenant dans son bail d'entités verrouillées.
+
+        Le bail est l'ensemble des entités verrouillées par l'utilisateur depuis le seuil, avec une échéance
+        commune : tant qu'il n'est pas épuisé, son échéance est prolongée et l'entité de plus haute priorité
+        est servie sans parcourir la file de validation. Sinon, les taille_bail premières entités de la file
+        sont sélectionnées et verrouillées en une seule requête, avec SELECT ... FOR UPDATE SKIP LOCKED :
+        les entités en cours de verrouillage par un autre utilisateur sont ignorées, deux utilisateurs
+        ne peuvent donc pas se voir attribuer la même entité et ne s'attendent pas l'un l'autre.
+        Les entités non traitées sont libérées à la déconnexion (liberer_bail) ou à l'expiration du verrou.
+
+        Args:
+            id_utilisateur (int): Identifiant de l'utilisateur
+            preferences (list): Préférences de domaines de l'utilisateur
+            seuil (datetime): Date et heure avant laquelle un verrou est considéré comme expiré
+            date_verrouillage (datetime): Date et heure du verrouillage
+            taille_bail (int): Nombre d'entités verrouillées à la fois
+
+        Returns:
+            TableTMS: L'entité TMS verrouillée ou None si aucune entité ne correspond.
+        """
+        colonnes_bail = (TableTMS.tms_id, TableTMS.priorite_max_flag, TableTMS.priorite_moyenne)
+        try:
+            # Bail en cours : échéance commune prolongée
+            bail = TableTMS._prolonger_bail(id_utilisateur, seuil, date_verrouillage)
+
+            # Nouveau bail : les premières entités de la file de validation
+            if not bail:
+                tms_ids = TableTMS.requete_file_validation(
+                    id_utilisateur, preferences, seuil
+                ).with_entities(
+                    TableTMS.tms_id
+                ).with_for_update(
+                    skip_locked=True, of=TableTMS
+                ).limit(max(taille_bail, 1)).scalar_subquery()
+
+                bail = db.session.execute(
+                    update(TableTMS).where(
+                        TableTMS.tms_id.in_(tms_ids)
+                    ).values(
+                        verrouille_par=id_utilisateur,
+                        date_heure_verrouillage=date_verrouillage
+                    ).returning(*colonnes_bail).execution_options(synchronize_session=False)
+                ).all()
+
+            db.session.commit()
+            if not bail:
+                return None
+
+            # Même ordre que la file de validation
+            premiere = min(bail, key=lambda ligne: (
+                -(ligne.priorite_max_flag if ligne.priorite_max_flag is not None else -999),
+                -(ligne.priorite_moyenne or 0),
+                ligne.tms_id
+            ))
+            return db.session.get(TableTMS, premiere.tms_id)
+
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def _prolonger_bail(id_utilisateur, seuil, date_verrouillage):
+        """
+        Prolonge, sans valider la transaction, l'échéance commune des entités du bail d'un utilisateur
+        (entités sans statut verrouillées par lui depuis le seuil).
+
+        Args:
+            id_utilisateur (int): Identifiant de l'utilisateur
+            seuil (datetime): Date et heure avant laquelle un verrou est considéré comme expiré
+            date_verrouillage (datetime): Nouvelle date et heure du verrouillage
+
+        Returns:
+            list: Lignes (tms_id, priorite_max_flag, priorite_moyenne) des entités du bail
+        """
+        return db.session.execute(
+            update(TableTMS).where(
+                TableTMS.verrouille_par == id_utilisateur,
+                TableTMS.date_heure_verrouillage >= seuil,
+                TableTMS.statut_validation.is_(None)
+            ).values(
+                date_heure_verrouillage=date_verrouillage
+            ).returning(
+                TableTMS.tms_id, TableTMS.priorite_max_flag, TableTMS.priorite_moyenne
+            ).execution_options(synchronize_session=False)
+        ).all()
+
+    @staticmethod
+    def maintenir_bail(id_utilisateur, seuil, date_verrouillage, tms_id):
+        """
+        Prolonge le bail d'un utilisateur tant qu'il est actif sur la page de validation (route /validation/verrou)
+        et vérifie le verrou de l'entité TMS affichée. Une seule requête UPDATE sur l'index des entités verrouillées
+        (table_tms_bail_idx) et la clé primaire, sans parcours de la file.
+
+        L'entité affichée est verrouillée pour l'utilisateur si elle est libre (jamais verrouillée ou verrou expiré),
+        par exemple lorsqu'elle est affichée par son identifiant (/validation?tms_id=...) après une annulation.
+        Elle n'est pas verrouillée si un autre utilisateur en détient le verrou.
+
+        Args:
+            id_utilisateur (int): Identifiant de l'utilisateur
+            seuil (datetime): Date et heure avant laquelle un verrou est considéré comme expiré
+            date_verrouillage (datetime): Nouvelle date et heure du verrouillage
+            tms_id (int): Identifiant de l'entité TMS affichée
+
+        Returns:
+            tuple: (success: bool, message: str, verrouille: bool), verrouille valant True si l'entité affichée
+            est verrouillée par l'utilisateur
+        """
+        try:
+            tms_ids = db.session.execute(
+                update(TableTMS).where(or_(
+                    # Bail en cours
+                    (TableTMS.verrouille_par == id_utilisateur)
+                    & (TableTMS.date_heure_verrouillage >= seuil)
+                    & TableTMS.statut_validation.is_(None),
+                    # Entité affichée, si elle n'est pas verrouillée par un autre utilisateur
+                    (TableTMS.tms_id == tms_id) & or_(
+                        TableTMS.verrouille_par.is_(None),
+                        TableTMS.verrouille_par == id_utilisateur,
+                        TableTMS.date_heure_verrouillage < seuil
+                    )
+                )).values(
+                    verrouille_par=id_utilisateur,
+                    date_heure_verrouillage=date_verrouillage
+                ).returning(TableTMS.tms_id).execution_options(synchronize_session=False)
+            ).scalars().all()
+            db.session.commit()
+            if tms_id not in tms_ids:
+                return True, f"L'entité TMS {tms_id} est verrouillée par un autre utilisateur", False
+            return True, f"Verrou prolongé pour {len(tms_ids)} entité(s)", True
+        except Exception as e:
+            db.session.rollback()
+            return False, f"Erreur lors de la prolongation du verrou : {str(e)}", False
+
+    @staticmethod
+    def liberer_bail(id_utilisateur):
+        """
+        Libère toutes les entités TMS verrouillées par un utilisateur (déconnexion, changement de préférences).
+
+        Args:
+            id_utilisateur (int): Identifiant de l'utilisateur
+
+        Returns:
+            tuple: (success: bool, message: str)
+        """
+        try:
+            resultat = db.session.execute(
+                update(TableTMS).where(
+                    TableTMS.verrouille_par == id_utilisateur
+                ).values(
+                    verrouille_par=None,
+                    date_heure_verrouillage=None
+                ).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            return True, f"{resultat.rowcount} entité(s) libérée(s)"
+        except Exception as e:
+            db.session.rollback()
+            return False, f"Erreur lors de la libération des entités verrouillées : {str(e)}"
+
+    @staticmethod
+    def calculer_priorites(tms_ids=None):
+        """
+        Recalcule les colonnes priorite_max_flag et priorite_moyenne à partir des score_flag des candidats.
+
+        priorite_max_flag est le score_flag maximal compris entre -5 et 5 (les valeurs d'erreur -999 sont ignorées),
+        priorite_moyenne est la somme des score_flag divisée par le nombre de candidats de l'entité.
+        Une entité sans score_flag valide a une priorite_max_flag nulle et n'est pas proposée à la validation.
+        À lancer après un import ou un recalcul des score_flag (commande flask calculer-priorites).
+
+        Args:
+            tms_ids (list): Identifiants des entités TMS à recalculer (toutes les entités si None)
+
+        Returns:
+            tuple: (success: bool, message: str)
+        """
+        relations = RelationsTMSCandidats.__table__
+        flag_valide = case(
+            (relations.c.score_flag.between(-5, 5), relations.c.score_flag)
+        )
+        max_flag = select(func.max(flag_valide)).where(
+            relations.c.tms_id == TableTMS.tms_id
+        ).scalar_subquery()
+        moyenne = select(
+            cast(func.coalesce(func.sum(relations.c.score_flag), 0), Numeric)
+            / func.nullif(func.count(relations.c.id_match), 0)
+        ).where(
+            relations.c.tms_id == TableTMS.tms_id
+        ).scalar_subquery()
+
+        requete = update(TableTMS).values(priorite_max_flag=max_flag, priorite_moyenne=moyenne)
+        if tms_ids is not None:
+            requete = requete.where(TableTMS.tms_id.in_(list(tms_ids)))
+
+        try:
+            resultat = db.session.execute(requete.execution_options(synchronize_session=False))
+            db.session.commit()
+            return True, f"Priorités recalculées pour {resultat.rowcount} entité(s) TMS"
+        except Exception as e:
+            db.session.rollback()
+            return False, f"Erreur lors du calcul des priorités : {str(e)}"
+
+    @staticmethod
+    def liberer_verrous_expires(seuil):
+        """
+        Supprime les verrous des entités TMS verrouillées avant le seuil.
+
+        Les verrous expirés sont déjà ignorés lors de la sélection des entités (voir requete_file_validation) :
+        ce nettoyage est fait périodiquement en arrière-plan et non plus à chaque affichage de /validation.
+        Un verrou consultatif Postgres (pg_try_advisory_xact_lock) garantit qu'un seul processus
+        de l'application effectue le nettoyage à un instant donné.
+
+        Args:
+            seuil (datetime): Date et heure avant laquelle un verrou est considéré comme expiré
+
+        Returns:
+            tuple: (success: bool, message: str)
+        """
+        try:
+            verrou_obtenu = db.session.execute(
+                text("SELECT pg_try_advisory_xact_lock(:cle)"), {'cle': CLE_VERROU_BALAYAGE}
+            ).scalar()
+            if not verrou_obtenu:
+                db.session.rollback()
+                return True, "Nettoyage des verrous déjà en cours dans un autre processus"
+
+            resultat = db.session.execute(
+                update(TableTMS).where(
+                    TableTMS.date_heure_verrouillage < seuil
+                ).values(
+                    verrouille_par=None,
+                    date_heure_verrouillage=None
+                ).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            return True, f"{resultat.rowcount} verrou(s) expiré(s) supprimé(s)"
+        except Exception as e:
+            db.session.rollback()
+            return False, f"Erreur lors de la suppression des verrous expirés : {str(e)}"
+
 
 class TableCandidats(db.Model):
     """
@@ -91,6 +478,66 @@ class TableCandidats(db.Model):
     nb_id_externes = db.Column(db.Integer, nullable=True)
     label = db.Column(db.Text, nullable=True)
 
+class CandidatsDetails(db.Model):
+    
+    """
+    Une classe pour représenter la table app_alignement.candidats_details.
+    Données Wikidata de chaque candidat, précalculées par la commande remplir-details-candidats
+    au format d'une ligne de résultat des requêtes SPARQL (voir utils/requetes_sparql.py),
+    afin que la page de validation les lise en base au lieu d'interroger Wikidata.
+
+    Attributs
+    ---------
+    qid : sqlalchemy.sql.schema.Column
+        Identifiant Wikidata du candidat (clé primaire, clé étrangère).
+    type_candidat : sqlalchemy.sql.schema.Column
+        Type de requête utilisé pour les données : 'Q5' pour les personnes, 'autres' sinon.
+    donnees : sqlalchemy.sql.schema.Column
+        Données brutes du candidat, à passer à preprocess_candidat_info (JSONB).
+    date_mise_a_jour : sqlalchemy.sql.schema.Column
+        Date et heure de la dernière mise à jour des données.
+    """
+    __tablename__ = "candidats_details"
+
+    qid = db.Column(db.String(20), db.ForeignKey('table_candidats.qid', ondelete="CASCADE"), primary_key=True, nullable=False)
+    type_candidat = db.Column(db.String(20), nullable=False)
+    donnees = db.Column(JSONB, nullable=False)
+    date_mise_a_jour = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+
+    candidat = db.relationship("TableCandidats", backref=db.backref("details", uselist=False, passive_deletes=True))
+
+    @staticmethod
+    def enregistrer(lignes):
+        """
+        Enregistre ou remplace les données d'un lot de candidats en une seule requête
+        (INSERT ... ON CONFLICT DO UPDATE).
+
+        Args:
+            lignes (list): dicts {'qid': str, 'type_candidat': str, 'donnees': dict}
+
+        Returns:
+            tuple: (success: bool, message: str)
+        """
+        if not lignes:
+            return True, "Aucune donnée candidat à enregistrer"
+        try:
+            requete = pg_insert(CandidatsDetails).values(lignes)
+            db.session.execute(
+                requete.on_conflict_do_update(
+                    index_elements=['qid'],
+                    set_={
+                        'type_candidat': requete.excluded.type_candidat,
+                        'donnees': requete.excluded.donnees,
+                        'date_mise_a_jour': func.now()
+                    }
+                )
+            )
+            db.session.commit()
+            return True, f"{len(lignes)} candidat(s) enregistré(s)"
+        except Exception as e:
+            db.session.rollback()
+            return False, f"Erreur lors de l'enregistrement des données candidats : {str(e)}"
+
 class Utilisateurs(UserMixin, db.Model):
     """
     Une classe pour représenter la table app_alignement.utilisateurs.
@@ -235,6 +682,272 @@ class LieuxCandidats(db.Model):
 
     candidat = db.relationship("TableCandidats", backref="lieux")
 
+class StatistiquesDomaines(db.Model):
+    
+    """
+    Une classe pour représenter la table app_alignement.statistiques_domaines.
+    Nombre d'entités TMS par domaine (dossiers_documentation, "autres" si aucun) et par statut de validation,
+    tenu à jour à chaque changement de statut (TableTMS.modifier_entite) pour la page /preferences.
+
+    Attributs
+    ---------
+    domaine : sqlalchemy.sql.schema.Column
+        Domaine de l'entité TMS (clé primaire avec statut).
+    statut : sqlalchemy.sql.schema.Column
+        Statut de validation de l'entité TMS, "a_traiter" si aucun (clé primaire avec domaine).
+    nb_tms : sqlalchemy.sql.schema.Column
+        Nombre d'entités TMS du domaine ayant ce statut.
+    """
+    __tablename__ = "statistiques_domaines"
+
+    domaine = db.Column(db.Text, primary_key=True, nullable=False)
+    statut = db.Column(db.String(20), primary_key=True, nullable=False)
+    nb_tms = db.Column(db.Integer, server_default=text("0"), nullable=False)
+
+    @staticmethod
+    def domaines_entite(dossiers_documentation):
+        """
+        Retourne les domaines comptés pour une entité TMS.
+
+        Args:
+            dossiers_documentation (list): Dossiers de documentation de l'entité TMS
+
+        Returns:
+            list: Domaines sans doublons, ["autres"] si l'entité n'a aucun dossier
+        """
+        if not dossiers_documentation:
+            return [DOMAINE_AUTRES]
+        return list(dict.fromkeys(dossiers_documentation))
+
+    @staticmethod
+    def appliquer_changement_statut(dossiers_documentation, ancien_statut, nouveau_statut):
+        """
+        Répercute le changement de statut d'une entité TMS sur les compteurs, sans valider la transaction
+        (une seule requête INSERT ... ON CONFLICT DO UPDATE pour tous les domaines de l'entité).
+
+        Args:
+            dossiers_documentation (list): Dossiers de documentation de l'entité TMS
+            ancien_statut (str): Statut de validation avant le changement (None si à traiter)
+            nouveau_statut (str): Statut de validation après le changement (None si à traiter)
+        """
+        ancien_statut = ancien_statut or STATUT_A_TRAITER
+        nouveau_statut = nouveau_statut or STATUT_A_TRAITER
+        if ancien_statut == nouveau_statut:
+            return
+
+        lignes = []
+        for domaine in StatistiquesDomaines.domaines_entite(dossiers_documentation):
+            lignes.append({'domaine': domaine, 'statut': ancien_statut, 'nb_tms': -1})
+            lignes.append({'domaine': domaine, 'statut': nouveau_statut, 'nb_tms': 1})
+
+        requete = pg_insert(StatistiquesDomaines).values(lignes)
+        db.session.execute(
+            requete.on_conflict_do_update(
+                index_elements=[StatistiquesDomaines.domaine, StatistiquesDomaines.statut],
+                set_={'nb_tms': StatistiquesDomaines.nb_tms + requete.excluded.nb_tms}
+            )
+        )
+
+    @staticmethod
+    def lire_statistiques():
+        """
+        Retourne les compteurs affichés sur la page /preferences.
+
+        Returns:
+            list: Dictionnaires {type_dossier, statut_libelle, nb_tms_id} triés par domaine et libellé de statut
+        """
+        lignes = db.session.query(StatistiquesDomaines).filter(
+            StatistiquesDomaines.statut.in_(list(LIBELLES_STATUTS)),
+            StatistiquesDomaines.nb_tms > 0
+        ).all()
+
+        stats = [
+            {
+                "type_dossier": ligne.domaine,
+                "statut_libelle": LIBELLES_STATUTS[ligne.statut],
+                "nb_tms_id": ligne.nb_tms
+            }
+            for ligne in lignes
+        ]
+        stats.sort(key=lambda stat: (stat["type_dossier"], stat["statut_libelle"]))
+        return stats
+
+    @staticmethod
+    def reconstruire():
+        """
+        Recalcule tous les compteurs à partir de table_tms, en une seule transaction.
+        À lancer après la création de la table et après toute modification de statut_validation
+        faite en dehors de l'application (commande flask reconstruire-statistiques).
+
+        Returns:
+            tuple: (success: bool, message: str)
+        """
+        try:
+            # Les changements de statut concurrents attendent la fin de la reconstruction
+            db.session.execute(text("LOCK TABLE app_alignement.statistiques_domaines IN EXCLUSIVE MODE"))
+            db.session.execute(text("DELETE FROM app_alignement.statistiques_domaines"))
+            resultat = db.session.execute(text("""
+            INSERT INTO app_alignement.statistiques_domaines (domaine, statut, nb_tms)
+            SELECT domaine, statut, COUNT(DISTINCT tms_id)
+            FROM (
+            SELECT
+                tt.tms_id,
+                doc.value AS domaine,
+                COALESCE(tt.statut_validation, :a_traiter) AS statut
+            FROM app_alignement.table_tms tt,
+                jsonb_array_elements_text(tt.dossiers_documentation::jsonb) AS doc
+            WHERE tt.dossiers_documentation IS NOT NULL
+                AND jsonb_array_length(tt.dossiers_documentation::jsonb) > 0
+
+            UNION ALL
+
+            SELECT
+                tt.tms_id,
+                :autres AS domaine,
+                COALESCE(tt.statut_validation, :a_traiter) AS statut
+            FROM app_alignement.table_tms tt
+            WHERE tt.dossiers_documentation IS NULL
+                OR jsonb_array_length(tt.dossiers_documentation::jsonb) = 0
+            ) AS sub
+            GROUP BY domaine, statut
+            """), {'a_traiter': STATUT_A_TRAITER, 'autres': DOMAINE_AUTRES})
+            db.session.commit()
+            return True, f"Statistiques par domaine reconstruites ({resultat.rowcount} compteur(s))"
+        except Exception as e:
+            db.session.rollback()
+            return False, f"Erreur lors de la reconstruction des statistiques : {str(e)}"
+
+class EntitesPassees(db.Model):
+    
+    """
+    Une classe pour représenter la table app_alignement.entites_passees.
+    Une ligne par entité TMS passée par un utilisateur, ajoutée avec la décision "passer"
+    (Historique.enregistrer_decision) et supprimée à son annulation (Decisions.annuler_decision).
+    Ces entités ne sont plus proposées à l'utilisateur (TableTMS.requete_file_validation).
+
+    Attributs
+    ---------
+    id_utilisateur : sqlalchemy.sql.schema.Column
+        Référence à l'utilisateur (clé primaire avec tms_id, clé étrangère).
+    tms_id : sqlalchemy.sql.schema.Column
+        Référence à l'entité TMS passée (clé primaire avec id_utilisateur, clé étrangère).
+    date_heure_passage : sqlalchemy.sql.schema.Column
+        Date et heure du passage.
+    """
+    __tablename__ = "entites_passees"
+
+    id_utilisateur = db.Column(db.Integer, db.ForeignKey('utilisateurs.id_utilisateur', ondelete="CASCADE"), primary_key=True, nullable=False)
+    tms_id = db.Column(db.Integer, db.ForeignKey('table_tms.tms_id'), primary_key=True, nullable=False)
+    date_heure_passage = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+
+class Decisions(db.Model):
+    
+    """
+    Une classe pour représenter la table app_alignement.decisions.
+    Une ligne par décision (valider, refuser, passer) d'un utilisateur sur une entité TMS,
+    les lignes de l'historique de la décision (une par candidat) y font référence.
+
+    Attributs
+    ---------
+    id_decision : sqlalchemy.sql.schema.Column
+        Identifiant de la décision (clé primaire, croissant avec la date de la décision).
+    id_utilisateur : sqlalchemy.sql.schema.Column
+        Référence à l'utilisateur (clé étrangère).
+    tms_id : sqlalchemy.sql.schema.Column
+        Référence à l'entité TMS concernée (clé étrangère).
+    type_decision : sqlalchemy.sql.schema.Column
+        Type de décision ("valider", "refuser" ou "passer").
+    date_heure_decision : sqlalchemy.sql.schema.Column
+        Date et heure de la décision.
+    nb_valides : sqlalchemy.sql.schema.Column
+        Nombre de candidats validés.
+    nb_refuses : sqlalchemy.sql.schema.Column
+        Nombre de candidats refusés.
+    nb_passes : sqlalchemy.sql.schema.Column
+        Nombre de candidats passés.
+    """
+    __tablename__ = "decisions"
+
+    id_decision = db.Column(db.BigInteger, primary_key=True, autoincrement=True, nullable=False)
+    id_utilisateur = db.Column(db.Integer, db.ForeignKey('utilisateurs.id_utilisateur', ondelete="CASCADE"), nullable=False)
+    tms_id = db.Column(db.Integer, db.ForeignKey('table_tms.tms_id'), nullable=False)
+    type_decision = db.Column(db.String(20), nullable=False)
+    date_heure_decision = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+    nb_valides = db.Column(db.Integer, server_default=text("0"), nullable=False)
+    nb_refuses = db.Column(db.Integer, server_default=text("0"), nullable=False)
+    nb_passes = db.Column(db.Integer, server_default=text("0"), nullable=False)
+
+    utilisateur = db.relationship("Utilisateurs", backref="decisions")
+    tms = db.relationship("TableTMS", backref="decisions")
+
+    @staticmethod
+    def annuler_decision(id_decision, id_utilisateur):
+        """
+        Annule une décision d'un utilisateur.
+
+        La décision est supprimée par une seule requête DELETE ; les lignes de l'historique qui y font
+        référence sont supprimées par la contrainte ON DELETE CASCADE. Si la décision avait changé
+        le statut de validation de l'entité TMS (valider, refuser), ce statut est supprimé ; s'il s'agissait
+        d'un passage, l'entité est retirée des entités passées de l'utilisateur (EntitesPassees).
+
+        Args:
+            id_decision (int): Identifiant de la décision
+            id_utilisateur (int): Identifiant de l'utilisateur (seules ses propres décisions peuvent être annulées)
+
+        Returns:
+            tuple: (success: bool, message: str, tms_id: int)
+        """
+        try:
+            decision = db.session.execute(
+                delete(Decisions).where(
+                    Decisions.id_decision == id_decision,
+                    Decisions.id_utilisateur == id_utilisateur
+                ).returning(
+                    Decisions.tms_id,
+                    Decisions.type_decision,
+                    Decisions.nb_valides,
+                    Decisions.nb_refuses,
+                    Decisions.nb_passes
+                ).execution_options(synchronize_session=False)
+            ).first()
+
+            if decision is None:
+                db.session.rollback()
+                return False, "Aucune décision trouvée à annuler", None
+
+            # Suppression du statut de validation posé par la décision (et mise à jour des statistiques par domaine)
+            if STATUTS_DECISIONS.get(decision.type_decision):
+                TableTMS.modifier_entite(decision.tms_id, {'statut_validation': None})
+
+            # L'entité est de nouveau proposée à l'utilisateur s'il ne l'a pas passée par une autre décision
+            if decision.type_decision == "passer":
+                db.session.execute(
+                    delete(EntitesPassees).where(
+                        EntitesPassees.id_utilisateur == id_utilisateur,
+                        EntitesPassees.tms_id == decision.tms_id,
+                        ~exists().where(
+                            Decisions.id_utilisateur == id_utilisateur,
+                            Decisions.tms_id == decision.tms_id,
+                            Decisions.type_decision == "passer"
+                        )
+                    ).execution_options(synchronize_session=False)
+                )
+
+            db.session.commit()
+
+            # Construire le message de succès
+            details = []
+            for type_action, count in (("valide", decision.nb_valides), ("refuse", decision.nb_refuses), ("passe", decision.nb_passes)):
+                if count:
+                    details.append(f"{count} action(s) '{type_action}'")
+
+            message = f"Annulation réussie pour l'entité TMS {decision.tms_id} : {', '.join(details)}"
+            return True, message, decision.tms_id
+
+        except Exception as e:
+            db.session.rollback()
+            return False, f"Erreur lors de l'annulation de la décision {id_decision} : {str(e)}", None
+
 class Historique(db.Model):
     
     """
@@ -252,6 +965,8 @@ class Historique(db.Model):
         Date et heure de l'action.
     action : sqlalchemy.sql.schema.Column
         Type d'action effectuée.
+    id_decision : sqlalchemy.sql.schema.Column
+        Référence à la décision dont fait partie l'action (clé étrangère).
     """
     __tablename__ = "historique"
 
@@ -260,243 +975,211 @@ class Historique(db.Model):
     id_match = db.Column(db.Integer, db.ForeignKey('relations_tms_candidats.id_match'), nullable=True)
     date_heure_action = db.Column(db.DateTime, server_default=db.func.now(), nullable=True)
     action = db.Column(db.String(20), nullable=False)
+    id_decision = db.Column(db.BigInteger, db.ForeignKey('decisions.id_decision', ondelete="CASCADE"), nullable=True)
 
     utilisateur = db.relationship("Utilisateurs", backref="actions")
     match = db.relationship("RelationsTMSCandidats", backref="historique")
+    decision = db.relationship("Decisions", backref=db.backref("actions", passive_deletes=True))
+
+    @staticmethod
+    def _resultat_vide():
+        """Résultat d'une décision non enregistrée (voir enregistrer_decision)."""
+        return {'id_decision': None, 'displayname': None, 'valides': 0, 'refuses': 0, 'passes': 0}
 
-    #Méthode pour enregistrer l'action "valider" d'une entité TMS dans l'historique
     @staticmethod
-    def enregistrer_validation_candidats(tms_id, qids_selectionnes, id_utilisateur):
+    def _appliquer_decision(tms_id, id_utilisateur, decision, qids_selectionnes=(), verrouille_par=None):
         """
-        Enregistre la validation/refus de candidats dans l'historique.
-    
-        Pour chaque candidat correspondant au tms_id :
-        - Si le QID est dans qids_selectionnes : crée une entrée "valide"
-        - Si le QID n'est pas dans qids_selectionnes : crée une entrée "refuse"
-    
+        Applique une décision sur une entité TMS sans valider ni annuler la transaction
+        (voir enregistrer_decision et enregistrer_decisions).
+
         Args:
             tms_id (int): Identifiant de l'entité TMS
-            qids_selectionnes (list): Liste des QIDs des candidats sélectionnés
             id_utilisateur (int): Identifiant de l'utilisateur qui effectue l'action
-        
+            decision (str): "valider", "refuser" ou "passer"
+            qids_selectionnes (list): QIDs des candidats sélectionnés (décision "valider")
+            verrouille_par (int): Si renseigné, la décision n'est appliquée que si l'entité est verrouillée par cet utilisateur
+
         Returns:
-            tuple: (success: bool, message: str, dict: {'valides': int, 'refuses': int})
+            tuple: (success: bool, message: str, dict: {'id_decision': int, 'displayname': str, 'valides': int, 'refuses': int, 'passes': int})
         """
-        try:
-            # Récupération de toutes les relations pour l'entité TMS
-            relations = db.session.query(RelationsTMSCandidats).filter(
-                RelationsTMSCandidats.tms_id == tms_id
-            ).all()
-        
-            if not relations:
-                return False, "Aucune relation trouvée pour cette entité TMS", {'valides': 0, 'refuses': 0}
-        
-            # Création d'une entrée historique pour chaque relation
-            nb_validations = 0
-            nb_refus = 0
-            
-            for relation in relations:
-                # Déterminer l'action selon si le QID est sélectionné ou non
-                action = "valide" if relation.qid in qids_selectionnes else "refuse"
-                
-                historique_entry = Historique(
-                    id_utilisateur=id_utilisateur,
-                    id_match=relation.id_match,
-                    action=action
-                )
-                db.session.add(historique_entry)
-                
-                if action == "valide":
-                    nb_validations += 1
-                else:
-                    nb_refus += 1
-        
-            # Libère le verrou
-            tms = db.session.query(TableTMS).filter_by(tms_id=tms_id).first()
-            if tms:
-                tms.verrouille_par = None
-                tms.date_heure_verouillage = None
+        resultat = Historique._resultat_vide()
+        if decision not in STATUTS_DECISIONS:
+            return False, f"Décision inconnue : {decision}", resultat
+        if decision == "valider" and not qids_selectionnes:
+            return False, "Aucun candidat sélectionné", resultat
 
-            # Validation en base
-            db.session.commit()
-            
-            total = nb_validations + nb_refus
-            message = f"Traitement terminé : {nb_validations} candidat(s) validé(s), {nb_refus} candidat(s) refusé(s) (total: {total})."
-        
-            return True, message, {'valides': nb_validations, 'refuses': nb_refus}
-        
-        except Exception as e:
-            db.session.rollback()
-            return False, f"Erreur lors de l'enregistrement : {str(e)}", {'valides': 0, 'refuses': 0}
+        # Mise à jour du statut (et des statistiques par domaine) et libération du verrou
+        valeurs = {'verrouille_par': None, 'date_heure_verrouillage': None}
+        if STATUTS_DECISIONS[decision]:
+            valeurs['statut_validation'] = STATUTS_DECISIONS[decision]
+        entite = TableTMS.modifier_entite(tms_id, valeurs, verrouille_par=verrouille_par)
 
-    #Methode pour enregistrer l'action "refuser" pour tous les candidats d'une entité TMS dans l'historique
-    @staticmethod
-    def enregistrer_refus_tous_candidats(tms_id, id_utilisateur):
-        """
-        Enregistre le refus de tous les candidats d'une entité TMS dans l'historique.
+        if entite is None:
+            if verrouille_par is not None:
+                return False, "Entité introuvable ou non verrouillée par l'utilisateur", resultat
+            return False, "Entité introuvable", resultat
+        resultat['displayname'] = entite.displayname
 
-        Pour chaque relation TMS-Candidat correspondant au tms_id,
-        crée une entrée dans l'historique avec l'action "refuse".
+        # Création de la décision, avec le nombre de candidats par action calculé sur les relations de l'entité
+        relations = RelationsTMSCandidats.__table__
+        if decision == "valider":
+            est_valide = relations.c.qid.in_(list(qids_selectionnes))
+            action = case((est_valide, literal("valide")), else_=literal("refuse"))
+            nb_valides = func.count().filter(est_valide)
+            nb_refuses = func.count().filter(~est_valide)
+            nb_passes = literal(0)
+        elif decision == "refuser":
+            action = literal("refuse")
+            nb_valides, nb_refuses, nb_passes = literal(0), func.count(), literal(0)
+        else:
+            action = literal("passe")
+            nb_valides, nb_refuses, nb_passes = literal(0), literal(0), func.count()
 
-        Args:
-            tms_id (int): Identifiant de l'entité TMS
-            id_utilisateur (int): Identifiant de l'utilisateur qui effectue l'action
-        """
-        try:
-            # Récupération de toutes les relations pour l'entité TMS
-            relations = db.session.query(RelationsTMSCandidats).filter_by(tms_id=tms_id).all()
-            
-            if not relations:
-                return False, "Aucune relation trouvée pour ce TMS", 0
-            
-            # Création d'une entrée historique pour chaque relation
-            nb_relations = 0
-            for relation in relations:
-                historique_entry = Historique(
-                    id_utilisateur=id_utilisateur,
-                    id_match=relation.id_match,
-                    action="refuse"
+        ligne_decision = db.session.execute(
+            insert(Decisions).from_select(
+                ['id_utilisateur', 'tms_id', 'type_decision', 'nb_valides', 'nb_refuses', 'nb_passes'],
+                select(
+                    literal(id_utilisateur), literal(tms_id), literal(decision), nb_valides, nb_refuses, nb_passes
+                ).where(
+                    relations.c.tms_id == tms_id
                 )
-                db.session.add(historique_entry)
-                nb_relations += 1
-            
-            # Libère le verrou
-            tms = db.session.query(TableTMS).filter_by(tms_id=tms_id).first()
-            if tms:
-                tms.verrouille_par = None
-                tms.date_heure_verrouillage = None
+            ).returning(
+                Decisions.id_decision, Decisions.nb_valides, Decisions.nb_refuses, Decisions.nb_passes
+            )
+        ).first()
 
-            # Validation en base
-            db.session.commit()
-            
-            return True, f"Refus enregistré avec succès pour {nb_relations} candidat(s) wikidata.", nb_relations
-            
-        except Exception as e:
-            db.session.rollback()
-            return False, f'''Erreur lors de l'enregistrement de l'action "refuse" dans l'historique : {str(e)}''', 0
+        if ligne_decision.nb_valides + ligne_decision.nb_refuses + ligne_decision.nb_passes == 0:
+            return False, "Aucune relation trouvée pour cette entité TMS", resultat
+        if decision == "valider" and ligne_decision.nb_valides == 0:
+            return False, "Aucun des candidats sélectionnés n'est lié à cette entité TMS", resultat
+
+        # L'entité passée n'est plus proposée à l'utilisateur
+        if decision == "passer":
+            db.session.execute(
+                pg_insert(EntitesPassees).values(
+                    id_utilisateur=id_utilisateur, tms_id=tms_id
+                ).on_conflict_do_nothing(
+                    index_elements=['id_utilisateur', 'tms_id']
+                )
+            )
+
+        # Création d'une entrée historique pour chaque relation de l'entité
+        db.session.execute(
+            insert(Historique).from_select(
+                ['id_utilisateur', 'id_match', 'action', 'id_decision'],
+                select(
+                    literal(id_utilisateur), relations.c.id_match, action, literal(ligne_decision.id_decision)
+                ).where(
+                    relations.c.tms_id == tms_id
+                )
+            )
+        )
+
+        resultat['id_decision'] = ligne_decision.id_decision
+        resultat['valides'] = ligne_decision.nb_valides
+        resultat['refuses'] = ligne_decision.nb_refuses
+        resultat['passes'] = ligne_decision.nb_passes
+
+        if decision == "valider":
+            total = resultat['valides'] + resultat['refuses']
+            message = f"Traitement terminé : {resultat['valides']} candidat(s) validé(s), {resultat['refuses']} candidat(s) refusé(s) (total: {total})."
+        elif decision == "refuser":
+            message = f"Refus enregistré avec succès pour {resultat['refuses']} candidat(s) wikidata."
+        else:
+            message = f"Passage enregistré avec succès pour {resultat['passes']} candidat(s) wikidata."
 
-    #Methode pour enregistrer l'action "passer" d'une entité TMS dans l'historique
+        return True, message, resultat
+
+    #Méthode pour enregistrer une décision (valider, refuser, passer) sur une entité TMS
     @staticmethod
-    def enregistrer_passage_entite(tms_id, id_utilisateur):
+    def enregistrer_decision(tms_id, id_utilisateur, decision, qids_selectionnes=()):
         """
-        Enregistre le passage d'une entité TMS dans l'historique.
-        
-        Pour chaque relation TMS-Candidat correspondant au tms_id,
-        crée une entrée dans l'historique avec l'action "passe".
-        
+        Enregistre une décision sur une entité TMS dans l'historique, en une seule transaction.
+
+        - "valider" : une entrée "valide" pour chaque candidat de qids_selectionnes, "refuse" pour les autres ; statut "aligne"
+        - "refuser" : une entrée "refuse" pour chaque candidat ; statut "non_aligne"
+        - "passer" : une entrée "passe" pour chaque candidat ; statut inchangé
+
+        Le statut et le verrou de l'entité sont mis à jour par une requête UPDATE ... RETURNING,
+        la décision (table decisions) puis les entrées de l'historique qui y font référence sont créées
+        chacune par une seule requête INSERT ... SELECT sur les relations de l'entité (ainsi que la ligne
+        de entites_passees pour "passer"), puis la transaction est validée une seule fois : l'historique
+        ne peut pas être enregistré sans le changement de statut et inversement.
+
         Args:
-            tms_id (int): Identifiant de l'entité TMS passée
+            tms_id (int): Identifiant de l'entité TMS
             id_utilisateur (int): Identifiant de l'utilisateur qui effectue l'action
-            
+            decision (str): "valider", "refuser" ou "passer"
+            qids_selectionnes (list): QIDs des candidats sélectionnés (décision "valider")
+
         Returns:
-            tuple: (success: bool, message: str, nb_relations: int)
+            tuple: (success: bool, message: str, dict: {'id_decision': int, 'displayname': str, 'valides': int, 'refuses': int, 'passes': int})
         """
         try:
-            # Récupération de toutes les relations pour l'entité TMS
-            relations = db.session.query(RelationsTMSCandidats).filter_by(tms_id=tms_id).all()
-            
-            if not relations:
-                return False, "Aucune relation trouvée pour ce TMS", 0
-            
-            # Création d'une entrée historique pour chaque relation
-            nb_relations = 0
-            for relation in relations:
-                historique_entry = Historique(
-                    id_utilisateur=id_utilisateur,
-                    id_match=relation.id_match,
-                    action="passe"
-                )
-                db.session.add(historique_entry)
-                nb_relations += 1
-            
-            # Libère le verrou
-            tms = db.session.query(TableTMS).filter_by(tms_id=tms_id).first()
-            if tms:
-                tms.verrouille_par = None
-                tms.date_heure_verouillage = None
+            success, message, resultat = Historique._appliquer_decision(
+                tms_id, id_utilisateur, decision, qids_selectionnes
+            )
+            if success:
+                db.session.commit()
+            else:
+                db.session.rollback()
+            return success, message, resultat
 
-            # Validation en base
-            db.session.commit()
-            
-            return True, f"Passage enregistré avec succès pour {nb_relations} candidat(s) wikidata.", nb_relations
-            
         except Exception as e:
             db.session.rollback()
-            return False, f'''Erreur lors de l'enregistrement de l'action "passer" dans l'historique : {str(e)}''', 0
+            return False, f"Erreur lors de l'enregistrement : {str(e)}", Historique._resultat_vide()
 
-    
     @staticmethod
-    def annuler_action(tms_id, id_utilisateur, types_actions):
+    def enregistrer_decisions(id_utilisateur, decisions):
         """
-        Annule une ou plusieurs actions liées à une entité TMS pour un utilisateur donné.
-        Supprime aussi le statut de validation dans TableTMS si présent.
+        Enregistre un lot de décisions d'un utilisateur sur plusieurs entités TMS, en une seule transaction.
+
+        Chaque décision est appliquée comme par enregistrer_decision, dans un point de sauvegarde
+        (SAVEPOINT) : une décision en erreur est annulée seule et n'empêche pas l'enregistrement
+        des autres. Une décision n'est appliquée que si l'entité est verrouillée par l'utilisateur.
+        La transaction est validée une seule fois, à la fin du lot.
 
         Args:
-            tms_id (int): Identifiant de l'entité TMS.
-            id_utilisateur (int): Identifiant de l'utilisateur.
-            types_actions (list ou str): Type(s) d'action à annuler (ex: ["valide", "refuse"] ou "passe")
+            id_utilisateur (int): Identifiant de l'utilisateur qui effectue les actions
+            decisions (list): dicts {'tms_id': int, 'decision': str, 'qids': list}
 
         Returns:
-            tuple: (success: bool, message: str, tms_id: int)
+            tuple: (success: bool, message: str, list: un dict par décision avec tms_id, decision, success,
+            message et les clés du résultat de enregistrer_decision)
         """
-        # Normaliser le paramètre types_actions en liste
-        if isinstance(types_actions, str):
-            types_actions = [types_actions]
-        
-        # Vérifier que la liste n'est pas vide
-        if not types_actions:
-            return False, "Aucun type d'action spécifié", None
-        
-        # Récupérer les relations TMS
-        relations = db.session.query(RelationsTMSCandidats).filter_by(tms_id=tms_id).all()
-        if not relations:
-            return False, f"Aucune relation trouvée pour l'entité TMS {tms_id}", None
-
-        # Récupérer les IDs des matches
-        id_matches = [relation.id_match for relation in relations]
-        
-        # Rechercher toutes les actions correspondantes
-        actions = db.session.query(Historique).filter(
-            Historique.id_match.in_(id_matches),
-            Historique.id_utilisateur == id_utilisateur,
-            Historique.action.in_(types_actions)
-        ).all()
-
-        if not actions:
-            types_str = ", ".join(types_actions)
-            return False, f"Aucune action de type '{types_str}' trouvée à annuler pour l'entité TMS {tms_id}", tms_id
-
-
+        resultats = []
         try:
-            # Compter les actions par type pour le message de retour
-            actions_par_type = {}
-            for action in actions:
-                actions_par_type[action.action] = actions_par_type.get(action.action, 0) + 1
+            for element in decisions:
+                point_sauvegarde = db.session.begin_nested()
+                try:
+                    success, message, resultat = Historique._appliquer_decision(
+                        element['tms_id'], id_utilisateur, element['decision'],
+                        element.get('qids') or (), verrouille_par=id_utilisateur
+                    )
+                except Exception as e:
+                    success, message, resultat = False, f"Erreur lors de l'enregistrement : {str(e)}", Historique._resultat_vide()
 
-            # Suppression des actions
-            for action in actions:
-                db.session.delete(action)
+                if success:
+                    point_sauvegarde.commit()
+                else:
+                    point_sauvegarde.rollback()
 
-            # Suppression du statut de validation s'il existe
-            tms_entry = db.session.query(TableTMS).filter_by(tms_id=tms_id).first()
-            if tms_entry and tms_entry.statut_validation:
-                tms_entry.statut_validation = None
+                resultats.append({
+                    'tms_id': element['tms_id'],
+                    'decision': element['decision'],
+                    'success': success,
+                    'message': message,
+                    **resultat
+                })
 
             db.session.commit()
-            
-            # Construire le message de succès
-            details = []
-            for type_action, count in actions_par_type.items():
-                details.append(f"{count} action(s) '{type_action}'")
-            
-            message = f"Annulation réussie pour l'entité TMS {tms_id} : {', '.join(details)}"
-            
-            return True, message, tms_id
-            
+
+            nb_enregistrees = sum(1 for resultat in resultats if resultat['success'])
+            return True, f"{nb_enregistrees} décision(s) enregistrée(s) sur {len(resultats)}", resultats
+
         except Exception as e:
             db.session.rollback()
-            return False, f"Erreur lors de l'annulation pour l'entité TMS {tms_id} : {str(e)}", None
-
+            return False, f"Erreur lors de l'enregistrement du lot de décisions : {str(e)}", []
 
 class EvenementsTMS(db.Model):
     
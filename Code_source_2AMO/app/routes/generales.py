@@ -1,16 +1,22 @@
 
 from ..app import app, db, login, csrf
-from flask import render_template, request, flash, redirect, url_for, current_app, send_file, session
+from flask import render_template, request, flash, redirect, url_for, current_app, send_file, session, Response, abort
 from ..config import Config
 from dotenv import load_dotenv
 from ..models.formulaires import AjoutUtilisateur, Connexion, ChangerMdp, Preferences
 from ..models.donnees_PRA import Constituent
-from ..models.base_principale import TableTMS, TableCandidats, Utilisateurs, RelationsTMSCandidats, LieuxCandidats, Historique, EvenementsTMS, EvenementsCandidats 
+from ..models.base_principale import TableTMS, TableCandidats, Utilisateurs, RelationsTMSCandidats, LieuxCandidats, Historique, Decisions, StatistiquesDomaines, EvenementsTMS, EvenementsCandidats 
+from ..utils.metriques import metriques
 from flask_login import current_user, login_required, login_user, logout_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import desc, text
+from sqlalchemy import desc, func, text
 from flask_wtf.csrf import CSRFProtect
+import hmac
 import json
+from collections import defaultdict
+
+# Nombre de décisions au-delà duquel le total de l'historique est affiché "500+" (comptage borné)
+PLAFOND_TOTAL_HISTORIQUE = 500
 
 @app.route("/")
 def accueil():
@@ -131,6 +137,8 @@ def deconnexion():
         werkzeug.wrappers.Response: Une redirection vers la page d'accueil.
     """
     if current_user.is_authenticated is True:
+        # Les entités du bail non traitées redeviennent disponibles pour les autres utilisateurs
+        TableTMS.liberer_bail(current_user.id_utilisateur)
         logout_user()
     flash("Vous avez été déconnecté.", "success")
     return redirect(url_for("accueil"))
@@ -140,6 +148,7 @@ def deconnexion():
 @csrf.exempt # Exempte cette route de la protection CSRF
 def deconnexion_auto():
     if current_user.is_authenticated:
+        TableTMS.liberer_bail(current_user.id_utilisateur)
         logout_user()
     return '', 204
 
@@ -189,58 +198,8 @@ def preferences():
         - render_template : Affiche le formulaire de choix des préférences (GET).
         - redirect : Redirige vers la page du profil de l'utilisateur avec un message de confirmation (POST).
     """
-    ### Recupération des statistiques de traitement par domaines
-    requete = text("""
-    SELECT
-    type_dossier,
-    statut_libelle,
-    COUNT(DISTINCT tms_id) AS nb_tms_id
-    FROM (
-    SELECT
-        tt.tms_id,
-        doc.value AS type_dossier,
-        CASE
-        WHEN tt.statut_validation IS NULL THEN 'A traiter'
-        WHEN tt.statut_validation = 'aligne' THEN 'Aligné'
-        WHEN tt.statut_validation = 'non_aligne' THEN 'Non aligné'
-        END AS statut_libelle
-    FROM app_alignement.table_tms tt,
-        jsonb_array_elements_text(tt.dossiers_documentation::jsonb) AS doc
-    WHERE tt.dossiers_documentation IS NOT NULL
-        AND jsonb_array_length(tt.dossiers_documentation::jsonb) > 0
-        AND (tt.statut_validation IS NULL OR tt.statut_validation IN ('aligne', 'non_aligne'))
-
-    UNION ALL
-
-    SELECT
-        tt.tms_id,
-        'autres' AS type_dossier,
-        CASE
-        WHEN tt.statut_validation IS NULL THEN 'A traiter'
-        WHEN tt.statut_validation = 'aligne' THEN 'Aligné'
-        WHEN tt.statut_validation = 'non_aligne' THEN 'Non aligné'
-        END AS statut_libelle
-    FROM app_alignement.table_tms tt
-    WHERE (tt.dossiers_documentation IS NULL
-            OR jsonb_array_length(tt.dossiers_documentation::jsonb) = 0)
-        AND (tt.statut_validation IS NULL OR tt.statut_validation IN ('aligne', 'non_aligne'))
-    ) AS sub
-    GROUP BY type_dossier, statut_libelle
-    ORDER BY type_dossier, statut_libelle;
-    """)
-
-    # Exécution
-    result = db.session.execute(requete).mappings()
-
-    # Transformation du résultat en liste de dictionnaires
-    stats_domaines = [
-        {
-            "type_dossier": row["type_dossier"],
-            "statut_libelle": row["statut_libelle"],
-            "nb_tms_id": row["nb_tms_id"]
-        }
-        for row in result.fetchall()
-    ]
+    ### Recupération des statistiques de traitement par domaines (compteurs tenus à jour à chaque changement de statut)
+    stats_domaines = StatistiquesDomaines.lire_statistiques()
     
 
     ### Gestion du formulaire de préférences
@@ -255,6 +214,8 @@ def preferences():
             # Ici on stocke directement la liste Python, pas json.dumps()
             current_user.preferences = form.domaines_entites_tms.data  
             db.session.commit()
+            # Le bail en cours a été constitué avec les anciennes préférences
+            TableTMS.liberer_bail(current_user.id_utilisateur)
             prefs_str = ", ".join(form.domaines_entites_tms.data)
             flash(f"Préférences mises à jour : {prefs_str}.", "success")
             return redirect(url_for("preferences"))
@@ -268,7 +229,11 @@ def preferences():
 @login_required
 def historique():
     """
-    Affiche l'historique des actions de l'utilisateur connecté.
+    Affiche l'historique des décisions de l'utilisateur connecté.
+
+    La pagination se fait par curseur sur id_decision (paramètres "avant" et "apres") :
+    seules les décisions de la page sont lues, quelle que soit la taille de l'historique.
+    Le total affiché est compté au plus jusqu'à PLAFOND_TOTAL_HISTORIQUE + 1 décisions ("500+" au-delà).
     Returns
     -------
         str: Le contenu HTML de la page d'historique.
@@ -278,110 +243,85 @@ def historique():
         return redirect(url_for("accueil"))
     
     per_page = current_app.config.get("ACTIONS_PER_PAGE", 10)  # Valeur par défaut si non définie
-    page = request.args.get('page', 1, type=int)
-    
-    # Récupération de toutes les actions avec jointures
-    all_actions = db.session.query(Historique)\
-        .join(RelationsTMSCandidats, Historique.id_match == RelationsTMSCandidats.id_match)\
-        .join(TableTMS, RelationsTMSCandidats.tms_id == TableTMS.tms_id)\
-        .join(TableCandidats, RelationsTMSCandidats.qid == TableCandidats.qid)\
-        .filter(Historique.id_utilisateur == current_user.id_utilisateur)\
-        .order_by(desc(Historique.date_heure_action))\
-        .all()
-    
-    # Traitement des actions pour les regrouper par TMS et par minute
-    actions_groupees = {}
+    avant = request.args.get('avant', type=int)  # décisions plus anciennes que cette décision (page suivante)
+    apres = request.args.get('apres', type=int)  # décisions plus récentes que cette décision (page précédente)
     
-    for action in all_actions:
-        # Création d'une clé unique basée sur TMS ID et date/heure tronquée à la minute
-        date_minute = action.date_heure_action.replace(second=0, microsecond=0)
-        cle_action = f"{date_minute.strftime('%Y%m%d_%H%M')}_{action.match.tms_id}"
-        
-        if cle_action not in actions_groupees:
-            # Initialiser l'entrée pour cette clé
-            actions_groupees[cle_action] = {
-                'cle_action': cle_action,
-                'date_heure_obj': date_minute,  # Garder l'objet datetime pour le tri
-                'date_heure': date_minute.strftime('%d/%m/%Y %H:%M'),  # Format JJ/MM/AAAA HH:MM
-                'tms_id': action.match.tms_id,
-                'displayname': action.match.tms.displayname if action.match.tms else 'N/A',
-                'candidats_valides': [],
-                'nb_candidats_valides': 0,
-                'nb_candidats_refuses': 0,
-                'nb_candidats_passes': 0,
-                'type': None  # Sera défini selon les actions trouvées
-            }
-        
-        # Traitement selon le type d'action
-        if action.action == "passe":
-            actions_groupees[cle_action]['nb_candidats_passes'] += 1
-            actions_groupees[cle_action]['type'] = 'passe'
-        elif action.action == "valide":
-            # Ajouter le candidat validé
-            candidat_info = {
-                'qid': action.match.qid,
-                'label': action.match.candidat.label if action.match.candidat else 'N/A'
-            }
-            actions_groupees[cle_action]['candidats_valides'].append(candidat_info)
-            actions_groupees[cle_action]['nb_candidats_valides'] += 1
-            # Définir le type comme valide_refuse (il peut y avoir des validations et des refus)
-            if actions_groupees[cle_action]['type'] != 'valide_refuse':
-                actions_groupees[cle_action]['type'] = 'valide_refuse'
-        elif action.action == "refuse":
-            actions_groupees[cle_action]['nb_candidats_refuses'] += 1
-            # Définir le type comme valide_refuse
-            if actions_groupees[cle_action]['type'] != 'valide_refuse':
-                actions_groupees[cle_action]['type'] = 'valide_refuse'
+    # Décisions de l'utilisateur avec le nom d'affichage de l'entité TMS
+    requete = db.session.query(Decisions, TableTMS.displayname)\
+        .join(TableTMS, Decisions.tms_id == TableTMS.tms_id)\
+        .filter(Decisions.id_utilisateur == current_user.id_utilisateur)
     
-    # Convertir en liste et trier par date décroissante (plus récent en premier)
-    actions_list = list(actions_groupees.values())
-    actions_list.sort(key=lambda x: x['date_heure_obj'], reverse=True)
+    if apres is not None:
+        decisions = requete.filter(Decisions.id_decision > apres)\
+            .order_by(Decisions.id_decision.asc())\
+            .limit(per_page + 1)\
+            .all()
+        has_prev = len(decisions) > per_page
+        decisions = list(reversed(decisions[:per_page]))
+        has_next = True
+    else:
+        if avant is not None:
+            requete = requete.filter(Decisions.id_decision < avant)
+        decisions = requete.order_by(Decisions.id_decision.desc())\
+            .limit(per_page + 1)\
+            .all()
+        has_next = len(decisions) > per_page
+        decisions = decisions[:per_page]
+        has_prev = avant is not None
     
-    # Supprimer la clé date_heure_obj temporaire (utilisée uniquement pour le tri)
-    for action in actions_list:
-        del action['date_heure_obj']
+    # Candidats validés des décisions de la page
+    candidats_valides = defaultdict(list)
+    ids_decisions = [decision.id_decision for decision, _ in decisions]
+    if ids_decisions:
+        validations = db.session.query(Historique.id_decision, RelationsTMSCandidats.qid, TableCandidats.label)\
+            .join(RelationsTMSCandidats, Historique.id_match == RelationsTMSCandidats.id_match)\
+            .outerjoin(TableCandidats, RelationsTMSCandidats.qid == TableCandidats.qid)\
+            .filter(Historique.id_decision.in_(ids_decisions), Historique.action == "valide")\
+            .all()
+        for id_decision, qid, label in validations:
+            candidats_valides[id_decision].append({'qid': qid, 'label': label or 'N/A'})
     
-    # Pagination manuelle
-    total = len(actions_list)
-    start = (page - 1) * per_page
-    end = start + per_page
-    actions_page = actions_list[start:end]
+    actions_page = []
+    for decision, displayname in decisions:
+        actions_page.append({
+            'id_decision': decision.id_decision,
+            'date_heure': decision.date_heure_decision.strftime('%d/%m/%Y %H:%M'),  # Format JJ/MM/AAAA HH:MM
+            'tms_id': decision.tms_id,
+            'displayname': displayname or 'N/A',
+            'candidats_valides': candidats_valides.get(decision.id_decision, []),
+            'nb_candidats_valides': decision.nb_valides,
+            'nb_candidats_refuses': decision.nb_refuses,
+            'nb_candidats_passes': decision.nb_passes,
+            'type': 'passe' if decision.type_decision == "passer" else 'valide_refuse'
+        })
     
-    # Création d'un objet pagination personnalisé
-    class CustomPagination:
-        def __init__(self, page, per_page, total, items):
-            self.page = page
-            self.per_page = per_page
-            self.total = total
-            self.items = items
-            self.pages = (total + per_page - 1) // per_page
-            self.has_prev = page > 1
-            self.has_next = page < self.pages
-            self.prev_num = page - 1 if self.has_prev else None
-            self.next_num = page + 1 if self.has_next else None
-        
-        def iter_pages(self, left_edge=2, left_current=2, right_current=3, right_edge=2):
-            last = self.pages
-            for num in range(1, last + 1):
-                if num <= left_edge or \
-                   (self.page - left_current - 1 < num < self.page + right_current) or \
-                   num > last - right_edge:
-                    yield num
+    # Comptage borné : au plus PLAFOND_TOTAL_HISTORIQUE + 1 lignes lues sur l'index des décisions de l'utilisateur
+    decisions_comptees = db.session.query(Decisions.id_decision)\
+        .filter(Decisions.id_utilisateur == current_user.id_utilisateur)\
+        .limit(PLAFOND_TOTAL_HISTORIQUE + 1)\
+        .subquery()
+    total = db.session.query(func.count()).select_from(decisions_comptees).scalar()
+    if total > PLAFOND_TOTAL_HISTORIQUE:
+        total = f"{PLAFOND_TOTAL_HISTORIQUE}+"
     
-    pagination = CustomPagination(page, per_page, total, actions_page)
+    pagination = {
+        'total': total,
+        'has_prev': has_prev and bool(actions_page),
+        'has_next': has_next and bool(actions_page),
+        'prev_url': url_for('historique', apres=actions_page[0]['id_decision']) if actions_page else None,
+        'next_url': url_for('historique', avant=actions_page[-1]['id_decision']) if actions_page else None
+    }
     
-    # Transmettre les données au format JSON souhaité
     return render_template("pages/historique.html", actions=actions_page, pagination=pagination)
 
 
-@app.route("/annuler_action/<int:id_tms>/<string:type_action>", methods=["POST"])
+@app.route("/annuler_decision/<int:id_decision>", methods=["POST"])
 @login_required
-def annuler_action(id_tms, type_action):
+def annuler_decision(id_decision):
     """
-    Annule les actions d'un type donné pour une entité TMS et l'utilisateur courant.
+    Annule une décision (valider, refuser, passer) de l'utilisateur courant.
     Args:
-        id_tms (int): ID de l'entité TMS concernée.
-        type_action (str): Type d'action à annuler (ex: "passe" ou "valide_refuse".)
+        id_decision (int): ID de la décision à annuler.
     Returns:
         Redirect: Vers la page de validation ou historique avec message flash.
     """
@@ -389,17 +329,9 @@ def annuler_action(id_tms, type_action):
         flash("Vous devez être connecté pour effectuer cette action.", "warning")
         return redirect(url_for("accueil"))
    
-    # Déterminer les types d'actions à traiter
-    if type_action == "valide_refuse":
-        types_actions = ["valide", "refuse"]
-    else:
-        types_actions = [type_action]
-   
-    # Appeler la méthode modifiée
-    success, message, returned_tms_id = Historique.annuler_action(
-        tms_id=id_tms,
-        id_utilisateur=current_user.id_utilisateur,
-        types_actions=types_actions
+    success, message, returned_tms_id = Decisions.annuler_decision(
+        id_decision=id_decision,
+        id_utilisateur=current_user.id_utilisateur
     )
    
     # Afficher le message et rediriger
@@ -408,4 +340,24 @@ def annuler_action(id_tms, type_action):
     if success and returned_tms_id:
         return redirect(url_for("validation", tms_id=returned_tms_id))
     else:
-        return redirect(url_for("historique"))
\ No newline at end of file
+        return redirect(url_for("historique"))
+
+
+@app.route("/metrics")
+def exposer_metriques():
+    """
+    Expose les métriques de l'application (durées par route et par phase, sélection dans la file
+    de validation, verrous perdus) au format texte de Prometheus.
+    La requête doit porter l'en-tête Authorization: Bearer <METRIQUES_JETON>. Sans jeton configuré,
+    la route n'est pas servie.
+
+    Returns:
+        Response: Métriques du processus au format text/plain (code 401 si le jeton est absent ou invalide,
+        404 si METRIQUES_JETON n'est pas configuré)
+    """
+    jeton = current_app.config['METRIQUES_JETON']
+    if not jeton:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {jeton}"):
+        return Response("Jeton invalide", status=401, mimetype="text/plain")
+    return Response(metriques.exposer(), mimetype="text/plain; version=0.0.4")
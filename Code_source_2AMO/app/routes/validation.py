@@ -1,19 +1,23 @@
-import requests
-import urllib3
-from ..app import app, db, login
-from flask import render_template, request, flash, redirect, url_for, current_app, send_file
+from ..app import app, db, login, cache_candidats, dumps_candidats
+from flask import render_template, request, flash, redirect, url_for, current_app, send_file, jsonify
 from ..config import Config
 from dotenv import load_dotenv
 from ..models.formulaires import AjoutUtilisateur, Connexion, ChangerMdp
 from ..models.donnees_PRA import Constituent
 from ..models.base_principale import TableTMS, TableCandidats, Utilisateurs, RelationsTMSCandidats, LieuxCandidats, Historique, EvenementsTMS, EvenementsCandidats 
+from ..utils.requetes_sparql import PREFIXE_ENTITE, recuperer_candidats_par_type, client_wikidata
+from ..utils.prechargement import precharger_entite_suivante, precharger_entite_affichee, attendre_entite_affichee
+from ..utils.details_candidats import type_requete
+from ..utils.metriques import metriques, mesurer
+from ..utils.compteur_requetes import budget_requetes_sql
 from flask_login import current_user, login_required, login_user, logout_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+import time
 from sqlalchemy import cast, String, func, literal, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import select, or_, and_, not_
-from sqlalchemy.orm import aliased
+from sqlalchemy.orm import aliased, joinedload
 import json
 from collections import defaultdict
 
@@ -21,10 +25,28 @@ from collections import defaultdict
 def inject_timer_config():
     return {
         'timer_verrou_minutes': app.config['TIMER_INACTIVITE_MINUTES'],
-        'timer_deconnexion_auto_minutes': app.config['PERMANENT_SESSION_LIFETIME']
+        'timer_deconnexion_auto_minutes': app.config['PERMANENT_SESSION_LIFETIME'],
+        'intervalle_maintien_verrou_secondes': app.config['INTERVALLE_MAINTIEN_VERROU_SECONDES']
     }
 
 
+def get_preferences_utilisateur():
+    """
+    Retourne les préférences de domaines de l'utilisateur connecté sous forme de liste.
+
+    Returns
+    -------
+        list: Préférences de l'utilisateur (['tous'] par défaut)
+    """
+    user_prefs = current_user.get_preferences() if hasattr(current_user, 'get_preferences') else ['tous']
+    if isinstance(user_prefs, str):
+        try:
+            user_prefs = json.loads(user_prefs)
+        except json.JSONDecodeError:
+            user_prefs = ['tous']
+    return user_prefs or ['tous']
+
+
 def get_entite_tms():
     """
     Récupère la première entité TMS dont le statut de validation n'est ni "match_communaute", ni "non_aligne", 
@@ -33,6 +55,9 @@ def get_entite_tms():
     L'entité doit respecter les préférences de domaines de l'utilisateur.
     Une fois les filtres appliqués, l'entité est choisie en fonction du score_flag des candidats associés,
     en priorisant les entités ayant des candidats avec un score_flag de 5, puis 4, etc., jusqu'à -5.
+    L'entité est sélectionnée et verrouillée en une seule transaction (voir TableTMS.verrouiller_entite),
+    avec les TAILLE_BAIL_ENTITES - 1 suivantes de la file : les entités suivantes sont servies
+    depuis ce bail sans nouvelle sélection dans la file.
 
     Returns
     -------
@@ -42,93 +67,20 @@ def get_entite_tms():
     now = datetime.now()
     seuil = now - timedelta(minutes=current_app.config['TIMER_INACTIVITE_MINUTES'])
 
-    # Déverrouiller les entités expirées
-    db.session.query(TableTMS).filter(
-        TableTMS.date_heure_verrouillage < seuil
-    ).update({
-        'verrouille_par': None,
-        'date_heure_verrouillage': None
-    })
-    db.session.commit()
-
-    # Préférences utilisateur
-    user_prefs = current_user.get_preferences() if hasattr(current_user, 'get_preferences') else ['tous']
-    if isinstance(user_prefs, str):
-        try:
-            user_prefs = json.loads(user_prefs)
-        except json.JSONDecodeError:
-            user_prefs = ['tous']
-    filtrer_par_preferences = 'tous' not in user_prefs
-
-    # TMS déjà passés par l'utilisateur
-    tms_passes = db.session.query(RelationsTMSCandidats.tms_id).join(
-        Historique, RelationsTMSCandidats.id_match == Historique.id_match
-    ).filter(
-        Historique.id_utilisateur == current_user.id_utilisateur,
-        Historique.action == "passe"
-    ).distinct()
-
-    # Requête principale avec tous les filtres sauf tri
-    query = db.session.query(TableTMS).filter(
-        TableTMS.statut_validation.is_(None),
-        ~TableTMS.tms_id.in_(tms_passes),
-        or_(
-            TableTMS.verrouille_par.is_(None),
-            TableTMS.date_heure_verrouillage < seuil,
-            TableTMS.verrouille_par == current_user.id_utilisateur
-        )
+    # Les verrous expirés (antérieurs au seuil) sont considérés comme libres,
+    # leur suppression est faite en arrière-plan (voir utils/balayage_verrous.py)
+    # Sélection et verrouillage atomiques (FOR UPDATE SKIP LOCKED)
+    debut = time.perf_counter()
+    entite = TableTMS.verrouiller_entite(
+        id_utilisateur=current_user.id_utilisateur,
+        preferences=get_preferences_utilisateur(),
+        seuil=seuil,
+        date_verrouillage=now,
+        taille_bail=current_app.config['TAILLE_BAIL_ENTITES']
     )
-
-    if filtrer_par_preferences and user_prefs:
-        conditions = []
-        prefs_specifiques = [pref for pref in user_prefs if pref != 'autres']
-        if prefs_specifiques:
-            conditions.extend([
-                TableTMS.dossiers_documentation.contains([pref]) for pref in prefs_specifiques
-            ])
-        if 'autres' in user_prefs:
-            conditions.append(TableTMS.dossiers_documentation.is_(None))
-        query = query.filter(or_(*conditions))
-
-    # Récupérer tous les TMS candidats éligibles
-    tms_eligibles = query.all()
-    if not tms_eligibles:
-        return None
-
-    # Obtenir tous les tms_id éligibles
-    tms_ids = [tms.tms_id for tms in tms_eligibles]
-
-    # Récupérer tous les candidats associés
-    relations = db.session.query(RelationsTMSCandidats).filter(
-        RelationsTMSCandidats.tms_id.in_(tms_ids)
-    ).all()
-
-    # Grouper les relations par tms_id
-    groupes = defaultdict(list)
-    for rel in relations:
-        groupes[rel.tms_id].append(rel)
-
-    def moyenne_score(tms_id):
-        candidats = groupes[tms_id]
-        total = sum(c.score_flag for c in candidats if c.score_flag is not None)
-        return total / len(candidats)
-
-    # Parcours des priorités de 5 à -5 inclus
-    for i in range(5, -6, -1):
-        tms_avec_i = [
-            tms_id for tms_id, candidats in groupes.items()
-            if any(c.score_flag == i for c in candidats)
-        ]
-        if tms_avec_i:
-            meilleur_tms_id = sorted(
-                tms_avec_i, key=moyenne_score, reverse=True
-            )[0]
-            entite = next((tms for tms in tms_eligibles if tms.tms_id == meilleur_tms_id), None)
-            if entite:
-                entite.verrouille_par = current_user.id_utilisateur
-                entite.date_heure_verrouillage = now
-                db.session.commit()
-                return entite
+    metriques.incrementer("alignement_selection_file_secondes_total", time.perf_counter() - debut)
+    metriques.incrementer("alignement_selection_file_total", resultat="entite" if entite else "vide")
+    return entite
 
 def get_score_flag_color_class(score_value):
     """
@@ -168,13 +120,82 @@ def get_score_flag_display_name(field_name):
     }
     return display_names.get(field_name, field_name.replace('_', ' ').title())
 
-def preprocess_candidat_info(candidat_raw, scores_info=None, type_candidat='Q5'):
+def normaliser_label(label):
+    """
+    Normalise un label pour la comparaison entre les labels des candidats et ceux de l'entité TMS.
+
+    Args:
+        label (str): Label à normaliser
+
+    Returns:
+        str: Label en minuscules sans espaces superflus
+    """
+    return ' '.join(str(label).split()).lower()
+
+def get_labels_entite(donnees):
+    """
+    Construit l'ensemble des labels normalisés de l'entité TMS affichée :
+    displayname et autres labels du Constituent.
+
+    Args:
+        donnees (dict): Données du constituant affiché (clés displayname et autres_labels)
+
+    Returns:
+        set: Labels normalisés de l'entité TMS
+    """
+    labels = set()
+    if donnees.get('displayname'):
+        labels.add(normaliser_label(donnees['displayname']))
+
+    autres_labels = donnees.get('autres_labels') or {}
+    if isinstance(autres_labels, dict):
+        autres_labels = [label for liste in autres_labels.values() if liste for label in liste]
+    for label in autres_labels:
+        if label:
+            labels.add(normaliser_label(label))
+    return labels
+
+def get_scores_relation(relation):
+    """
+    Retourne les scores d'une relation TMS ↔ candidat au format attendu par preprocess_candidat_info.
+
+    Args:
+        relation (RelationsTMSCandidats): Relation entre l'entité TMS et le candidat
+
+    Returns:
+        dict: score_flag, score_api et scores_flag_details (champ -> valeur des colonnes score_flag_*)
+    """
+    scores = {
+        'score_flag': relation.score_flag,
+        'score_api': relation.score_api,
+        'scores_flag_details': {}
+    }
+
+    # Récupération des colonnes score_flag_* spécifiques
+    score_flag_columns = [
+        'score_flag_date_naissance',
+        'score_flag_date_mort', 
+        'score_flag_lieu_naissance',
+        'score_flag_lieu_mort',
+        'score_flag_nom'
+    ]
+
+    for column_name in score_flag_columns:
+        if hasattr(relation, column_name):
+            score_value = getattr(relation, column_name, None)
+            field_name = column_name.replace('score_flag_', '')
+            scores['scores_flag_details'][field_name] = score_value
+    return scores
+
+def preprocess_candidat_info(candidat_raw, scores_info=None, type_candidat='Q5', labels_entite=None):
     """
     Prétraite les informations d'un candidat issues de la requête SPARQL.
     
     Args:
         candidat_raw (dict): Données brutes du candidat
         scores_info (dict): Informations de scoring depuis RelationsTMSCandidats
+        type_candidat (str): Type du candidat ('Q5' pour personne ou autre)
+        labels_entite (set): Labels normalisés de l'entité TMS affichée (voir get_labels_entite)
         
     Returns:
         dict: Données prétraitées du candidat
@@ -193,7 +214,7 @@ def preprocess_candidat_info(candidat_raw, scores_info=None, type_candidat='Q5')
 
     def get_match_label(label):
         """
-        Vérifie si le label correspond à l'entité TMS actuelle.
+        Vérifie si le label correspond à l'entité TMS affichée.
         
         Args:
             label (str): Label à vérifier
@@ -201,10 +222,9 @@ def preprocess_candidat_info(candidat_raw, scores_info=None, type_candidat='Q5')
         Returns:
             bool: True si le label correspond, False sinon
         """
-        entite_tms = get_entite_tms()
-        if entite_tms:
-            return label.lower() == entite_tms.displayname.lower()
-        return False
+        if not labels_entite:
+            return False
+        return normaliser_label(label) in labels_entite
     
     # Informations de base
     candidat = {
@@ -412,10 +432,13 @@ def preprocess_candidat_info(candidat_raw, scores_info=None, type_candidat='Q5')
 
 @app.route("/validation")
 @login_required
+@budget_requetes_sql(10)
 def validation():
     """
     Affiche la page de validation avec les données d'un constituant spécifique
-    et les informations des candidats associés.
+    et le squelette des cartes des candidats associés (label, QID et scores de la relation).
+    Les données Wikidata de tous les candidats sont récupérées en arrière-plan (une requête SPARQL
+    par type de candidat) et chaque carte est ensuite chargée par la page (route /validation/candidat/<tms_id>/<qid>).
 
     Returns
     -------
@@ -433,16 +456,19 @@ def validation():
         infos_entite_tms_affichage = get_entite_tms()
         id_tms_affichage = infos_entite_tms_affichage.tms_id if infos_entite_tms_affichage else None
 
-    constituant = db.session.query(Constituent).filter_by(constituentid=id_tms_affichage).first()
-    
-    # Récupération des relations TMS ↔ Candidats
-    relations = db.session.query(RelationsTMSCandidats).filter_by(tms_id=id_tms_affichage).all()
+    constituant = None
+    relations = []
+    if id_tms_affichage:
+        # Données TMS (base donnees_TMS, requête séparée)
+        constituant = db.session.query(Constituent).filter_by(constituentid=id_tms_affichage).first()
+
+        # Récupération des relations TMS ↔ Candidats et des candidats associés en une seule requête (jointure)
+        relations = db.session.query(RelationsTMSCandidats).options(
+            joinedload(RelationsTMSCandidats.candidat)
+        ).filter_by(tms_id=id_tms_affichage).all()
 
-    # Récupération des candidats liés avec leurs dates et création d'un mapping des scores
+    # Squelettes des cartes des candidats (sans données Wikidata)
     infos_candidats = []
-    qids_q5 = []  # QIDs pour les candidats de type Q5 (personnes)
-    qids_autres = []  # QIDs pour les autres types de candidats
-    scores_mapping = {}  # Mapping QID -> scores de la relation
 
     # Données du constituant
     donnees = {}
@@ -467,331 +493,109 @@ def validation():
             "domaines_activite": constituant.dossiers_documentation
         }
     
-    for relation in relations:
-        candidats = db.session.query(TableCandidats).filter_by(qid=relation.qid).all()
-        for candidat in candidats:
-            # Séparation des QIDs selon le type
-            if candidat.type_candidat == 'Q5':
-                qids_q5.append(candidat.qid)
-            else:
-                qids_autres.append(candidat.qid)
-            
-            # Récupération de tous les scores de la relation
-            scores_mapping[candidat.qid] = {
-                'score_flag': relation.score_flag,
-                'score_api': relation.score_api,
-                'scores_flag_details': {}
-            }
-            
-            # Récupération des colonnes score_flag_* spécifiques
-            score_flag_columns = [
-                'score_flag_date_naissance',
-                'score_flag_date_mort', 
-                'score_flag_lieu_naissance',
-                'score_flag_lieu_mort',
-                'score_flag_nom'
-            ]
-            
-            for column_name in score_flag_columns:
-                if hasattr(relation, column_name):
-                    score_value = getattr(relation, column_name, None)
-                    field_name = column_name.replace('score_flag_', '')
-                    scores_mapping[candidat.qid]['scores_flag_details'][field_name] = score_value
-
-    # Configuration de la session avec gestion SSL
-    session = requests.Session()
-    session.verify = False
-    
-    import urllib3
-    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-    
-    HEADERS = {"Accept": "application/sparql-results+json","User-Agent": "2AMO/0.1 (https://www.musee-orsay.fr/; benoit.deshayes@musee-orsay.fr)"}
-    SPARQL_ENDPOINT = "https://query.wikidata.org/sparql"
-
-    # Exécution des requêtes SPARQL selon les types
-    try:
-        # Requête pour les candidats de type Q5 (personnes)
-        if qids_q5:
-            qid_values_q5 = " ".join(f"wd:{qid}" for qid in qids_q5)
-            query_q5 = f"""
-            SELECT ?item ?itemLabel
-                ?genreLabel
-                (GROUP_CONCAT(DISTINCT ?altLabel; separator="; ") AS ?autresLabels)
-                (GROUP_CONCAT(DISTINCT ?typeLabel; separator="; ") AS ?types)
-                (GROUP_CONCAT(DISTINCT ?naissanceFormatee; separator="; ") AS ?datesNaissance)
-                (GROUP_CONCAT(DISTINCT ?mortFormatee; separator="; ") AS ?datesMort)
-                (GROUP_CONCAT(DISTINCT ?lieuNaissanceLabel; separator="; ") AS ?lieuxNaissance)
-                (GROUP_CONCAT(DISTINCT ?lieuMortLabel; separator="; ") AS ?lieuxMort)
-                (GROUP_CONCAT(DISTINCT ?occupationLabel; separator="; ") AS ?occupations)
-                (GROUP_CONCAT(DISTINCT ?nationaliteLabel; separator="; ") AS ?nationalites)
-                ?pereLabel
-                ?mereLabel
-                (GROUP_CONCAT(DISTINCT ?frereOuSoeurLabel; separator="; ") AS ?freresOuSoeurs)
-                (GROUP_CONCAT(DISTINCT ?enfantLabel; separator="; ") AS ?enfants)
-                (GROUP_CONCAT(DISTINCT ?conjointLabel; separator="; ") AS ?conjoints)
-                (GROUP_CONCAT(DISTINCT ?elevesLabel; separator="; ") AS ?eleves)
-                (GROUP_CONCAT(DISTINCT ?eleveDeLabel; separator="; ") AS ?eleveDe)
-                ?description
-            WHERE {{
-            VALUES ?item {{ {qid_values_q5} }}
-            OPTIONAL {{
-                ?item wdt:P21 ?genre.
-                ?genre rdfs:label ?genreLabel.
-                FILTER(LANG(?genreLabel) = "fr")
-            }}
-            OPTIONAL {{
-                ?item skos:altLabel ?altLabel.
-                FILTER(LANG(?altLabel) = "fr")
-            }}
-            OPTIONAL {{
-                ?item wdt:P31 ?type.
-            }}
-            OPTIONAL {{
-                ?item p:P569 ?naissanceStatement.
-                ?naissanceStatement psv:P569 ?naissanceNode.
-                ?naissanceNode wikibase:timeValue ?dateNaissance.
-                ?naissanceNode wikibase:timePrecision ?precisionNaissance.
-                BIND(STR(?dateNaissance) AS ?naissanceStr)
-                BIND(
-                IF(?precisionNaissance = 11,
-                    CONCAT(SUBSTR(?naissanceStr, 9, 2), "/", SUBSTR(?naissanceStr, 6, 2), "/", SUBSTR(?naissanceStr, 1, 4)),
-                IF(?precisionNaissance = 10,
-                    CONCAT(SUBSTR(?naissanceStr, 6, 2), "/", SUBSTR(?naissanceStr, 1, 4)),
-                IF(?precisionNaissance = 9,
-                    SUBSTR(?naissanceStr, 1, 4),
-                    "[date imprécise]"))) AS ?naissanceFormatee)
-            }}
-            OPTIONAL {{
-                ?item p:P570 ?mortStatement.
-                ?mortStatement psv:P570 ?mortNode.
-                ?mortNode wikibase:timeValue ?dateMort.
-                ?mortNode wikibase:timePrecision ?precisionMort.
-                BIND(STR(?dateMort) AS ?mortStr)
-                BIND(
-                IF(?precisionMort = 11,
-                    CONCAT(SUBSTR(?mortStr, 9, 2), "/", SUBSTR(?mortStr, 6, 2), "/", SUBSTR(?mortStr, 1, 4)),
-                IF(?precisionMort = 10,
-                    CONCAT(SUBSTR(?mortStr, 6, 2), "/", SUBSTR(?mortStr, 1, 4)),
-                IF(?precisionMort = 9,
-                    SUBSTR(?mortStr, 1, 4),
-                    "[date imprécise]"))) AS ?mortFormatee)
-            }}
-            OPTIONAL {{
-                ?item wdt:P19 ?lieuNaissance.
-            }}
-            OPTIONAL {{
-                ?item wdt:P20 ?lieuMort.          
-                }}
-            OPTIONAL {{
-                ?item wdt:P106 ?occupation.
-                ?occupation rdfs:label ?occupationLabel.
-                FILTER(LANG(?occupationLabel) = "fr")
-            }}
-            OPTIONAL {{
-                ?item wdt:P27 ?nationalite.
-                ?nationalite rdfs:label ?nationaliteLabel.
-                FILTER(LANG(?nationaliteLabel) = "fr")
-            }}
-            OPTIONAL {{
-                ?item wdt:P22 ?pere.
-            }}
-            OPTIONAL {{
-                ?item wdt:P25 ?mere.
-            }}
-            OPTIONAL {{
-                ?item wdt:P3373 ?frereOuSoeur.
-            }}
-            OPTIONAL {{
-                ?item wdt:P40 ?enfant.
-            }}
-            OPTIONAL {{
-                ?item wdt:P26 ?conjoint.
-            }}
-            OPTIONAL {{
-                ?item wdt:P802 ?eleves.
-            }}
-            OPTIONAL {{
-                ?item wdt:P1066 ?eleveDe.
-            }}
-            OPTIONAL {{
-                ?item schema:description ?description.
-                FILTER(LANG(?description) = "fr")
-            }}
-            SERVICE wikibase:label {{
-                bd:serviceParam wikibase:language "fr,mul,en".
-                ?type rdfs:label ?typeLabel.
-                ?lieuNaissance rdfs:label ?lieuNaissanceLabel.
-                ?lieuMort rdfs:label ?lieuMortLabel.
-                ?pere rdfs:label ?pereLabel.
-                ?mere rdfs:label ?mereLabel.
-                ?frereOuSoeur rdfs:label ?frereOuSoeurLabel.
-                ?enfant rdfs:label ?enfantLabel.
-                ?conjoint rdfs:label ?conjointLabel.
-                ?eleves rdfs:label ?elevesLabel.
-                ?eleveDe rdfs:label ?eleveDeLabel.
-                ?item rdfs:label ?itemLabel.
-            }}
-            }}
-            GROUP BY ?item ?itemLabel ?genreLabel ?description ?pereLabel ?mereLabel
-            """
-
-            # Exécution de la requête pour les personnes (Q5)
-            response_q5 = session.get(
-                SPARQL_ENDPOINT,
-                params={'query': query_q5},
-                headers=HEADERS,
-                timeout=30
-            )
-            
-            if response_q5.status_code == 200:
-                sparql_data_q5 = response_q5.json()
-                # Traitement des résultats SPARQL pour les personnes
-                for result in sparql_data_q5.get('results', {}).get('bindings', []):
-                    candidat_raw = {}
-                    for key, value in result.items():
-                        candidat_raw[key] = value.get('value', '')
-                    
-                    # Prétraitement des données candidat avec les scores
-                    qid = candidat_raw.get('item', '').replace('http://www.wikidata.org/entity/', '') if candidat_raw.get('item') else ''
-                    scores_info = scores_mapping.get(qid)
-                    candidat_processed = preprocess_candidat_info(candidat_raw, scores_info, type_candidat='Q5')
-                    infos_candidats.append(candidat_processed)
-            else:
-                current_app.logger.error(f"Erreur SPARQL Q5: {response_q5.status_code}")
-
-        # Requête pour les candidats d'autres types (organisations, lieux, etc.)
-        if qids_autres:
-            qid_values_autres = " ".join(f"wd:{qid}" for qid in qids_autres)
-            query_autres = f"""
-            SELECT ?item ?itemLabel
-                (GROUP_CONCAT(DISTINCT ?altLabel; separator="; ") AS ?autresLabels)
-                (GROUP_CONCAT(DISTINCT ?typeLabel; separator="; ") AS ?types)
-                (GROUP_CONCAT(DISTINCT ?entiteRemplaceeLabel; separator="; ") AS ?entitesRemplacees)
-                (GROUP_CONCAT(DISTINCT ?remplaceeParLabel; separator="; ") AS ?remplaceeParx)
-                (GROUP_CONCAT(DISTINCT ?paysLabel; separator="; ") AS ?pays)
-                (GROUP_CONCAT(DISTINCT ?siegeLabel; separator="; ") AS ?sieges)
-                (GROUP_CONCAT(DISTINCT ?fondationFormatee; separator="; ") AS ?datesFondation)
-                (GROUP_CONCAT(DISTINCT ?dissolutionFormatee; separator="; ") AS ?datesDissolution)
-                ?description
-            WHERE {{
-            VALUES ?item {{ {qid_values_autres} }}
-
-            OPTIONAL {{
-                ?item skos:altLabel ?altLabel.
-                FILTER(LANG(?altLabel) = "fr")
-            }}
-
-            OPTIONAL {{
-                ?item wdt:P31 ?type.
-                ?type rdfs:label ?typeLabel.
-                FILTER(LANG(?typeLabel) = "fr")
-            }}
-
-            OPTIONAL {{
-                ?item wdt:P1365 ?entiteRemplacee.
-            }}
-
-            OPTIONAL {{
-                ?item wdt:P1366 ?remplaceePar.
-            }}
-
-            OPTIONAL {{
-                ?item wdt:P17 ?pays.
-                ?pays rdfs:label ?paysLabel.
-                FILTER(LANG(?paysLabel) = "fr")
-            }}
-
-            OPTIONAL {{
-                ?item wdt:P159 ?siege.
-            }}
-
-            OPTIONAL {{
-                ?item p:P571 ?fondationStatement.
-                ?fondationStatement psv:P571 ?fondationNode.
-                ?fondationNode wikibase:timeValue ?dateFondation.
-                ?fondationNode wikibase:timePrecision ?precisionFondation.
-                BIND(STR(?dateFondation) AS ?fondationStr)
-                BIND(
-                IF(?precisionFondation = 11,
-                    CONCAT(SUBSTR(?fondationStr, 9, 2), "/", SUBSTR(?fondationStr, 6, 2), "/", SUBSTR(?fondationStr, 1, 4)),
-                IF(?precisionFondation = 10,
-                    CONCAT(SUBSTR(?fondationStr, 6, 2), "/", SUBSTR(?fondationStr, 1, 4)),
-                IF(?precisionFondation = 9,
-                    SUBSTR(?fondationStr, 1, 4),
-                    "[date imprécise]"))) AS ?fondationFormatee)
-            }}
-
-            OPTIONAL {{
-                ?item p:P576 ?dissolutionStatement.
-                ?dissolutionStatement psv:P576 ?dissolutionNode.
-                ?dissolutionNode wikibase:timeValue ?dateDissolution.
-                ?dissolutionNode wikibase:timePrecision ?precisionDissolution.
-                BIND(STR(?dateDissolution) AS ?dissolutionStr)
-                BIND(
-                IF(?precisionDissolution = 11,
-                    CONCAT(SUBSTR(?dissolutionStr, 9, 2), "/", SUBSTR(?dissolutionStr, 6, 2), "/", SUBSTR(?dissolutionStr, 1, 4)),
-                IF(?precisionDissolution = 10,
-                    CONCAT(SUBSTR(?dissolutionStr, 6, 2), "/", SUBSTR(?dissolutionStr, 1, 4)),
-                IF(?precisionDissolution = 9,
-                    SUBSTR(?dissolutionStr, 1, 4),
-                    "[date imprécise]"))) AS ?dissolutionFormatee)
-            }}
-
-            OPTIONAL {{
-                ?item schema:description ?description.
-                FILTER(LANG(?description) = "fr")
-            }}
-
-            SERVICE wikibase:label {{
-                bd:serviceParam wikibase:language "fr,mul,en".
-                ?item rdfs:label ?itemLabel.
-                ?siege rdfs:label ?siegeLabel.
-                ?entiteRemplacee rdfs:label ?entiteRemplaceeLabel.
-                ?remplaceePar rdfs:label ?remplaceeParLabel.
-            }}
-            }}
-            GROUP BY ?item ?itemLabel ?description
-            """
-
-            # Exécution de la requête pour les autres types
-            response_autres = session.get(
-                SPARQL_ENDPOINT,
-                params={'query': query_autres},
-                headers=HEADERS,
-                timeout=30
-            )
-            
-            if response_autres.status_code == 200:
-                sparql_data_autres = response_autres.json()
-                # Traitement des résultats SPARQL pour les autres types
-                for result in sparql_data_autres.get('results', {}).get('bindings', []):
-                    candidat_raw = {}
-                    for key, value in result.items():
-                        candidat_raw[key] = value.get('value', '')
-                    
-                    # Prétraitement des données candidat avec les scores
-                    qid = candidat_raw.get('item', '').replace('http://www.wikidata.org/entity/', '') if candidat_raw.get('item') else ''
-                    scores_info = scores_mapping.get(qid)
-                    candidat_processed = preprocess_candidat_info(candidat_raw, scores_info, type_candidat='autres')
-                    infos_candidats.append(candidat_processed)
-            else:
-                current_app.logger.error(f"Erreur SPARQL autres types: {response_autres.status_code}")
-
-        # Tri des candidats par score_api décroissant
-        infos_candidats.sort(key=lambda x: x['scores']['score_api'] if x['scores']['score_api'] is not None else -1, reverse=True)
-                
-    except requests.exceptions.RequestException as e:
-        current_app.logger.error(f"Erreur lors de la requête SPARQL: {str(e)}")
-        flash("Erreur lors de la récupération des données depuis Wikidata. Veuillez recharger la page.", "danger")
-    except Exception as e:
-        current_app.logger.error(f"Erreur inattendue: {str(e)}")
+    with mesurer('pretraitement'):
+        for relation in relations:
+            candidat = relation.candidat
+            if candidat is None:
+                continue
+            # Carte minimale construite à partir du label enregistré dans TableCandidats et des scores de la relation
+            candidat_raw = {'item': f"{PREFIXE_ENTITE}{candidat.qid}", 'itemLabel': candidat.label or candidat.qid}
+            infos_candidats.append(preprocess_candidat_info(
+                candidat_raw, get_scores_relation(relation), type_candidat=type_requete(candidat.type_candidat)
+            ))
+
+    # Tri des candidats par score_api décroissant
+    infos_candidats.sort(key=lambda x: x['scores']['score_api'] if x['scores']['score_api'] is not None else -1, reverse=True)
+
+    # Récupération groupée en arrière-plan des candidats de l'entité affichée, lus ensuite par les cartes
+    if infos_candidats:
+        precharger_entite_affichee(id_tms_affichage, cache_candidats, dumps_candidats)
+
+    # Préchargement en arrière-plan des candidats de la prochaine entité probable de l'utilisateur
+    if id_tms_affichage and current_app.config['PRECHARGEMENT_ENTITE_SUIVANTE']:
+        precharger_entite_suivante(
+            id_utilisateur=current_user.id_utilisateur,
+            preferences=get_preferences_utilisateur(),
+            tms_id_courant=id_tms_affichage,
+            cache=cache_candidats,
+            dumps=dumps_candidats
+        )
 
     
     return render_template("pages/validation.html", donnees=donnees, infos_candidats=infos_candidats)
 
+### Route de la carte d'un candidat
+@app.route("/validation/candidat/<int:tms_id>/<qid>")
+@login_required
+@budget_requetes_sql(5)
+def carte_candidat(tms_id, qid):
+    """
+    Retourne le fragment HTML de la carte d'un candidat avec ses données Wikidata,
+    chargé par la page de validation pour remplacer le squelette de la carte.
+
+    Les données sont lues dans la table candidats_details ou dans le cache, alimenté par la récupération
+    groupée lancée à l'affichage de la page (precharger_entite_affichee), dont la fin est attendue.
+    Elles sont lues dans les dumps locaux ou demandées au point d'accès SPARQL en dernier recours
+    (récupération groupée en échec ou page affichée par un autre processus).
+
+    Args:
+        tms_id (int): Identifiant de l'entité TMS affichée
+        qid (str): QID du candidat
+
+    Returns
+    -------
+        str: Le fragment HTML de la carte (code 404 si le candidat n'est pas lié à l'entité TMS)
+    """
+    # Relation, candidat et données Wikidata précalculées (candidats_details) en une seule requête (jointures)
+    relation = db.session.query(RelationsTMSCandidats).options(
+        joinedload(RelationsTMSCandidats.candidat).joinedload(TableCandidats.details)
+    ).filter_by(tms_id=tms_id, qid=qid).first()
+    if relation is None or relation.candidat is None:
+        return "Candidat introuvable pour cette entité TMS", 404
+
+    candidat = relation.candidat
+    type_candidat = type_requete(candidat.type_candidat)
+    details = {}
+    if candidat.details is not None and candidat.details.type_candidat == type_candidat:
+        details[qid] = candidat.details.donnees
+
+    # Labels de l'entité TMS affichée, pour la comparaison avec les autres labels du candidat
+    constituant = db.session.query(Constituent.displayname, Constituent.autres_labels).filter_by(constituentid=tms_id).first()
+    labels_entite = get_labels_entite(constituant._asdict() if constituant else {})
+
+    # Les données expirées sont servies telles quelles (signalées "perime") et actualisées en arrière-plan
+    with mesurer('http_sortant'):
+        if qid not in details:
+            attendre_entite_affichee(tms_id)
+        donnees_par_type, erreurs_par_type, qids_perimes = recuperer_candidats_par_type(
+            {type_candidat: [qid]},
+            cache_candidats,
+            dumps_candidats,
+            details
+        )
+    candidat_raw = donnees_par_type.get(type_candidat, {}).get(qid)
+
+    with mesurer('pretraitement'):
+        if candidat_raw is None:
+            # Carte minimale signalée comme indisponible si la requête a échoué ou si Wikidata n'a rien renvoyé
+            candidat_raw = {'item': f"{PREFIXE_ENTITE}{qid}", 'itemLabel': candidat.label or qid}
+            candidat_processed = preprocess_candidat_info(candidat_raw, get_scores_relation(relation), type_candidat=type_candidat, labels_entite=labels_entite)
+            candidat_processed['indisponible'] = True
+        else:
+            candidat_processed = preprocess_candidat_info(candidat_raw, get_scores_relation(relation), type_candidat=type_candidat, labels_entite=labels_entite)
+            candidat_processed['perime'] = qid in qids_perimes
+
+    if erreurs_par_type:
+        current_app.logger.warning(f"Données Wikidata indisponibles pour le candidat {qid} : {erreurs_par_type}")
+    current_app.logger.debug(f"Cache candidats : {cache_candidats.statistiques()}")
+    current_app.logger.debug(f"Appels Wikidata : {client_wikidata.statistiques()}")
+
+    return render_template("partials/carte_candidat.html", candidat=candidat_processed)
+
 ### Route pour passer une entité TMS
 @app.route("/validation/passer/<int:tms_id>", methods=["POST"])
 @login_required
+@budget_requetes_sql(8)
 def passer_entite(tms_id):
     """
     Passe une entité TMS et enregistre l'action dans l'historique.
@@ -803,20 +607,15 @@ def passer_entite(tms_id):
         Response: Redirection vers la page de validation avec message flash
     """
     
-    # Vérification que l'entité existe
-    entite = db.session.query(TableTMS).filter_by(tms_id=tms_id).first()
-    if not entite:
-        flash("Entité introuvable", "danger")
-        return redirect(url_for('validation'))
-    
-    # Enregistrement du passage dans l'historique
-    success, message, nb_relations = Historique.enregistrer_passage_entite(
+    # Enregistrement du passage dans l'historique et libération du verrou (une seule transaction)
+    success, message, resultat = Historique.enregistrer_decision(
         tms_id=tms_id,
-        id_utilisateur=current_user.id_utilisateur
+        id_utilisateur=current_user.id_utilisateur,
+        decision="passer"
     )
     
     if success:
-        flash(f"Entité '{entite.displayname}' passée avec succès. {message}", "success")
+        flash(f"Entité '{resultat['displayname']}' passée avec succès. {message}", "success")
     else:
         flash(f"Erreur lors du passage de l'entité : {message}", "danger")
     
@@ -825,6 +624,7 @@ def passer_entite(tms_id):
 
 @app.route("/validation/valider/<int:tms_id>", methods=["POST"])
 @login_required
+@budget_requetes_sql(8)
 def valider_candidats(tms_id):
     """
     Valide les candidats sélectionnés pour une entité TMS.
@@ -843,40 +643,26 @@ def valider_candidats(tms_id):
         flash("Aucun candidat sélectionné", "warning")
         return redirect(url_for('validation'))
     
-    # Vérification que l'entité TMS existe
-    entite = db.session.query(TableTMS).filter_by(tms_id=tms_id).first()
-    if not entite:
-        flash("Entité introuvable", "danger")
-        return redirect(url_for('validation'))
-    
-    # Enregistrement de la validation dans l'historique
-    success_validation, message_validation, nb_validations = Historique.enregistrer_validation_candidats(
+    # Enregistrement de la validation dans l'historique et changement du statut vers "aligne" (une seule transaction)
+    success, message, resultat = Historique.enregistrer_decision(
         tms_id=tms_id,
-        qids_selectionnes=candidats_selectionnes,
-        id_utilisateur=current_user.id_utilisateur
+        id_utilisateur=current_user.id_utilisateur,
+        decision="valider",
+        qids_selectionnes=candidats_selectionnes
     )
     
-    if not success_validation:
-        flash(f"Erreur lors de la validation : {message_validation}", "danger")
-        return redirect(url_for('validation'))
-    
-    # Changement du statut de validation de l'entité TMS vers "aligne"
-    success_statut, message_statut = TableTMS.changer_statut_validation(
-        tms_id=tms_id,
-        nouveau_statut="aligne"
-    )
-    
-    if not success_statut:
-        flash(f"Candidats validés mais erreur lors du changement de statut : {message_statut}", "warning")
+    if not success:
+        flash(f"Erreur lors de la validation : {message}", "danger")
         return redirect(url_for('validation'))
     
     # Messages de succès
-    flash(f"Validation réussie ! {message_validation} Statut de l'entité '{entite.displayname}' changé vers 'aligné'.", "success")
+    flash(f"Validation réussie ! {message} Statut de l'entité '{resultat['displayname']}' changé vers 'aligné'.", "success")
     
     return redirect(url_for('validation'))
 
 @app.route("/validation/refuser-tous-candidats/<int:tms_id>", methods=["POST"])
 @login_required
+@budget_requetes_sql(8)
 def refuser_tous_candidats(tms_id):
     """
     Refuse tous les candidats pour une entité TMS.
@@ -887,31 +673,98 @@ def refuser_tous_candidats(tms_id):
     Returns:
         Response: Redirection vers la page de validation avec message flash
     """
-    # Vérification que l'entité TMS existe
-    entite = db.session.query(TableTMS).filter_by(tms_id=tms_id).first()
-    if not entite:
-        flash("Entité introuvable", "danger")
-        return redirect(url_for('validation'))
-    
-    # Enregistrement du refus dans l'historique
-    success_refus, message, nb_refus = Historique.enregistrer_refus_tous_candidats(
+    # Enregistrement du refus dans l'historique et changement du statut vers "non_aligne" (une seule transaction)
+    success, message, resultat = Historique.enregistrer_decision(
         tms_id=tms_id,
-        id_utilisateur=current_user.id_utilisateur
+        id_utilisateur=current_user.id_utilisateur,
+        decision="refuser"
     )
     
-    if not success_refus:
+    if not success:
         flash(f"Erreur lors du refus des candidats : {message}", "danger")
-
-    # Enregistrement du  ouveau statut de l'entité TMS vers "non_aligne"
-    success_statut, message_statut = TableTMS.changer_statut_validation(
-        tms_id=tms_id,
-        nouveau_statut="non_aligne"
-    )
-    if not success_statut:
-        flash(f"Candidats refusés mais erreur lors du changement de statut : {message_statut}", "warning")
         return redirect(url_for('validation'))
 
     #Message de succès
-    flash(f"Tous les candidats pour l'entité '{entite.displayname}' ont été refusés. {message}", "success")
+    flash(f"Tous les candidats pour l'entité '{resultat['displayname']}' ont été refusés. {message}", "success")
     
     return redirect(url_for('validation'))
+
+
+@app.route("/validation/verrou", methods=["POST"])
+@login_required
+@budget_requetes_sql(3)
+def maintenir_verrou():
+    """
+    Prolonge le verrou des entités TMS du bail de l'utilisateur connecté et vérifie celui de l'entité affichée
+    (champ tms_id du formulaire), appelée périodiquement par la page de validation tant que l'utilisateur est actif
+    (le jeton CSRF est transmis dans l'en-tête X-CSRFToken). L'entité affichée est verrouillée pour l'utilisateur
+    si elle est libre. Ni la file de validation ni les données Wikidata ne sont interrogées.
+
+    Returns:
+        Response: JSON {"verrouille": bool, "secondes_restantes": int}, verrouille valant false si l'entité affichée
+        est verrouillée par un autre utilisateur (son verrou a expiré et elle a été attribuée à un autre utilisateur) ;
+        code 400 si tms_id est absent
+    """
+    tms_id = request.form.get('tms_id', type=int)
+    if tms_id is None:
+        return jsonify({'verrouille': False, 'secondes_restantes': 0}), 400
+
+    now = datetime.now()
+    duree_verrou = current_app.config['TIMER_INACTIVITE_MINUTES'] * 60
+    success, message, verrouille = TableTMS.maintenir_bail(
+        id_utilisateur=current_user.id_utilisateur,
+        seuil=now - timedelta(seconds=duree_verrou),
+        date_verrouillage=now,
+        tms_id=tms_id
+    )
+    if not success:
+        current_app.logger.error(message)
+        return jsonify({'verrouille': False, 'secondes_restantes': 0}), 500
+
+    if not verrouille:
+        # Verrou expiré pendant l'affichage et entité attribuée à un autre utilisateur
+        metriques.incrementer("alignement_contention_verrous_total", motif="verrou_expire")
+
+    return jsonify({'verrouille': verrouille, 'secondes_restantes': duree_verrou if verrouille else 0})
+
+
+@app.route("/validation/decisions", methods=["POST"])
+@login_required
+def enregistrer_lot_decisions():
+    """
+    Enregistre en une seule transaction un lot de décisions sur des entités TMS verrouillées par l'utilisateur.
+
+    Le corps de la requête est un JSON de la forme :
+        {"decisions": [{"tms_id": 123, "decision": "valider", "qids": ["Q1", "Q2"]},
+                       {"tms_id": 456, "decision": "refuser"},
+                       {"tms_id": 789, "decision": "passer"}]}
+    Le jeton CSRF est transmis dans l'en-tête X-CSRFToken.
+    Chaque décision est appliquée comme par les routes valider, refuser-tous-candidats et passer
+    (voir Historique.enregistrer_decisions) ; une décision en erreur n'empêche pas l'enregistrement des autres.
+
+    Returns:
+        Response: JSON {"success": bool, "message": str, "resultats": [...]} avec un résultat par décision
+        (tms_id, decision, success, message, id_decision, displayname, valides, refuses, passes)
+    """
+    donnees = request.get_json(silent=True)
+    decisions = donnees.get('decisions') if isinstance(donnees, dict) else None
+    if not isinstance(decisions, list) or not decisions:
+        return jsonify({'success': False, 'message': "Le corps de la requête doit contenir une liste 'decisions' non vide", 'resultats': []}), 400
+
+    taille_max = current_app.config['TAILLE_MAX_LOT_DECISIONS']
+    if len(decisions) > taille_max:
+        return jsonify({'success': False, 'message': f"Un lot ne peut pas contenir plus de {taille_max} décisions", 'resultats': []}), 400
+
+    for element in decisions:
+        if not isinstance(element, dict) \
+                or not isinstance(element.get('tms_id'), int) \
+                or element.get('decision') not in ("valider", "refuser", "passer") \
+                or not isinstance(element.get('qids', []), list):
+            return jsonify({'success': False, 'message': f"Décision invalide : {element}", 'resultats': []}), 400
+
+    success, message, resultats = Historique.enregistrer_decisions(
+        id_utilisateur=current_user.id_utilisateur,
+        decisions=decisions
+    )
+
+    return jsonify({'success': success, 'message': message, 'resultats': resultats}), 200 if success else 500
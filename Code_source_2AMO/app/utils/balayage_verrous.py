@@ -0,0 +1,57 @@
+import threading
+from datetime import datetime, timedelta
+
+from ..models.base_principale import TableTMS
+
+
+def liberer_verrous_expires(app):
+    """
+    Supprime les verrous expirés des entités TMS (voir TableTMS.liberer_verrous_expires).
+
+    Args:
+        app (Flask): Application Flask
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    with app.app_context():
+        seuil = datetime.now() - timedelta(minutes=app.config['TIMER_INACTIVITE_MINUTES'])
+        return TableTMS.liberer_verrous_expires(seuil)
+
+
+def _balayer(app, intervalle_secondes, arret):
+    """Boucle du thread de nettoyage, exécutée jusqu'à ce que l'évènement arret soit levé."""
+    while not arret.wait(intervalle_secondes):
+        try:
+            succes, message = liberer_verrous_expires(app)
+            if succes:
+                app.logger.debug(message)
+            else:
+                app.logger.error(message)
+        except Exception as e:
+            app.logger.error(f"Erreur lors du nettoyage des verrous expirés : {str(e)}")
+
+
+def demarrer_balayage_verrous(app, intervalle_minutes):
+    """
+    Lance le nettoyage périodique des verrous expirés dans un thread en arrière-plan.
+
+    Chaque processus de l'application lance son propre thread ; le verrou consultatif Postgres
+    pris par TableTMS.liberer_verrous_expires évite que plusieurs processus nettoient en même temps.
+
+    Args:
+        app (Flask): Application Flask
+        intervalle_minutes (int): Intervalle entre deux nettoyages
+
+    Returns:
+        threading.Event: Évènement à lever pour arrêter le thread
+    """
+    arret = threading.Event()
+    thread = threading.Thread(
+        target=_balayer,
+        args=(app, intervalle_minutes * 60, arret),
+        name="balayage_verrous",
+        daemon=True
+    )
+    thread.start()
+    return arret
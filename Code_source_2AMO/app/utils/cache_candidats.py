@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheCandidats:
+    """
+    Une classe pour conserver en mémoire les données Wikidata des candidats entre deux requêtes.
+
+    Les entrées sont indexées par le couple (qid, type_candidat) où type_candidat vaut 'Q5'
+    pour les personnes et 'autres' pour les autres types de candidats.
+    Chaque entrée a une durée de vie (TTL) et le cache est borné en taille : lorsque
+    la taille maximale est atteinte, l'entrée la moins récemment utilisée est supprimée (LRU).
+    Les entrées expirées ne sont pas supprimées : elles restent disponibles avec get_perime
+    comme dernière version connue, le temps de les actualiser (stale-while-revalidate).
+
+    Attributs
+    ---------
+    ttl_secondes : int
+        Durée de vie d'une entrée en secondes.
+    taille_max : int
+        Nombre maximal d'entrées conservées.
+    hits : int
+        Nombre de lectures ayant trouvé une entrée valide.
+    misses : int
+        Nombre de lectures n'ayant pas trouvé d'entrée valide (absente ou expirée).
+    evictions : int
+        Nombre d'entrées supprimées pour respecter la taille maximale.
+    perimes : int
+        Nombre d'entrées expirées servies par get_perime.
+    """
+
+    def __init__(self, ttl_secondes, taille_max):
+        self.ttl_secondes = ttl_secondes
+        self.taille_max = taille_max
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.perimes = 0
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def get(self, qid, type_candidat):
+        """
+        Récupère les données d'un candidat si elles sont présentes et non expirées.
+
+        Args:
+            qid (str): Identifiant Wikidata du candidat
+            type_candidat (str): 'Q5' ou 'autres'
+
+        Returns:
+            dict: Données du candidat ou None si absentes ou expirées
+        """
+        cle = (qid, type_candidat)
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                self.misses += 1
+                return None
+
+            date_stockage, donnees = entree
+            if time.monotonic() - date_stockage > self.ttl_secondes:
+                # L'entrée expirée est conservée pour get_perime jusqu'à son actualisation ou son éviction
+                self.misses += 1
+                return None
+
+            # L'entrée devient la plus récemment utilisée
+            self._entrees.move_to_end(cle)
+            self.hits += 1
+            return donnees
+
+    def get_perime(self, qid, type_candidat):
+        """
+        Récupère les données d'un candidat même si elles ont expiré (dernière version connue).
+
+        Args:
+            qid (str): Identifiant Wikidata du candidat
+            type_candidat (str): 'Q5' ou 'autres'
+
+        Returns:
+            dict: Données du candidat ou None si absentes
+        """
+        cle = (qid, type_candidat)
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                return None
+            self._entrees.move_to_end(cle)
+            self.perimes += 1
+            return entree[1]
+
+    def set(self, qid, type_candidat, donnees):
+        """
+        Enregistre les données d'un candidat dans le cache.
+
+        Args:
+            qid (str): Identifiant Wikidata du candidat
+            type_candidat (str): 'Q5' ou 'autres'
+            donnees (dict): Données à conserver
+        """
+        cle = (qid, type_candidat)
+        with self._verrou:
+            self._entrees[cle] = (time.monotonic(), donnees)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+                self.evictions += 1
+
+    def invalider(self, qid, type_candidat):
+        """
+        Supprime l'entrée d'un candidat du cache si elle existe.
+
+        Args:
+            qid (str): Identifiant Wikidata du candidat
+            type_candidat (str): 'Q5' ou 'autres'
+        """
+        with self._verrou:
+            self._entrees.pop((qid, type_candidat), None)
+
+    def vider(self):
+        """Supprime toutes les entrées du cache et remet les compteurs à zéro."""
+        with self._verrou:
+            self._entrees.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.perimes = 0
+
+    def statistiques(self):
+        """
+        Retourne les compteurs du cache.
+
+        Returns:
+            dict: taille, taille_max, hits, misses, evictions, perimes et taux de succès
+        """
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                'taille': len(self._entrees),
+                'taille_max': self.taille_max,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'perimes': self.perimes,
+                'taux_hits': self.hits / total if total else 0.0
+            }
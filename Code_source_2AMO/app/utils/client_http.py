@@ -0,0 +1,289 @@
+# Module sans dépendance à Flask : utilisé par l'application et par les scripts de Processus/Scripts
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+# Codes HTTP pour lesquels la requête est retentée (en respectant l'en-tête Retry-After s'il est présent)
+CODES_A_RETENTER = (429, 502, 503, 504)
+# Codes HTTP comptés comme des échecs par le disjoncteur (erreurs du serveur distant ou limitation de débit)
+CODES_ECHEC = (429, 500, 502, 503, 504)
+
+
+class CircuitOuvertError(requests.exceptions.ConnectionError):
+    """Levée sans appel réseau lorsque le disjoncteur d'un point d'accès est ouvert."""
+
+
+class Disjoncteur:
+    """
+    Un disjoncteur (circuit breaker) par point d'accès.
+
+    Après seuil_echecs échecs consécutifs, le disjoncteur s'ouvre : les requêtes échouent immédiatement
+    pendant delai_reouverture secondes. Passé ce délai, une seule requête d'essai est autorisée
+    (semi-ouvert) : un succès referme le disjoncteur, un échec le rouvre pour le même délai.
+
+    Attributs
+    ---------
+    seuil_echecs : int
+        Nombre d'échecs consécutifs qui ouvrent le disjoncteur.
+    delai_reouverture : float
+        Durée en secondes pendant laquelle le disjoncteur reste ouvert.
+    """
+
+    def __init__(self, seuil_echecs, delai_reouverture):
+        self.seuil_echecs = seuil_echecs
+        self.delai_reouverture = delai_reouverture
+        self._echecs_consecutifs = 0
+        self._date_ouverture = None
+        self._essai_en_cours = False
+        self._verrou = threading.Lock()
+
+    @property
+    def etat(self):
+        """'ferme', 'ouvert' ou 'semi-ouvert'."""
+        with self._verrou:
+            return self._etat()
+
+    def _etat(self):
+        if self._date_ouverture is None:
+            return 'ferme'
+        if time.monotonic() - self._date_ouverture < self.delai_reouverture:
+            return 'ouvert'
+        return 'semi-ouvert'
+
+    def autoriser(self):
+        """
+        Indique si une requête peut être envoyée.
+
+        Returns:
+            bool: False si le disjoncteur est ouvert ou si une requête d'essai est déjà en cours
+        """
+        with self._verrou:
+            etat = self._etat()
+            if etat == 'ferme':
+                return True
+            if etat == 'semi-ouvert' and not self._essai_en_cours:
+                self._essai_en_cours = True
+                return True
+            return False
+
+    def delai_restant(self):
+        """Nombre de secondes avant le passage à l'état semi-ouvert (0 si le disjoncteur n'est pas ouvert)."""
+        with self._verrou:
+            if self._date_ouverture is None:
+                return 0.0
+            return max(self.delai_reouverture - (time.monotonic() - self._date_ouverture), 0.0)
+
+    def succes(self):
+        """Enregistre un succès : le disjoncteur est refermé."""
+        with self._verrou:
+            self._echecs_consecutifs = 0
+            self._date_ouverture = None
+            self._essai_en_cours = False
+
+    def echec(self):
+        """Enregistre un échec : le disjoncteur s'ouvre au-delà du seuil ou si la requête d'essai échoue."""
+        with self._verrou:
+            self._echecs_consecutifs += 1
+            if self._essai_en_cours or self._echecs_consecutifs >= self.seuil_echecs:
+                self._date_ouverture = time.monotonic()
+            self._essai_en_cours = False
+
+
+class ClientHTTP:
+    """
+    Une classe pour envoyer les requêtes HTTP sortantes avec une session partagée.
+
+    - connexions persistantes (keep-alive) réutilisées entre les requêtes et les threads (pool urllib3)
+    - nouvelles tentatives bornées avec attente exponentielle (et aléa), en respectant l'en-tête
+      Retry-After des réponses 429 et 503
+    - un disjoncteur par point d'accès (schéma, hôte et chemin de l'URL) qui fait échouer immédiatement
+      les requêtes lorsque le service distant est indisponible
+    - compteurs de requêtes, d'erreurs et de latence par point d'accès (statistiques)
+
+    Attributs
+    ---------
+    session : requests.Session
+        Session HTTP partagée.
+    max_tentatives : int
+        Nombre maximal d'envois d'une même requête (1 = pas de nouvelle tentative).
+    attente_base : float
+        Attente en secondes avant la deuxième tentative, doublée à chaque tentative suivante.
+    attente_max : float
+        Attente maximale en secondes entre deux tentatives (y compris avec Retry-After).
+    timeout : float
+        Délai d'attente par défaut d'une réponse, en secondes.
+    attendre_disjoncteur : bool
+        Si True, une requête vers un point d'accès dont le disjoncteur est ouvert attend la fin du délai
+        de réouverture au lieu d'échouer immédiatement (scripts de traitement par lots, qui ne doivent
+        pas abandonner les QIDs restants après un épisode de limitation de débit).
+    """
+
+    def __init__(self, headers=None, verify=False, taille_pool=10, max_tentatives=3, attente_base=1.0,
+                 attente_max=30.0, timeout=30, seuil_echecs=5, delai_reouverture=60.0, attendre_disjoncteur=False):
+        self.session = requests.Session()
+        adaptateur = HTTPAdapter(pool_connections=taille_pool, pool_maxsize=taille_pool)
+        self.session.mount('https://', adaptateur)
+        self.session.mount('http://', adaptateur)
+        self.session.headers.update(headers or {})
+        self.session.verify = verify
+        if not verify:
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+        self.max_tentatives = max(max_tentatives, 1)
+        self.attente_base = attente_base
+        self.attente_max = attente_max
+        self.timeout = timeout
+        self.seuil_echecs = seuil_echecs
+        self.delai_reouverture = delai_reouverture
+        self.attendre_disjoncteur = attendre_disjoncteur
+
+        self._disjoncteurs = {}
+        self._compteurs = {}
+        self._verrou = threading.Lock()
+
+    @staticmethod
+    def point_acces(url):
+        """Point d'accès d'une URL (sans la chaîne de requête), clé des disjoncteurs et des compteurs."""
+        morceaux = urlsplit(url)
+        return f"{morceaux.scheme}://{morceaux.netloc}{morceaux.path}"
+
+    def _disjoncteur(self, point_acces):
+        with self._verrou:
+            if point_acces not in self._disjoncteurs:
+                self._disjoncteurs[point_acces] = Disjoncteur(self.seuil_echecs, self.delai_reouverture)
+            return self._disjoncteurs[point_acces]
+
+    def _compter(self, point_acces, duree=0.0, erreur=False, nouvelle_tentative=False, rejet=False):
+        with self._verrou:
+            compteurs = self._compteurs.setdefault(point_acces, {
+                'requetes': 0, 'erreurs': 0, 'nouvelles_tentatives': 0, 'rejets_disjoncteur': 0,
+                'duree_totale': 0.0, 'duree_max': 0.0
+            })
+            if rejet:
+                compteurs['rejets_disjoncteur'] += 1
+                return
+            compteurs['requetes'] += 1
+            compteurs['duree_totale'] += duree
+            compteurs['duree_max'] = max(compteurs['duree_max'], duree)
+            if erreur:
+                compteurs['erreurs'] += 1
+            if nouvelle_tentative:
+                compteurs['nouvelles_tentatives'] += 1
+
+    def _attente(self, tentative, response=None):
+        """
+        Durée d'attente avant une nouvelle tentative : en-tête Retry-After (secondes ou date HTTP)
+        s'il est présent, sinon attente exponentielle avec aléa. Bornée par attente_max.
+        """
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(max(float(retry_after), 0.0), self.attente_max)
+            except ValueError:
+                try:
+                    date_reessai = parsedate_to_datetime(retry_after)
+                    return min(max(date_reessai.timestamp() - time.time(), 0.0), self.attente_max)
+                except (TypeError, ValueError):
+                    pass
+        attente = self.attente_base * (2 ** (tentative - 1))
+        return min(attente + random.uniform(0, attente / 2), self.attente_max)
+
+    def _autoriser(self, point_acces, disjoncteur):
+        """
+        Attend, si attendre_disjoncteur est activé, que le disjoncteur autorise la requête.
+
+        Raises:
+            CircuitOuvertError: Si le disjoncteur est ouvert et que attendre_disjoncteur est désactivé
+        """
+        while not disjoncteur.autoriser():
+            self._compter(point_acces, rejet=True)
+            if not self.attendre_disjoncteur:
+                raise CircuitOuvertError(f"Point d'accès indisponible (disjoncteur ouvert) : {point_acces}")
+            # Délai de réouverture restant, ou requête d'essai d'un autre thread en cours
+            time.sleep(max(disjoncteur.delai_restant(), 1.0))
+
+    def requete(self, methode, url, **kwargs):
+        """
+        Envoie une requête HTTP avec nouvelles tentatives et disjoncteur.
+
+        Les erreurs de requests (réseau, réponse tronquée, redirections...) et les réponses 429, 502, 503
+        et 504 sont retentées jusqu'à max_tentatives ; la dernière réponse obtenue est retournée telle quelle
+        (à vérifier avec raise_for_status). Chaque envoi enregistre un succès ou un échec dans le disjoncteur.
+
+        Args:
+            methode (str): Méthode HTTP ('GET', 'POST'...)
+            url (str): URL de la requête
+            **kwargs: Arguments de requests.Session.request (params, headers, timeout...)
+
+        Returns:
+            requests.Response: Réponse HTTP
+
+        Raises:
+            CircuitOuvertError: Si le disjoncteur du point d'accès est ouvert (sauf avec attendre_disjoncteur)
+            requests.exceptions.RequestException: En cas d'erreur réseau à la dernière tentative
+        """
+        point_acces = self.point_acces(url)
+        disjoncteur = self._disjoncteur(point_acces)
+        kwargs.setdefault('timeout', self.timeout)
+
+        for tentative in range(1, self.max_tentatives + 1):
+            self._autoriser(point_acces, disjoncteur)
+
+            debut = time.perf_counter()
+            derniere = tentative == self.max_tentatives
+            try:
+                response = self.session.request(methode, url, **kwargs)
+            except requests.exceptions.RequestException:
+                self._compter(point_acces, time.perf_counter() - debut, erreur=True, nouvelle_tentative=not derniere)
+                disjoncteur.echec()
+                if derniere:
+                    raise
+                time.sleep(self._attente(tentative))
+                continue
+            except BaseException:
+                # Toute autre sortie libère aussi la requête d'essai du disjoncteur semi-ouvert
+                disjoncteur.echec()
+                raise
+
+            duree = time.perf_counter() - debut
+            if response.status_code in CODES_ECHEC:
+                disjoncteur.echec()
+            else:
+                disjoncteur.succes()
+
+            a_retenter = response.status_code in CODES_A_RETENTER and not derniere
+            self._compter(point_acces, duree, erreur=response.status_code >= 400, nouvelle_tentative=a_retenter)
+            if not a_retenter:
+                return response
+            time.sleep(self._attente(tentative, response))
+            response.close()
+
+    def get(self, url, **kwargs):
+        """Envoie une requête GET (voir requete)."""
+        return self.requete('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """Envoie une requête POST (voir requete)."""
+        return self.requete('POST', url, **kwargs)
+
+    def statistiques(self):
+        """
+        Retourne les compteurs par point d'accès.
+
+        Returns:
+            dict: point d'accès -> requetes, erreurs, nouvelles_tentatives, rejets_disjoncteur,
+            duree_totale, duree_max, duree_moyenne (secondes) et etat_disjoncteur
+        """
+        with self._verrou:
+            compteurs = {point_acces: dict(valeurs) for point_acces, valeurs in self._compteurs.items()}
+            disjoncteurs = dict(self._disjoncteurs)
+        for point_acces, valeurs in compteurs.items():
+            valeurs['duree_moyenne'] = valeurs['duree_totale'] / valeurs['requetes'] if valeurs['requetes'] else 0.0
+            valeurs['etat_disjoncteur'] = disjoncteurs[point_acces].etat
+        return compteurs
@@ -0,0 +1,158 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+
+from .metriques import metriques, observer_requetes_sql
+
+# Blocs compter_requetes en cours dans le thread (hors requête HTTP, par exemple dans un test)
+_local = threading.local()
+
+
+class BudgetRequetesDepasse(AssertionError):
+    """Levée en mode TESTING lorsqu'une route exécute plus de requêtes SQL que son budget (budget_requetes_sql)."""
+
+
+class ComptageRequetes:
+    """
+    Une classe pour compter les requêtes SQL exécutées pendant une requête HTTP ou un bloc compter_requetes.
+
+    Attributs
+    ---------
+    nombre : int
+        Nombre de requêtes SQL exécutées.
+    duree : float
+        Durée cumulée des requêtes SQL, en secondes.
+    instructions : collections.Counter
+        Nombre d'exécutions de chaque instruction SQL (texte avec ses paramètres fictifs).
+    """
+
+    def __init__(self):
+        self.nombre = 0
+        self.duree = 0.0
+        self.instructions = Counter()
+
+    def ajouter(self, instruction, duree):
+        """Enregistre l'exécution d'une instruction SQL."""
+        self.nombre += 1
+        self.duree += duree
+        self.instructions[instruction] += 1
+
+    def repetees(self, seuil):
+        """
+        Retourne les instructions exécutées au moins seuil fois : une même instruction répétée
+        avec des paramètres différents signale probablement une requête exécutée dans une boucle (N+1).
+
+        Args:
+            seuil (int): Nombre d'exécutions à partir duquel une instruction est signalée
+
+        Returns:
+            dict: instruction SQL -> nombre d'exécutions
+        """
+        return {instruction: nombre for instruction, nombre in self.instructions.items() if nombre >= seuil}
+
+
+def _comptages_actifs():
+    """Comptages à alimenter : celui de la requête HTTP en cours et les blocs compter_requetes du thread."""
+    comptages = list(getattr(_local, 'comptages', ()))
+    if has_request_context():
+        comptages.append(g.setdefault('comptage_sql', ComptageRequetes()))
+    return comptages
+
+
+def _compter_requete(conn, statement, duree):
+    """Ajoute la requête SQL aux comptages actifs (toutes bases confondues)."""
+    for comptage in _comptages_actifs():
+        comptage.ajouter(statement, duree)
+
+
+@contextmanager
+def compter_requetes():
+    """
+    Compte les requêtes SQL exécutées dans le bloc par le thread courant, par exemple dans un test :
+
+        with compter_requetes() as comptage:
+            TableTMS.verrouiller_entite(...)
+        assert comptage.nombre <= 4
+
+    Yields:
+        ComptageRequetes: Comptage alimenté jusqu'à la fin du bloc
+    """
+    comptage = ComptageRequetes()
+    if not hasattr(_local, 'comptages'):
+        _local.comptages = []
+    _local.comptages.append(comptage)
+    try:
+        yield comptage
+    finally:
+        _local.comptages.remove(comptage)
+
+
+def budget_requetes_sql(nombre_max):
+    """
+    Décorateur fixant le nombre maximal de requêtes SQL d'une route.
+
+    Un dépassement est journalisé en avertissement ; en mode TESTING, il lève BudgetRequetesDepasse
+    afin que les tests échouent sur une régression (requête ajoutée dans une boucle...).
+
+    Args:
+        nombre_max (int): Nombre maximal de requêtes SQL par requête HTTP sur la route
+    """
+    def decorateur(vue):
+        @wraps(vue)
+        def vue_avec_budget(*args, **kwargs):
+            g.budget_requetes_sql = nombre_max
+            return vue(*args, **kwargs)
+        return vue_avec_budget
+    return decorateur
+
+
+def activer_compteur_requetes(app):
+    """
+    Compte les requêtes SQL exécutées pendant chaque requête HTTP.
+
+    Le nombre de requêtes et leur durée cumulée sont renvoyés dans les en-têtes X-Requetes-SQL
+    et X-Duree-SQL-ms de la réponse et journalisés au niveau debug, afin de repérer les régressions.
+    Une même instruction exécutée au moins SEUIL_REQUETES_REPETEES fois pendant la requête est
+    signalée comme probable requête N+1 (avertissement et compteur alignement_requetes_repetees_total
+    de /metrics). Le nombre de requêtes est comparé au budget de la route (budget_requetes_sql).
+    Les requêtes exécutées hors requête HTTP (threads SPARQL, préchargement, nettoyage des verrous)
+    ne sont pas comptées, sauf dans un bloc compter_requetes.
+
+    Args:
+        app (Flask): Application Flask
+    """
+    # Même chronométrage que les phases bdd_<bind> de /metrics (utils/metriques.py)
+    observer_requetes_sql(_compter_requete)
+
+    metriques.declarer(
+        "alignement_requetes_repetees_total", "counter",
+        "Nombre d'instructions SQL répétées au moins SEUIL_REQUETES_REPETEES fois dans une requête HTTP (N+1 probables), par route"
+    )
+
+    @app.after_request
+    def exposer_nb_requetes_sql(response):
+        comptage = g.get('comptage_sql') or ComptageRequetes()
+        route = request.url_rule.rule if request.url_rule else "inconnue"
+        response.headers['X-Requetes-SQL'] = str(comptage.nombre)
+        response.headers['X-Duree-SQL-ms'] = f"{comptage.duree * 1000:.1f}"
+        app.logger.debug(f"{request.method} {request.path} : {comptage.nombre} requête(s) SQL en {comptage.duree * 1000:.1f} ms")
+
+        seuil = current_app.config['SEUIL_REQUETES_REPETEES']
+        if seuil > 0:
+            for instruction, nombre in comptage.repetees(seuil).items():
+                metriques.incrementer("alignement_requetes_repetees_total", route=route)
+                app.logger.warning(
+                    f"{request.method} {request.path} : requête SQL exécutée {nombre} fois (N+1 probable) : "
+                    f"{' '.join(instruction.split())[:300]}"
+                )
+
+        budget = g.get('budget_requetes_sql')
+        if budget is not None and comptage.nombre > budget:
+            message = f"{request.method} {request.path} : {comptage.nombre} requête(s) SQL pour un budget de {budget}"
+            if app.testing:
+                raise BudgetRequetesDepasse(message)
+            app.logger.warning(message)
+        return response
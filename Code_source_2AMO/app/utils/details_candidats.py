@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+import requests
+from flask import current_app
+from sqlalchemy import or_
+
+from ..app import db
+from ..models.base_principale import TableCandidats, CandidatsDetails
+from .requetes_sparql import client_wikidata, executer_requete_candidats
+
+# Nombre de QIDs par requête SPARQL et par enregistrement en base
+TAILLE_LOT_DETAILS = 50
+
+
+def type_requete(type_candidat):
+    """Type de requête SPARQL d'un candidat : 'Q5' pour les personnes, 'autres' sinon."""
+    return 'Q5' if type_candidat == 'Q5' else 'autres'
+
+
+def candidats_a_mettre_a_jour(age_max_jours=None):
+    """
+    Liste les candidats sans données précalculées ou dont les données sont plus anciennes que age_max_jours.
+
+    Args:
+        age_max_jours (int): Âge maximal des données en jours (None : seuls les candidats sans données)
+
+    Returns:
+        dict: type de requête ('Q5' ou 'autres') -> liste des QIDs
+    """
+    conditions = [CandidatsDetails.qid.is_(None)]
+    if age_max_jours is not None:
+        conditions.append(CandidatsDetails.date_mise_a_jour < datetime.now() - timedelta(days=age_max_jours))
+
+    candidats = db.session.query(TableCandidats.qid, TableCandidats.type_candidat).outerjoin(
+        CandidatsDetails, CandidatsDetails.qid == TableCandidats.qid
+    ).filter(
+        or_(*conditions)
+    ).order_by(TableCandidats.qid).all()
+
+    qids_par_type = {'Q5': [], 'autres': []}
+    for qid, type_candidat in candidats:
+        qids_par_type[type_requete(type_candidat)].append(qid)
+    return qids_par_type
+
+
+def remplir_details_candidats(age_max_jours=None, dumps=None, taille_lot=TAILLE_LOT_DETAILS):
+    """
+    Remplit la table candidats_details par lots, à partir des dumps locaux si disponibles,
+    sinon du point d'accès SPARQL (mêmes requêtes que la page de validation).
+    Les lots dont la requête SPARQL échoue sont ignorés et seront repris au lancement suivant.
+
+    Args:
+        age_max_jours (int): Âge maximal des données conservées en jours (None : seuls les candidats sans données)
+        dumps (DumpsCandidats): Dumps locaux des entités Wikidata (optionnel)
+        taille_lot (int): Nombre de QIDs par lot
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    nb_enregistres = 0
+    nb_en_erreur = 0
+    for type_candidat, qids in candidats_a_mettre_a_jour(age_max_jours).items():
+        for debut in range(0, len(qids), taille_lot):
+            lot = qids[debut:debut + taille_lot]
+
+            donnees = {}
+            if dumps is not None:
+                for qid in lot:
+                    candidat_raw = dumps.construire_candidat_raw(qid, type_candidat)
+                    if candidat_raw is not None:
+                        donnees[qid] = candidat_raw
+
+            qids_manquants = [qid for qid in lot if qid not in donnees]
+            if qids_manquants:
+                try:
+                    resultats = executer_requete_candidats(client_wikidata, qids_manquants, type_candidat)
+                    donnees.update({qid: resultats[qid] for qid in qids_manquants if qid in resultats})
+                except requests.exceptions.RequestException as e:
+                    current_app.logger.warning(f"Lot de candidats {type_candidat} ignoré : {str(e)}")
+                    nb_en_erreur += len(qids_manquants)
+
+            succes, message = CandidatsDetails.enregistrer([
+                {'qid': qid, 'type_candidat': type_candidat, 'donnees': candidat_raw}
+                for qid, candidat_raw in donnees.items()
+            ])
+            if not succes:
+                return False, message
+            nb_enregistres += len(donnees)
+
+    message = f"{nb_enregistres} candidat(s) enregistré(s) dans candidats_details"
+    if nb_en_erreur:
+        message += f", {nb_en_erreur} en erreur (à relancer)"
+    return True, message
@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+
+from .requetes_sparql import PREFIXE_ENTITE
+
+# Langues utilisées par le service de labels des requêtes SPARQL ("fr,mul,en")
+LANGUES_SERVICE_LABEL = ('fr', 'mul', 'en')
+# Langue des labels filtrés avec FILTER(LANG(...) = "fr") dans les requêtes SPARQL
+LANGUES_FR = ('fr',)
+
+
+def formater_date(valeur):
+    """
+    Formate une date Wikidata selon sa précision, comme le font les requêtes SPARQL.
+
+    Args:
+        valeur (dict): Valeur d'une déclaration de type date ({'time': ..., 'precision': ...})
+
+    Returns:
+        str: Date au format JJ/MM/AAAA, MM/AAAA, AAAA ou "[date imprécise]"
+    """
+    date = valeur.get('time', '').lstrip('+')
+    precision = valeur.get('precision')
+    if precision == 11:
+        return f"{date[8:10]}/{date[5:7]}/{date[0:4]}"
+    if precision == 10:
+        return f"{date[5:7]}/{date[0:4]}"
+    if precision == 9:
+        return date[0:4]
+    return "[date imprécise]"
+
+
+def sans_doublons(valeurs):
+    """Supprime les doublons et les valeurs vides d'une liste en conservant l'ordre."""
+    resultat = []
+    for valeur in valeurs:
+        if valeur and valeur not in resultat:
+            resultat.append(valeur)
+    return resultat
+
+
+class DumpsCandidats:
+    """
+    Une classe pour construire les données des candidats à partir des dumps JSON des entités Wikidata
+    (dossier json_full_dump_entites produit par recuperation_json_asynchrone_candidats.py)
+    et d'un fichier de labels des entités référencées (produit par recuperation_labels_entites_referencees.py).
+
+    Les données produites ont la même forme qu'une ligne de résultat des requêtes SPARQL de
+    requetes_sparql.py et peuvent donc être passées telles quelles à preprocess_candidat_info.
+
+    Attributs
+    ---------
+    dossier_dumps : str
+        Chemin du dossier contenant un fichier <QID>.json par candidat.
+    fichier_labels : str
+        Chemin du fichier JSON {QID: {langue: label}} des entités référencées.
+    """
+
+    def __init__(self, dossier_dumps, fichier_labels=None):
+        self.dossier_dumps = dossier_dumps
+        self.fichier_labels = fichier_labels
+        self._labels = None
+        self._verrou = threading.Lock()
+
+    def _charger_labels(self):
+        """Charge le fichier de labels au premier appel."""
+        with self._verrou:
+            if self._labels is None:
+                labels = {}
+                if self.fichier_labels and os.path.exists(self.fichier_labels):
+                    with open(self.fichier_labels, 'r', encoding='utf-8') as f:
+                        labels = json.load(f)
+                self._labels = labels
+        return self._labels
+
+    def label(self, qid, langues=LANGUES_SERVICE_LABEL):
+        """
+        Retourne le label d'une entité référencée dans la première langue disponible.
+
+        Args:
+            qid (str): Identifiant Wikidata de l'entité
+            langues (tuple): Langues par ordre de priorité
+
+        Returns:
+            str: Label de l'entité ou None si aucun label n'est connu dans ces langues
+        """
+        labels = self._charger_labels().get(qid, {})
+        for langue in langues:
+            if labels.get(langue):
+                return labels[langue]
+        return None
+
+    def charger_entite(self, qid):
+        """
+        Charge le dump JSON d'une entité.
+
+        Args:
+            qid (str): Identifiant Wikidata du candidat
+
+        Returns:
+            dict: Données de l'entité ou None si le dump est absent ou illisible
+        """
+        chemin = os.path.join(self.dossier_dumps, f"{qid}.json")
+        if not os.path.exists(chemin):
+            return None
+        try:
+            with open(chemin, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        # Gestion des différentes structures JSON (voir construction_des_tables.py)
+        if 'entities' in data and data['entities']:
+            return data['entities'].get(qid) or next(iter(data['entities'].values()))
+        if 'claims' in data:
+            return data
+        return None
+
+    @staticmethod
+    def _declarations(claims, propriete, tous_rangs=False):
+        """
+        Retourne les déclarations d'une propriété ayant une valeur.
+
+        Par défaut, seules les déclarations de meilleur rang sont retournées (équivalent de wdt:) :
+        les déclarations "preferred" si elles existent, sinon les "normal".
+        Avec tous_rangs=True, toutes les déclarations sont retournées (équivalent de p:/psv:).
+        """
+        declarations = [
+            claim for claim in claims.get(propriete, [])
+            if claim.get('mainsnak', {}).get('snaktype') == 'value'
+            and claim.get('mainsnak', {}).get('datavalue')
+        ]
+        if tous_rangs:
+            return declarations
+        preferees = [claim for claim in declarations if claim.get('rank') == 'preferred']
+        if preferees:
+            return preferees
+        return [claim for claim in declarations if claim.get('rank') == 'normal']
+
+    def _labels_propriete(self, claims, propriete, langues=LANGUES_SERVICE_LABEL):
+        """
+        Retourne les labels des entités valeurs d'une propriété.
+        Avec les langues du service de labels, le QID est utilisé à défaut de label (comme le fait SPARQL).
+        """
+        labels = []
+        for claim in self._declarations(claims, propriete):
+            valeur = claim['mainsnak']['datavalue'].get('value', {})
+            qid = valeur.get('id') if isinstance(valeur, dict) else None
+            if not qid:
+                continue
+            label = self.label(qid, langues)
+            if label is None and langues == LANGUES_SERVICE_LABEL:
+                label = qid
+            labels.append(label)
+        return sans_doublons(labels)
+
+    def _dates_propriete(self, claims, propriete):
+        """Retourne les dates formatées de toutes les déclarations d'une propriété."""
+        return sans_doublons([
+            formater_date(claim['mainsnak']['datavalue'].get('value', {}))
+            for claim in self._declarations(claims, propriete, tous_rangs=True)
+        ])
+
+    @staticmethod
+    def _texte_langue(valeurs, langues):
+        """Retourne la valeur d'un dictionnaire labels/descriptions dans la première langue disponible."""
+        for langue in langues:
+            if langue in valeurs and valeurs[langue].get('value'):
+                return valeurs[langue]['value']
+        return None
+
+    def construire_candidat_raw(self, qid, type_candidat):
+        """
+        Construit les données brutes d'un candidat à partir de son dump JSON.
+
+        Args:
+            qid (str): Identifiant Wikidata du candidat
+            type_candidat (str): 'Q5' pour les personnes, 'autres' sinon
+
+        Returns:
+            dict: Données du candidat au format d'une ligne de résultat SPARQL, ou None si le dump est absent
+        """
+        entite = self.charger_entite(qid)
+        if entite is None:
+            return None
+
+        claims = entite.get('claims', {})
+        aliases = [alias.get('value') for alias in entite.get('aliases', {}).get('fr', [])]
+
+        candidat_raw = {
+            'item': f"{PREFIXE_ENTITE}{qid}",
+            'itemLabel': self._texte_langue(entite.get('labels', {}), LANGUES_SERVICE_LABEL) or qid,
+            'autresLabels': "; ".join(sans_doublons(aliases)),
+        }
+        description = self._texte_langue(entite.get('descriptions', {}), LANGUES_FR)
+        if description:
+            candidat_raw['description'] = description
+
+        if type_candidat == 'Q5':
+            genres = self._labels_propriete(claims, 'P21', LANGUES_FR)
+            if genres:
+                candidat_raw['genreLabel'] = genres[0]
+            peres = self._labels_propriete(claims, 'P22')
+            if peres:
+                candidat_raw['pereLabel'] = peres[0]
+            meres = self._labels_propriete(claims, 'P25')
+            if meres:
+                candidat_raw['mereLabel'] = meres[0]
+
+            candidat_raw.update({
+                'types': "; ".join(self._labels_propriete(claims, 'P31')),
+                'datesNaissance': "; ".join(self._dates_propriete(claims, 'P569')),
+                'datesMort': "; ".join(self._dates_propriete(claims, 'P570')),
+                'lieuxNaissance': "; ".join(self._labels_propriete(claims, 'P19')),
+                'lieuxMort': "; ".join(self._labels_propriete(claims, 'P20')),
+                'occupations': "; ".join(self._labels_propriete(claims, 'P106', LANGUES_FR)),
+                'nationalites': "; ".join(self._labels_propriete(claims, 'P27', LANGUES_FR)),
+                'freresOuSoeurs': "; ".join(self._labels_propriete(claims, 'P3373')),
+                'enfants': "; ".join(self._labels_propriete(claims, 'P40')),
+                'conjoints': "; ".join(self._labels_propriete(claims, 'P26')),
+                'eleves': "; ".join(self._labels_propriete(claims, 'P802')),
+                'eleveDe': "; ".join(self._labels_propriete(claims, 'P1066')),
+            })
+        else:
+            candidat_raw.update({
+                'types': "; ".join(self._labels_propriete(claims, 'P31', LANGUES_FR)),
+                'entitesRemplacees': "; ".join(self._labels_propriete(claims, 'P1365')),
+                'remplaceeParx': "; ".join(self._labels_propriete(claims, 'P1366')),
+                'pays': "; ".join(self._labels_propriete(claims, 'P17', LANGUES_FR)),
+                'sieges': "; ".join(self._labels_propriete(claims, 'P159')),
+                'datesFondation': "; ".join(self._dates_propriete(claims, 'P571')),
+                'datesDissolution': "; ".join(self._dates_propriete(claims, 'P576')),
+            })
+
+        return candidat_raw
@@ -0,0 +1,257 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Bornes (en secondes) des histogrammes de durée
+BORNES_DUREES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Nom de la base principale dans les métriques (les autres bases portent le nom de leur bind)
+BIND_PRINCIPAL = "principale"
+
+# Fonctions appelées avec (connexion, instruction, durée) après chaque requête SQL : un seul chronométrage
+# alimente les phases bdd_<bind> des métriques et le comptage des requêtes (utils/compteur_requetes.py)
+_observateurs_sql = []
+
+
+def _echapper(valeur):
+    """Échappe une valeur de label au format texte Prometheus."""
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formater_labels(labels, supplementaires=()):
+    """Formate un tuple de paires (label, valeur) au format {label="valeur",...}."""
+    paires = tuple(labels) + tuple(supplementaires)
+    if not paires:
+        return ""
+    return "{" + ",".join(f'{nom}="{_echapper(valeur)}"' for nom, valeur in paires) + "}"
+
+
+class Metriques:
+    """
+    Une classe pour conserver en mémoire des compteurs et des histogrammes et les exposer
+    au format texte de Prometheus (route /metrics).
+
+    Les valeurs sont propres à chaque processus de l'application.
+
+    Attributs
+    ---------
+    bornes : tuple
+        Bornes supérieures des intervalles des histogrammes.
+    """
+
+    def __init__(self, bornes=BORNES_DUREES):
+        self.bornes = tuple(sorted(bornes))
+        self._types = {}
+        self._aides = {}
+        # nom -> {labels (tuple de paires): valeur} pour les compteurs
+        # nom -> {labels: [nombre par intervalle..., somme, nombre total]} pour les histogrammes
+        self._valeurs = {}
+        self._verrou = threading.Lock()
+
+    def declarer(self, nom, type_metrique, aide):
+        """
+        Déclare une métrique, afin qu'elle soit exposée avec sa description même sans valeur.
+
+        Args:
+            nom (str): Nom de la métrique
+            type_metrique (str): 'counter' ou 'histogram'
+            aide (str): Description de la métrique
+        """
+        with self._verrou:
+            self._types[nom] = type_metrique
+            self._aides[nom] = aide
+            self._valeurs.setdefault(nom, {})
+
+    def incrementer(self, nom, valeur=1, **labels):
+        """Ajoute valeur au compteur nom pour les labels donnés."""
+        cle = tuple(sorted(labels.items()))
+        with self._verrou:
+            self._types.setdefault(nom, 'counter')
+            valeurs = self._valeurs.setdefault(nom, {})
+            valeurs[cle] = valeurs.get(cle, 0) + valeur
+
+    def observer(self, nom, valeur, **labels):
+        """Enregistre une observation (une durée en secondes) dans l'histogramme nom pour les labels donnés."""
+        cle = tuple(sorted(labels.items()))
+        with self._verrou:
+            self._types.setdefault(nom, 'histogram')
+            valeurs = self._valeurs.setdefault(nom, {})
+            serie = valeurs.setdefault(cle, [0] * len(self.bornes) + [0.0, 0])
+            for i, borne in enumerate(self.bornes):
+                if valeur <= borne:
+                    serie[i] += 1
+            serie[-2] += valeur
+            serie[-1] += 1
+
+    def exposer(self):
+        """
+        Retourne toutes les métriques au format texte de Prometheus (version 0.0.4).
+
+        Returns:
+            str: Lignes # HELP, # TYPE et valeurs de chaque métrique
+        """
+        with self._verrou:
+            valeurs = {nom: {cle: list(v) if isinstance(v, list) else v for cle, v in series.items()}
+                       for nom, series in self._valeurs.items()}
+            types = dict(self._types)
+            aides = dict(self._aides)
+
+        lignes = []
+        for nom in sorted(valeurs):
+            if nom in aides:
+                lignes.append(f"# HELP {nom} {aides[nom]}")
+            lignes.append(f"# TYPE {nom} {types[nom]}")
+            for cle, valeur in sorted(valeurs[nom].items()):
+                if types[nom] == 'histogram':
+                    for borne, nombre in zip(self.bornes, valeur):
+                        lignes.append(f"{nom}_bucket{_formater_labels(cle, [('le', borne)])} {nombre}")
+                    lignes.append(f"{nom}_bucket{_formater_labels(cle, [('le', '+Inf')])} {valeur[-1]}")
+                    lignes.append(f"{nom}_sum{_formater_labels(cle)} {valeur[-2]}")
+                    lignes.append(f"{nom}_count{_formater_labels(cle)} {valeur[-1]}")
+                else:
+                    lignes.append(f"{nom}{_formater_labels(cle)} {valeur}")
+        return "\n".join(lignes) + "\n"
+
+
+# Registre des métriques de l'application
+metriques = Metriques()
+metriques.declarer(
+    "alignement_requete_duree_secondes", "histogram",
+    "Durée de traitement des requêtes HTTP par route"
+)
+metriques.declarer(
+    "alignement_requete_phase_duree_secondes", "histogram",
+    "Durée des phases des requêtes HTTP par route : bdd_<bind>, http_sortant, pretraitement, rendu"
+)
+metriques.declarer(
+    "alignement_selection_file_secondes_total", "counter",
+    "Temps cumulé de sélection et de verrouillage des entités TMS dans la file de validation"
+)
+metriques.declarer(
+    "alignement_selection_file_total", "counter",
+    "Nombre de sélections dans la file de validation, par résultat (entite ou vide)"
+)
+metriques.declarer(
+    "alignement_contention_verrous_total", "counter",
+    "Nombre de verrous d'entités TMS perdus par l'utilisateur qui les détenait, par motif"
+)
+
+
+def _debut_requete_sql(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('debuts_requetes_sql', []).append(time.perf_counter())
+
+
+def _fin_requete_sql(conn, cursor, statement, parameters, context, executemany):
+    debuts = conn.info.get('debuts_requetes_sql')
+    if not debuts:
+        return
+    duree = time.perf_counter() - debuts.pop()
+    for observateur in _observateurs_sql:
+        observateur(conn, statement, duree)
+
+
+def _erreur_requete_sql(contexte_exception):
+    connexion = contexte_exception.connection
+    if connexion is not None and connexion.info.get('debuts_requetes_sql'):
+        connexion.info['debuts_requetes_sql'].pop()
+
+
+def observer_requetes_sql(observateur):
+    """
+    Enregistre une fonction appelée après chaque requête SQL, toutes bases confondues.
+
+    Les écouteurs d'évènements SQLAlchemy (un seul chronométrage par requête SQL) sont installés
+    au premier enregistrement.
+
+    Args:
+        observateur (callable): Fonction appelée avec (connexion, instruction SQL, durée en secondes)
+    """
+    if not _observateurs_sql:
+        event.listen(Engine, "before_cursor_execute", _debut_requete_sql)
+        event.listen(Engine, "after_cursor_execute", _fin_requete_sql)
+        event.listen(Engine, "handle_error", _erreur_requete_sql)
+    _observateurs_sql.append(observateur)
+
+
+def ajouter_duree(phase, duree):
+    """
+    Ajoute une durée à une phase de la requête HTTP en cours (sans effet hors requête HTTP).
+
+    Args:
+        phase (str): Nom de la phase (bdd_principale, http_sortant, pretraitement, rendu...)
+        duree (float): Durée en secondes
+    """
+    if has_request_context():
+        durees = g.setdefault('durees_phases', {})
+        durees[phase] = durees.get(phase, 0.0) + duree
+
+
+@contextmanager
+def mesurer(phase):
+    """Mesure la durée du bloc et l'ajoute à une phase de la requête HTTP en cours (voir ajouter_duree)."""
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        ajouter_duree(phase, time.perf_counter() - debut)
+
+
+def activer_metriques(app, db):
+    """
+    Instrumente les requêtes HTTP de l'application.
+
+    Pour chaque route, la durée totale de la requête est enregistrée, ainsi que le temps passé
+    dans chaque base de données (bdd_principale, bdd_donnees_TMS), dans les appels HTTP sortants
+    (phase http_sortant, mesurée par les routes autour de la récupération des données Wikidata),
+    dans le prétraitement des candidats (pretraitement) et dans le rendu des templates (rendu).
+    Les requêtes SQL exécutées hors requête HTTP (threads SPARQL, préchargement, nettoyage
+    des verrous) ne sont pas comptées.
+
+    Args:
+        app (Flask): Application Flask
+        db (SQLAlchemy): Extension Flask-SQLAlchemy, pour nommer la base de chaque requête SQL
+    """
+    with app.app_context():
+        noms_binds = {
+            engine: BIND_PRINCIPAL if bind is None else bind
+            for bind, engine in db.engines.items()
+        }
+
+    def ajouter_duree_bdd(conn, statement, duree):
+        ajouter_duree(f"bdd_{noms_binds.get(conn.engine, 'autre')}", duree)
+
+    observer_requetes_sql(ajouter_duree_bdd)
+
+    def debut_rendu(sender, template, context, **extra):
+        g.debut_rendu = time.perf_counter()
+
+    def fin_rendu(sender, template, context, **extra):
+        debut = g.pop('debut_rendu', None)
+        if debut is not None:
+            ajouter_duree('rendu', time.perf_counter() - debut)
+
+    before_render_template.connect(debut_rendu, app, weak=False)
+    template_rendered.connect(fin_rendu, app, weak=False)
+
+    @app.before_request
+    def demarrer_mesure_requete():
+        g.debut_requete = time.perf_counter()
+
+    @app.after_request
+    def enregistrer_mesure_requete(response):
+        debut = g.get('debut_requete')
+        if debut is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else "inconnue"
+        metriques.observer(
+            "alignement_requete_duree_secondes", time.perf_counter() - debut,
+            route=route, methode=request.method
+        )
+        for phase, duree in g.get('durees_phases', {}).items():
+            metriques.observer("alignement_requete_phase_duree_secondes", duree, route=route, phase=phase)
+        return response
@@ -0,0 +1,90 @@
+import os
+
+from sqlalchemy import text
+
+from ..app import db
+from ..config import BASE_DIR
+
+# Scripts SQL numérotés (NNNN_description.sql), appliqués dans l'ordre de leur nom
+DOSSIER_MIGRATIONS = os.path.join(BASE_DIR, "migrations")
+
+# Table des migrations déjà appliquées, créée au premier lancement
+TABLE_MIGRATIONS = "app_alignement.schema_migrations"
+
+
+def lister_migrations(dossier=DOSSIER_MIGRATIONS):
+    """
+    Liste les scripts de migration du dossier.
+
+    Args:
+        dossier (str): Chemin du dossier des migrations
+
+    Returns:
+        list: (version, chemin) triés par version, la version étant le nom du fichier sans extension
+    """
+    return [
+        (os.path.splitext(fichier)[0], os.path.join(dossier, fichier))
+        for fichier in sorted(os.listdir(dossier))
+        if fichier.endswith(".sql")
+    ]
+
+
+def migrations_appliquees():
+    """
+    Crée si besoin la table des migrations et retourne les versions déjà appliquées.
+
+    Returns:
+        set: Versions présentes dans app_alignement.schema_migrations
+    """
+    db.session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {TABLE_MIGRATIONS} ("
+        "version varchar(100) NOT NULL PRIMARY KEY, "
+        "date_application timestamp DEFAULT CURRENT_TIMESTAMP NOT NULL)"
+    ))
+    db.session.commit()
+    return set(db.session.execute(text(f"SELECT version FROM {TABLE_MIGRATIONS}")).scalars())
+
+
+def appliquer_migrations(dossier=DOSSIER_MIGRATIONS):
+    """
+    Applique dans l'ordre les migrations qui ne l'ont pas encore été.
+
+    Chaque script est exécuté avec l'enregistrement de sa version dans une seule transaction :
+    en cas d'erreur, la migration est annulée et les suivantes ne sont pas appliquées.
+    Les scripts sont écrits pour pouvoir être rejoués sur une base dont le schéma a été
+    modifié à la main (IF NOT EXISTS).
+
+    Args:
+        dossier (str): Chemin du dossier des migrations
+
+    Returns:
+        tuple: (success: bool, message: str, versions appliquées: list)
+    """
+    appliquees = []
+    try:
+        deja_appliquees = migrations_appliquees()
+    except Exception as e:
+        db.session.rollback()
+        return False, f"Erreur lors de la lecture des migrations appliquées : {str(e)}", appliquees
+
+    for version, chemin in lister_migrations(dossier):
+        if version in deja_appliquees:
+            continue
+        try:
+            with open(chemin, "r", encoding="utf-8") as f:
+                script = f.read()
+            # exec_driver_sql : le script est transmis tel quel (plusieurs instructions, casts ::)
+            db.session.connection().exec_driver_sql(script)
+            db.session.execute(
+                text(f"INSERT INTO {TABLE_MIGRATIONS} (version) VALUES (:version)"),
+                {"version": version}
+            )
+            db.session.commit()
+            appliquees.append(version)
+        except Exception as e:
+            db.session.rollback()
+            return False, f"Erreur lors de la migration {version} : {str(e)}", appliquees
+
+    if not appliquees:
+        return True, "Aucune migration à appliquer", appliquees
+    return True, f"{len(appliquees)} migration(s) appliquée(s) : {', '.join(appliquees)}", appliquees
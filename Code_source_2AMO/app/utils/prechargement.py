@@ -0,0 +1,188 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from ..app import db
+from ..models.base_principale import TableTMS, TableCandidats, CandidatsDetails, RelationsTMSCandidats
+from .details_candidats import type_requete
+from .requetes_sparql import TIMEOUT_SPARQL, NB_THREADS_SPARQL, recuperer_candidats_par_type
+
+# Un seul thread : les préchargements sont sérialisés et ne concurrencent pas les pages affichées
+executeur_prechargement = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prechargement")
+
+# Récupération groupée des candidats des entités affichées (pool distinct : la tâche attend elle-même executeur_sparql)
+executeur_entites_affichees = ThreadPoolExecutor(max_workers=NB_THREADS_SPARQL, thread_name_prefix="entite_affichee")
+
+# Utilisateurs pour lesquels un préchargement est déjà en attente ou en cours
+_prechargements_en_cours = set()
+# Entités TMS affichées dont les candidats sont en cours de récupération : tms_id -> threading.Event
+_entites_affichees_en_cours = {}
+_verrou = threading.Lock()
+
+
+def precharger_candidats_entite(tms_id, cache, dumps=None):
+    """
+    Met en cache les données Wikidata des candidats d'une entité TMS.
+
+    Args:
+        tms_id (int): Identifiant de l'entité TMS
+        cache (CacheCandidats): Cache des données candidats
+        dumps (DumpsCandidats): Dumps locaux des entités Wikidata (optionnel)
+
+    Returns:
+        dict: type_candidat -> message d'erreur pour les types dont la récupération a échoué
+    """
+    candidats = db.session.query(
+        TableCandidats.qid, TableCandidats.type_candidat, CandidatsDetails.type_candidat, CandidatsDetails.donnees
+    ).join(
+        RelationsTMSCandidats, RelationsTMSCandidats.qid == TableCandidats.qid
+    ).outerjoin(
+        CandidatsDetails, CandidatsDetails.qid == TableCandidats.qid
+    ).filter(
+        RelationsTMSCandidats.tms_id == tms_id
+    ).all()
+
+    qids_par_type = {'Q5': [], 'autres': []}
+    details = {}
+    for qid, type_candidat, type_details, donnees in candidats:
+        qids_par_type[type_requete(type_candidat)].append(qid)
+        if donnees is not None and type_details == type_requete(type_candidat):
+            details[qid] = donnees
+
+    # Les candidats ayant des données précalculées (candidats_details) ne sont pas demandés à Wikidata
+    qids_par_type = {
+        type_candidat: [qid for qid in qids if qid not in details]
+        for type_candidat, qids in qids_par_type.items()
+    }
+    _, erreurs, _ = recuperer_candidats_par_type(qids_par_type, cache, dumps)
+    return erreurs
+
+
+def _precharger_entite_affichee(app, tms_id, cache, dumps, termine):
+    """Tâche exécutée en arrière-plan par precharger_entite_affichee."""
+    try:
+        with app.app_context():
+            erreurs = precharger_candidats_entite(tms_id, cache, dumps)
+            if erreurs:
+                app.logger.warning(f"Récupération incomplète des candidats de l'entité TMS {tms_id} : {erreurs}")
+    except Exception as e:
+        app.logger.error(f"Erreur lors de la récupération des candidats de l'entité TMS {tms_id} : {str(e)}")
+    finally:
+        with _verrou:
+            _entites_affichees_en_cours.pop(tms_id, None)
+        termine.set()
+
+
+def precharger_entite_affichee(tms_id, cache, dumps=None):
+    """
+    Lance en arrière-plan la récupération des données Wikidata de tous les candidats de l'entité TMS
+    affichée, en une requête SPARQL par type de candidat, au lieu d'une requête par carte de candidat.
+
+    Les cartes des candidats (route /validation/candidat/<tms_id>/<qid>) attendent la fin de cette
+    récupération avec attendre_entite_affichee puis lisent leurs données dans le cache.
+
+    Args:
+        tms_id (int): Identifiant de l'entité TMS affichée
+        cache (CacheCandidats): Cache des données candidats
+        dumps (DumpsCandidats): Dumps locaux des entités Wikidata (optionnel)
+
+    Returns:
+        bool: True si la récupération a été lancée, False si elle est déjà en cours pour l'entité
+    """
+    with _verrou:
+        if tms_id in _entites_affichees_en_cours:
+            return False
+        termine = threading.Event()
+        _entites_affichees_en_cours[tms_id] = termine
+
+    executeur_entites_affichees.submit(
+        _precharger_entite_affichee,
+        current_app._get_current_object(),
+        tms_id,
+        cache,
+        dumps,
+        termine
+    )
+    return True
+
+
+def attendre_entite_affichee(tms_id, delai=TIMEOUT_SPARQL):
+    """
+    Attend la fin de la récupération des candidats de l'entité TMS lancée par precharger_entite_affichee.
+
+    Args:
+        tms_id (int): Identifiant de l'entité TMS affichée
+        delai (float): Durée maximale d'attente, en secondes
+
+    Returns:
+        bool: False si la récupération est encore en cours à l'issue du délai, True sinon
+        (terminée ou aucune récupération en cours pour l'entité)
+    """
+    with _verrou:
+        termine = _entites_affichees_en_cours.get(tms_id)
+    return termine is None or termine.wait(delai)
+
+
+def _precharger_entite_suivante(app, id_utilisateur, preferences, tms_id_courant, cache, dumps):
+    """Tâche exécutée en arrière-plan par precharger_entite_suivante."""
+    try:
+        with app.app_context():
+            seuil = datetime.now() - timedelta(minutes=app.config['TIMER_INACTIVITE_MINUTES'])
+            entite_suivante = TableTMS.selectionner_entite(
+                id_utilisateur=id_utilisateur,
+                preferences=preferences,
+                seuil=seuil,
+                tms_ids_exclus=[tms_id_courant] if tms_id_courant else []
+            )
+            if entite_suivante is None:
+                return
+
+            erreurs = precharger_candidats_entite(entite_suivante.tms_id, cache, dumps)
+            if erreurs:
+                app.logger.warning(f"Préchargement incomplet de l'entité TMS {entite_suivante.tms_id} : {erreurs}")
+            else:
+                app.logger.debug(f"Entité TMS {entite_suivante.tms_id} préchargée pour l'utilisateur {id_utilisateur}")
+    except Exception as e:
+        app.logger.error(f"Erreur lors du préchargement pour l'utilisateur {id_utilisateur} : {str(e)}")
+    finally:
+        with _verrou:
+            _prechargements_en_cours.discard(id_utilisateur)
+
+
+def precharger_entite_suivante(id_utilisateur, preferences, tms_id_courant, cache, dumps=None):
+    """
+    Lance en arrière-plan le préchargement de la prochaine entité TMS probable d'un utilisateur.
+
+    L'entité suivante est déterminée avec les mêmes règles de préférences et de priorité que
+    get_entite_tms (TableTMS.requete_file_validation), en excluant l'entité actuellement affichée.
+    Si le bail de l'utilisateur n'est pas épuisé (TAILLE_BAIL_ENTITES), il s'agit de l'entité suivante
+    du bail, déjà verrouillée pour lui. Seules les données Wikidata de ses candidats sont mises en cache
+    afin que le prochain affichage de /validation n'attende pas les requêtes SPARQL.
+
+    Args:
+        id_utilisateur (int): Identifiant de l'utilisateur
+        preferences (list): Préférences de domaines de l'utilisateur
+        tms_id_courant (int): Identifiant de l'entité TMS affichée
+        cache (CacheCandidats): Cache des données candidats
+        dumps (DumpsCandidats): Dumps locaux des entités Wikidata (optionnel)
+
+    Returns:
+        bool: True si le préchargement a été lancé, False si un préchargement est déjà en cours pour l'utilisateur
+    """
+    with _verrou:
+        if id_utilisateur in _prechargements_en_cours:
+            return False
+        _prechargements_en_cours.add(id_utilisateur)
+
+    executeur_prechargement.submit(
+        _precharger_entite_suivante,
+        current_app._get_current_object(),
+        id_utilisateur,
+        list(preferences),
+        tms_id_courant,
+        cache,
+        dumps
+    )
+    return True
@@ -0,0 +1,464 @@
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+from .client_http import ClientHTTP
+from ..config import Config
+
+SPARQL_ENDPOINT = Config.SPARQL_ENDPOINT
+HEADERS = {"Accept": "application/sparql-results+json","User-Agent": "2AMO/0.1 (https://www.musee-orsay.fr/; benoit.deshayes@musee-orsay.fr)"}
+PREFIXE_ENTITE = 'http://www.wikidata.org/entity/'
+TIMEOUT_SPARQL = 30
+NB_THREADS_SPARQL = 4
+
+# Pool de threads partagé pour exécuter en parallèle les requêtes des différents types de candidats
+executeur_sparql = ThreadPoolExecutor(max_workers=NB_THREADS_SPARQL, thread_name_prefix="sparql")
+
+# Actualisation en arrière-plan des données expirées servies depuis le cache (un seul thread)
+executeur_rafraichissement = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rafraichissement")
+# Candidats (qid, type_candidat) dont l'actualisation est déjà en attente ou en cours
+_rafraichissements_en_cours = set()
+_verrou_rafraichissements = threading.Lock()
+
+# Client HTTP partagé par tous les threads : connexions persistantes vers le point d'accès SPARQL,
+# nouvelles tentatives (429/503 avec Retry-After) et disjoncteur si Wikidata est indisponible
+# (attente totale bornée pour ne pas bloquer l'affichage de /validation)
+client_wikidata = ClientHTTP(
+    headers=HEADERS,
+    verify=False,
+    taille_pool=NB_THREADS_SPARQL + 1,
+    max_tentatives=2,
+    attente_base=1.0,
+    attente_max=5.0,
+    timeout=TIMEOUT_SPARQL,
+    seuil_echecs=3,
+    delai_reouverture=60.0
+)
+
+
+def extraire_qid(candidat_raw):
+    """
+    Extrait le QID d'un résultat SPARQL à partir de l'URI de l'item.
+
+    Args:
+        candidat_raw (dict): Données brutes du candidat
+
+    Returns:
+        str: QID du candidat ou chaîne vide
+    """
+    return candidat_raw.get('item', '').replace(PREFIXE_ENTITE, '') if candidat_raw.get('item') else ''
+
+
+def construire_requete_q5(qids):
+    """
+    Construit la requête SPARQL des candidats de type Q5 (personnes).
+
+    Args:
+        qids (list): QIDs des candidats
+
+    Returns:
+        str: Requête SPARQL
+    """
+    qid_values_q5 = " ".join(f"wd:{qid}" for qid in qids)
+    return f"""
+    SELECT ?item ?itemLabel
+        ?genreLabel
+        (GROUP_CONCAT(DISTINCT ?altLabel; separator="; ") AS ?autresLabels)
+        (GROUP_CONCAT(DISTINCT ?typeLabel; separator="; ") AS ?types)
+        (GROUP_CONCAT(DISTINCT ?naissanceFormatee; separator="; ") AS ?datesNaissance)
+        (GROUP_CONCAT(DISTINCT ?mortFormatee; separator="; ") AS ?datesMort)
+        (GROUP_CONCAT(DISTINCT ?lieuNaissanceLabel; separator="; ") AS ?lieuxNaissance)
+        (GROUP_CONCAT(DISTINCT ?lieuMortLabel; separator="; ") AS ?lieuxMort)
+        (GROUP_CONCAT(DISTINCT ?occupationLabel; separator="; ") AS ?occupations)
+        (GROUP_CONCAT(DISTINCT ?nationaliteLabel; separator="; ") AS ?nationalites)
+        ?pereLabel
+        ?mereLabel
+        (GROUP_CONCAT(DISTINCT ?frereOuSoeurLabel; separator="; ") AS ?freresOuSoeurs)
+        (GROUP_CONCAT(DISTINCT ?enfantLabel; separator="; ") AS ?enfants)
+        (GROUP_CONCAT(DISTINCT ?conjointLabel; separator="; ") AS ?conjoints)
+        (GROUP_CONCAT(DISTINCT ?elevesLabel; separator="; ") AS ?eleves)
+        (GROUP_CONCAT(DISTINCT ?eleveDeLabel; separator="; ") AS ?eleveDe)
+        ?description
+    WHERE {{
+    VALUES ?item {{ {qid_values_q5} }}
+    OPTIONAL {{
+        ?item wdt:P21 ?genre.
+        ?genre rdfs:label ?genreLabel.
+        FILTER(LANG(?genreLabel) = "fr")
+    }}
+    OPTIONAL {{
+        ?item skos:altLabel ?altLabel.
+        FILTER(LANG(?altLabel) = "fr")
+    }}
+    OPTIONAL {{
+        ?item wdt:P31 ?type.
+    }}
+    OPTIONAL {{
+        ?item p:P569 ?naissanceStatement.
+        ?naissanceStatement psv:P569 ?naissanceNode.
+        ?naissanceNode wikibase:timeValue ?dateNaissance.
+        ?naissanceNode wikibase:timePrecision ?precisionNaissance.
+        BIND(STR(?dateNaissance) AS ?naissanceStr)
+        BIND(
+        IF(?precisionNaissance = 11,
+            CONCAT(SUBSTR(?naissanceStr, 9, 2), "/", SUBSTR(?naissanceStr, 6, 2), "/", SUBSTR(?naissanceStr, 1, 4)),
+        IF(?precisionNaissance = 10,
+            CONCAT(SUBSTR(?naissanceStr, 6, 2), "/", SUBSTR(?naissanceStr, 1, 4)),
+        IF(?precisionNaissance = 9,
+            SUBSTR(?naissanceStr, 1, 4),
+            "[date imprécise]"))) AS ?naissanceFormatee)
+    }}
+    OPTIONAL {{
+        ?item p:P570 ?mortStatement.
+        ?mortStatement psv:P570 ?mortNode.
+        ?mortNode wikibase:timeValue ?dateMort.
+        ?mortNode wikibase:timePrecision ?precisionMort.
+        BIND(STR(?dateMort) AS ?mortStr)
+        BIND(
+        IF(?precisionMort = 11,
+            CONCAT(SUBSTR(?mortStr, 9, 2), "/", SUBSTR(?mortStr, 6, 2), "/", SUBSTR(?mortStr, 1, 4)),
+        IF(?precisionMort = 10,
+            CONCAT(SUBSTR(?mortStr, 6, 2), "/", SUBSTR(?mortStr, 1, 4)),
+        IF(?precisionMort = 9,
+            SUBSTR(?mortStr, 1, 4),
+            "[date imprécise]"))) AS ?mortFormatee)
+    }}
+    OPTIONAL {{
+        ?item wdt:P19 ?lieuNaissance.
+    }}
+    OPTIONAL {{
+        ?item wdt:P20 ?lieuMort.          
+        }}
+    OPTIONAL {{
+        ?item wdt:P106 ?occupation.
+        ?occupation rdfs:label ?occupationLabel.
+        FILTER(LANG(?occupationLabel) = "fr")
+    }}
+    OPTIONAL {{
+        ?item wdt:P27 ?nationalite.
+        ?nationalite rdfs:label ?nationaliteLabel.
+        FILTER(LANG(?nationaliteLabel) = "fr")
+    }}
+    OPTIONAL {{
+        ?item wdt:P22 ?pere.
+    }}
+    OPTIONAL {{
+        ?item wdt:P25 ?mere.
+    }}
+    OPTIONAL {{
+        ?item wdt:P3373 ?frereOuSoeur.
+    }}
+    OPTIONAL {{
+        ?item wdt:P40 ?enfant.
+    }}
+    OPTIONAL {{
+        ?item wdt:P26 ?conjoint.
+    }}
+    OPTIONAL {{
+        ?item wdt:P802 ?eleves.
+    }}
+    OPTIONAL {{
+        ?item wdt:P1066 ?eleveDe.
+    }}
+    OPTIONAL {{
+        ?item schema:description ?description.
+        FILTER(LANG(?description) = "fr")
+    }}
+    SERVICE wikibase:label {{
+        bd:serviceParam wikibase:language "fr,mul,en".
+        ?type rdfs:label ?typeLabel.
+        ?lieuNaissance rdfs:label ?lieuNaissanceLabel.
+        ?lieuMort rdfs:label ?lieuMortLabel.
+        ?pere rdfs:label ?pereLabel.
+        ?mere rdfs:label ?mereLabel.
+        ?frereOuSoeur rdfs:label ?frereOuSoeurLabel.
+        ?enfant rdfs:label ?enfantLabel.
+        ?conjoint rdfs:label ?conjointLabel.
+        ?eleves rdfs:label ?elevesLabel.
+        ?eleveDe rdfs:label ?eleveDeLabel.
+        ?item rdfs:label ?itemLabel.
+    }}
+    }}
+    GROUP BY ?item ?itemLabel ?genreLabel ?description ?pereLabel ?mereLabel
+    """
+
+def construire_requete_autres(qids):
+    """
+    Construit la requête SPARQL des candidats d'autres types (organisations, lieux, etc.).
+
+    Args:
+        qids (list): QIDs des candidats
+
+    Returns:
+        str: Requête SPARQL
+    """
+    qid_values_autres = " ".join(f"wd:{qid}" for qid in qids)
+    return f"""
+    SELECT ?item ?itemLabel
+        (GROUP_CONCAT(DISTINCT ?altLabel; separator="; ") AS ?autresLabels)
+        (GROUP_CONCAT(DISTINCT ?typeLabel; separator="; ") AS ?types)
+        (GROUP_CONCAT(DISTINCT ?entiteRemplaceeLabel; separator="; ") AS ?entitesRemplacees)
+        (GROUP_CONCAT(DISTINCT ?remplaceeParLabel; separator="; ") AS ?remplaceeParx)
+        (GROUP_CONCAT(DISTINCT ?paysLabel; separator="; ") AS ?pays)
+        (GROUP_CONCAT(DISTINCT ?siegeLabel; separator="; ") AS ?sieges)
+        (GROUP_CONCAT(DISTINCT ?fondationFormatee; separator="; ") AS ?datesFondation)
+        (GROUP_CONCAT(DISTINCT ?dissolutionFormatee; separator="; ") AS ?datesDissolution)
+        ?description
+    WHERE {{
+    VALUES ?item {{ {qid_values_autres} }}
+
+    OPTIONAL {{
+        ?item skos:altLabel ?altLabel.
+        FILTER(LANG(?altLabel) = "fr")
+    }}
+
+    OPTIONAL {{
+        ?item wdt:P31 ?type.
+        ?type rdfs:label ?typeLabel.
+        FILTER(LANG(?typeLabel) = "fr")
+    }}
+
+    OPTIONAL {{
+        ?item wdt:P1365 ?entiteRemplacee.
+    }}
+
+    OPTIONAL {{
+        ?item wdt:P1366 ?remplaceePar.
+    }}
+
+    OPTIONAL {{
+        ?item wdt:P17 ?pays.
+        ?pays rdfs:label ?paysLabel.
+        FILTER(LANG(?paysLabel) = "fr")
+    }}
+
+    OPTIONAL {{
+        ?item wdt:P159 ?siege.
+    }}
+
+    OPTIONAL {{
+        ?item p:P571 ?fondationStatement.
+        ?fondationStatement psv:P571 ?fondationNode.
+        ?fondationNode wikibase:timeValue ?dateFondation.
+        ?fondationNode wikibase:timePrecision ?precisionFondation.
+        BIND(STR(?dateFondation) AS ?fondationStr)
+        BIND(
+        IF(?precisionFondation = 11,
+            CONCAT(SUBSTR(?fondationStr, 9, 2), "/", SUBSTR(?fondationStr, 6, 2), "/", SUBSTR(?fondationStr, 1, 4)),
+        IF(?precisionFondation = 10,
+            CONCAT(SUBSTR(?fondationStr, 6, 2), "/", SUBSTR(?fondationStr, 1, 4)),
+        IF(?precisionFondation = 9,
+            SUBSTR(?fondationStr, 1, 4),
+            "[date imprécise]"))) AS ?fondationFormatee)
+    }}
+
+    OPTIONAL {{
+        ?item p:P576 ?dissolutionStatement.
+        ?dissolutionStatement psv:P576 ?dissolutionNode.
+        ?dissolutionNode wikibase:timeValue ?dateDissolution.
+        ?dissolutionNode wikibase:timePrecision ?precisionDissolution.
+        BIND(STR(?dateDissolution) AS ?dissolutionStr)
+        BIND(
+        IF(?precisionDissolution = 11,
+            CONCAT(SUBSTR(?dissolutionStr, 9, 2), "/", SUBSTR(?dissolutionStr, 6, 2), "/", SUBSTR(?dissolutionStr, 1, 4)),
+        IF(?precisionDissolution = 10,
+            CONCAT(SUBSTR(?dissolutionStr, 6, 2), "/", SUBSTR(?dissolutionStr, 1, 4)),
+        IF(?precisionDissolution = 9,
+            SUBSTR(?dissolutionStr, 1, 4),
+            "[date imprécise]"))) AS ?dissolutionFormatee)
+    }}
+
+    OPTIONAL {{
+        ?item schema:description ?description.
+        FILTER(LANG(?description) = "fr")
+    }}
+
+    SERVICE wikibase:label {{
+        bd:serviceParam wikibase:language "fr,mul,en".
+        ?item rdfs:label ?itemLabel.
+        ?siege rdfs:label ?siegeLabel.
+        ?entiteRemplacee rdfs:label ?entiteRemplaceeLabel.
+        ?remplaceePar rdfs:label ?remplaceeParLabel.
+    }}
+    }}
+    GROUP BY ?item ?itemLabel ?description
+    """
+
+def executer_requete_candidats(client, qids, type_candidat):
+    """
+    Exécute la requête SPARQL correspondant au type de candidat et indexe les résultats par QID.
+
+    Args:
+        client (ClientHTTP): Client HTTP à utiliser
+        qids (list): QIDs des candidats
+        type_candidat (str): 'Q5' pour les personnes, 'autres' sinon
+
+    Returns:
+        dict: QID -> données brutes du candidat (valeurs des bindings SPARQL)
+
+    Raises:
+        requests.exceptions.RequestException: En cas d'erreur réseau ou de réponse HTTP en erreur
+    """
+    if type_candidat == 'Q5':
+        requete = construire_requete_q5(qids)
+    else:
+        requete = construire_requete_autres(qids)
+
+    response = client.get(
+        SPARQL_ENDPOINT,
+        params={'query': requete},
+        timeout=TIMEOUT_SPARQL
+    )
+
+    if response.status_code != 200:
+        current_app.logger.error(f"Erreur SPARQL {type_candidat}: {response.status_code}")
+        response.raise_for_status()
+
+    resultats = {}
+    for result in response.json().get('results', {}).get('bindings', []):
+        candidat_raw = {}
+        for key, value in result.items():
+            candidat_raw[key] = value.get('value', '')
+        resultats[extraire_qid(candidat_raw)] = candidat_raw
+    return resultats
+
+
+def _rafraichir_candidats(app, qids, type_candidat, cache):
+    """Tâche exécutée en arrière-plan par rafraichir_candidats."""
+    try:
+        with app.app_context():
+            for qid, candidat_raw in executer_requete_candidats(client_wikidata, qids, type_candidat).items():
+                cache.set(qid, type_candidat, candidat_raw)
+            app.logger.debug(f"{len(qids)} candidat(s) {type_candidat} actualisé(s) en arrière-plan")
+    except Exception as e:
+        app.logger.warning(f"Actualisation des candidats {type_candidat} impossible, dernière version conservée : {str(e)}")
+    finally:
+        with _verrou_rafraichissements:
+            _rafraichissements_en_cours.difference_update((qid, type_candidat) for qid in qids)
+
+
+def rafraichir_candidats(qids, type_candidat, cache):
+    """
+    Lance en arrière-plan l'actualisation des données expirées de candidats servies depuis le cache.
+    Les candidats dont l'actualisation est déjà en cours sont ignorés ; en cas d'échec (Wikidata lent
+    ou indisponible), la dernière version connue reste dans le cache.
+
+    Args:
+        qids (list): QIDs des candidats
+        type_candidat (str): 'Q5' pour les personnes, 'autres' sinon
+        cache (CacheCandidats): Cache des données candidats
+    """
+    with _verrou_rafraichissements:
+        qids = [qid for qid in qids if (qid, type_candidat) not in _rafraichissements_en_cours]
+        _rafraichissements_en_cours.update((qid, type_candidat) for qid in qids)
+    if qids:
+        executeur_rafraichissement.submit(
+            _rafraichir_candidats, current_app._get_current_object(), qids, type_candidat, cache
+        )
+
+
+def recuperer_donnees_candidats(client, qids, type_candidat, cache, dumps=None, details=None):
+    """
+    Récupère les données brutes des candidats en passant par le cache, les données précalculées
+    en base (table candidats_details) puis les dumps locaux.
+
+    Les données expirées du cache sont servies immédiatement comme dernière version connue
+    et actualisées en arrière-plan (stale-while-revalidate) : l'affichage ne dépend pas de la
+    disponibilité du point d'accès SPARQL pour les candidats déjà vus.
+    Seuls les QIDs absents du cache et des dumps sont demandés au point d'accès SPARQL,
+    en une seule requête. Les données obtenues sont enregistrées dans le cache.
+
+    Args:
+        client (ClientHTTP): Client HTTP à utiliser
+        qids (list): QIDs des candidats
+        type_candidat (str): 'Q5' pour les personnes, 'autres' sinon
+        cache (CacheCandidats): Cache des données candidats
+        dumps (DumpsCandidats): Dumps locaux des entités Wikidata (optionnel)
+        details (dict): QID -> données précalculées du candidat, lues avec les relations de l'entité (optionnel)
+
+    Returns:
+        tuple: (dict: QID -> données brutes du candidat, set: QIDs servis dans une version expirée)
+
+    Raises:
+        requests.exceptions.RequestException: En cas d'erreur réseau
+    """
+    resultats = {}
+    qids_perimes = set()
+    qids_manquants = []
+    for qid in qids:
+        candidat_raw = cache.get(qid, type_candidat)
+        if candidat_raw is None and details:
+            candidat_raw = details.get(qid)
+        if candidat_raw is None and dumps is not None:
+            candidat_raw = dumps.construire_candidat_raw(qid, type_candidat)
+            if candidat_raw is not None:
+                cache.set(qid, type_candidat, candidat_raw)
+        if candidat_raw is None:
+            candidat_raw = cache.get_perime(qid, type_candidat)
+            if candidat_raw is not None:
+                qids_perimes.add(qid)
+        if candidat_raw is not None:
+            resultats[qid] = candidat_raw
+        else:
+            qids_manquants.append(qid)
+
+    if qids_perimes:
+        rafraichir_candidats(sorted(qids_perimes), type_candidat, cache)
+
+    # Repli sur le point d'accès SPARQL pour les QIDs absents du cache et des dumps
+    if qids_manquants:
+        nouveaux = executer_requete_candidats(client, qids_manquants, type_candidat)
+        for qid, candidat_raw in nouveaux.items():
+            cache.set(qid, type_candidat, candidat_raw)
+        resultats.update(nouveaux)
+
+    return resultats, qids_perimes
+
+
+def recuperer_candidats_par_type(qids_par_type, cache, dumps=None, details=None):
+    """
+    Récupère en parallèle les données brutes des candidats de chaque type (Q5 et autres).
+    Chaque type est traité dans un thread du pool executeur_sparql : le temps d'attente
+    est celui de la requête la plus lente et non la somme des requêtes.
+
+    Un échec sur un type n'empêche pas de retourner les données des autres types :
+    les types en échec sont listés dans le dictionnaire des erreurs.
+
+    Args:
+        qids_par_type (dict): type_candidat -> liste des QIDs
+        cache (CacheCandidats): Cache des données candidats
+        dumps (DumpsCandidats): Dumps locaux des entités Wikidata (optionnel)
+        details (dict): QID -> données précalculées du candidat (table candidats_details, optionnel)
+
+    Returns:
+        tuple: (donnees: dict type_candidat -> {QID: données brutes}, erreurs: dict type_candidat -> message,
+        perimes: set des QIDs servis dans une version expirée en cours d'actualisation)
+    """
+    app_courante = current_app._get_current_object()
+
+    def tache(type_candidat, qids):
+        # Chaque thread a son propre contexte d'application, le client HTTP (et son pool de connexions) est partagé
+        with app_courante.app_context():
+            return recuperer_donnees_candidats(client_wikidata, qids, type_candidat, cache, dumps, details)
+
+    futures = {
+        type_candidat: executeur_sparql.submit(tache, type_candidat, qids)
+        for type_candidat, qids in qids_par_type.items() if qids
+    }
+
+    donnees = {}
+    erreurs = {}
+    perimes = set()
+    for type_candidat, future in futures.items():
+        try:
+            donnees[type_candidat], perimes_type = future.result()
+            perimes |= perimes_type
+        except requests.exceptions.RequestException as e:
+            current_app.logger.error(f"Erreur lors de la requête SPARQL {type_candidat}: {str(e)}")
+            erreurs[type_candidat] = str(e)
+        except Exception as e:
+            current_app.logger.error(f"Erreur inattendue pour les candidats {type_candidat}: {str(e)}")
+            erreurs[type_candidat] = str(e)
+
+    return donnees, erreurs, perimes
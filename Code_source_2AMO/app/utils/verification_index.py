@@ -0,0 +1,129 @@
+from datetime import datetime
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from ..app import db
+from ..models.base_principale import TableTMS, RelationsTMSCandidats, CandidatsDetails, Historique, Decisions
+
+
+class Explain(Executable, ClauseElement):
+    """Instruction EXPLAIN (FORMAT JSON) d'une requête SQLAlchemy, exécutée avec ses paramètres."""
+
+    inherit_cache = False
+
+    def __init__(self, requete):
+        self.requete = requete
+
+
+@compiles(Explain, "postgresql")
+def _compiler_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.requete, **kw)
+
+
+def index_utilises(plan):
+    """
+    Parcourt un plan d'exécution au format JSON et retourne les index utilisés.
+
+    Args:
+        plan (dict): Nœud du plan ("Plan" d'un résultat EXPLAIN (FORMAT JSON))
+
+    Returns:
+        set: Noms des index parcourus par le plan et ses sous-plans
+    """
+    index = {plan["Index Name"]} if "Index Name" in plan else set()
+    for sous_plan in plan.get("Plans", []):
+        index |= index_utilises(sous_plan)
+    return index
+
+
+def requetes_a_verifier():
+    """
+    Construit les requêtes principales de l'application et les index qu'elles doivent utiliser.
+
+    Les requêtes sont construites avec les mêmes méthodes que les routes (identifiant
+    d'utilisateur et valeurs fictifs : seul le plan est calculé, rien n'est exécuté).
+
+    Returns:
+        list: (description, requête, index attendus: set)
+    """
+    maintenant = datetime.now()
+    return [
+        (
+            "File de validation (TableTMS.requete_file_validation)",
+            TableTMS.requete_file_validation(0, ['tous'], maintenant).limit(1).statement,
+            {"table_tms_file_validation_idx", "entites_passees_pkey"}
+        ),
+        (
+            "Filtre sur les préférences de domaines",
+            select(TableTMS.tms_id).where(TableTMS.dossiers_documentation.contains(["verification"])),
+            {"table_tms_dossiers_documentation_idx"}
+        ),
+        (
+            "Candidats d'une entité (/validation)",
+            select(RelationsTMSCandidats.id_match, RelationsTMSCandidats.score_flag).where(
+                RelationsTMSCandidats.tms_id == 0
+            ),
+            {"relations_tms_candidats_tms_id_score_flag_idx"}
+        ),
+        (
+            "Données précalculées des candidats d'une entité (/validation)",
+            select(CandidatsDetails.donnees).where(CandidatsDetails.qid.in_(["Q0"])),
+            {"candidats_details_pkey"}
+        ),
+        (
+            "Décisions d'un utilisateur (/historique)",
+            select(Decisions).where(Decisions.id_utilisateur == 0).order_by(Decisions.id_decision.desc()).limit(10),
+            {"decisions_utilisateur_idx"}
+        ),
+        (
+            "Actions des décisions d'une page (/historique)",
+            select(Historique.id_match).where(Historique.id_decision.in_([0])),
+            {"historique_decision_idx"}
+        ),
+        (
+            "Bail d'entités d'un utilisateur (TableTMS.verrouiller_entite)",
+            select(TableTMS.tms_id).where(
+                TableTMS.verrouille_par == 0,
+                TableTMS.date_heure_verrouillage >= maintenant
+            ),
+            {"table_tms_bail_idx"}
+        ),
+        (
+            "Nettoyage des verrous expirés (TableTMS.liberer_verrous_expires)",
+            select(TableTMS.tms_id).where(TableTMS.date_heure_verrouillage < maintenant),
+            {"table_tms_verrous_idx"}
+        ),
+    ]
+
+
+def verifier_index():
+    """
+    Vérifie avec EXPLAIN que les requêtes principales de l'application utilisent leurs index.
+
+    Les parcours séquentiels sont désactivés le temps de la vérification (enable_seqscan) :
+    sur une base de test peu volumineuse, Postgres les préfère aux index, ce qui masquerait
+    un index absent ou inutilisable par la requête. La transaction est annulée à la fin.
+
+    Returns:
+        tuple: (success: bool, lignes du rapport: list)
+    """
+    rapport = []
+    succes = True
+    try:
+        db.session.execute(text("SET LOCAL enable_seqscan = off"))
+        for description, requete, index_attendus in requetes_a_verifier():
+            plan = db.session.execute(Explain(requete)).scalar()[0]["Plan"]
+            manquants = index_attendus - index_utilises(plan)
+            if manquants:
+                succes = False
+                rapport.append(f"ÉCHEC {description} : index non utilisé(s) {', '.join(sorted(manquants))}")
+            else:
+                rapport.append(f"OK    {description} : {', '.join(sorted(index_attendus))}")
+    except Exception as e:
+        succes = False
+        rapport.append(f"Erreur lors de la vérification des index : {str(e)}")
+    finally:
+        db.session.rollback()
+    return succes, rapport
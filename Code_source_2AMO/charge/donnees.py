@@ -0,0 +1,157 @@
+import random
+
+from sqlalchemy import insert, text
+from werkzeug.security import generate_password_hash
+
+from app.app import db
+from app.models.base_principale import TableTMS, TableCandidats, RelationsTMSCandidats, Utilisateurs, StatistiquesDomaines
+from app.models.donnees_PRA import Constituent
+from app.utils.migrations import appliquer_migrations
+
+# Domaine des adresses des relecteurs simulés : seule une base ne contenant que ces utilisateurs est vidée.
+# Domaine réservé .example : les domaines .local et .test sont refusés par le validateur Email du formulaire de connexion
+DOMAINE_RELECTEURS = "charge.example"
+
+# Dossiers de documentation attribués aux entités TMS synthétiques (choix du formulaire de préférences)
+DOSSIERS = ['architecture', 'arts décoratifs', 'peinture', 'photographie', 'sculpture']
+
+# Tables de l'application vidées avant chaque génération (CASCADE : lieux et évènements des candidats)
+TABLES_APPLICATION = (
+    "historique", "decisions", "entites_passees", "candidats_details", "relations_tms_candidats",
+    "table_candidats", "table_tms", "statistiques_domaines", "utilisateurs"
+)
+
+# Nombre de lignes par instruction INSERT
+TAILLE_LOT_INSERTION = 5000
+
+
+def email_relecteur(numero):
+    """Adresse de connexion du relecteur simulé numero."""
+    return f"relecteur{numero}@{DOMAINE_RELECTEURS}"
+
+
+def preparer_base():
+    """
+    Crée le schéma app_alignement, les tables des modèles (y compris la table des constituants
+    de la base donnees_TMS) puis applique les migrations (index, table des migrations).
+
+    L'URI de la base doit fixer search_path sur app_alignement, comme en production,
+    pour que les tables des modèles soient créées dans ce schéma.
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    try:
+        db.session.execute(text("CREATE SCHEMA IF NOT EXISTS app_alignement"))
+        db.session.commit()
+        db.create_all()
+    except Exception as e:
+        db.session.rollback()
+        return False, f"Erreur lors de la création des tables : {str(e)}"
+    succes, message, _ = appliquer_migrations()
+    return succes, message
+
+
+def verifier_base_de_test():
+    """
+    Vérifie que la base ne contient que des relecteurs simulés, avant de la vider.
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    nb_autres = db.session.query(Utilisateurs).filter(
+        ~Utilisateurs.email.like(f"%@{DOMAINE_RELECTEURS}")
+    ).count()
+    if nb_autres:
+        return False, f"La base contient {nb_autres} utilisateur(s) réel(s) : elle ne sera pas vidée"
+    return True, "Base de test"
+
+
+def _inserer(modele, lignes):
+    """Insère les lignes par lots de TAILLE_LOT_INSERTION (INSERT multi-lignes)."""
+    for debut in range(0, len(lignes), TAILLE_LOT_INSERTION):
+        db.session.execute(insert(modele), lignes[debut:debut + TAILLE_LOT_INSERTION])
+
+
+def generer_donnees(nb_entites, nb_candidats_par_entite, nb_relecteurs, mot_de_passe, graine=0):
+    """
+    Vide les tables de l'application et les remplit avec un jeu de données synthétique :
+    entités TMS et constituants, candidats (90 % de personnes), relations avec des scores aléatoires
+    et relecteurs simulés. Les priorités de la file et les statistiques par domaine sont recalculées.
+
+    Args:
+        nb_entites (int): Nombre d'entités TMS
+        nb_candidats_par_entite (int): Nombre de candidats par entité TMS
+        nb_relecteurs (int): Nombre de relecteurs simulés (relecteur1@charge.example...)
+        mot_de_passe (str): Mot de passe commun des relecteurs
+        graine (int): Graine du générateur aléatoire, pour rejouer le même jeu de données
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    succes, message = verifier_base_de_test()
+    if not succes:
+        return False, message
+
+    aleatoire = random.Random(graine)
+    try:
+        db.session.execute(text(f"TRUNCATE {', '.join(TABLES_APPLICATION)} RESTART IDENTITY CASCADE"))
+        db.session.query(Constituent).delete(synchronize_session=False)
+
+        entites, constituants, candidats, relations = [], [], [], []
+        for tms_id in range(1, nb_entites + 1):
+            dossiers = aleatoire.sample(DOSSIERS, aleatoire.randint(1, 2))
+            nom = f"Personne synthétique {tms_id}"
+            entites.append({
+                'tms_id': tms_id, 'displayname': nom, 'dossiers_documentation': dossiers,
+                'nb_roles_creation': aleatoire.randint(0, 20)
+            })
+            constituants.append({
+                'constituentid': tms_id, 'displayname': nom,
+                'autres_labels': {'variante': [f"P. synthétique {tms_id}"]},
+                'date_naissance': str(1780 + tms_id % 120), 'date_mort': str(1840 + tms_id % 120),
+                'commune_naissance': "Paris", 'pays_naissance': "France",
+                'biographie': f"Biographie synthétique de l'entité {tms_id}.",
+                'roles_creation': ["peintre"], 'dossiers_documentation': dossiers,
+                'activites': [{'date_activite': str(1820 + tms_id % 100), 'commune': "Paris", 'pays': "France"}]
+            })
+            for rang in range(nb_candidats_par_entite):
+                qid = f"Q{1000000 + (tms_id - 1) * nb_candidats_par_entite + rang}"
+                candidats.append({
+                    'qid': qid, 'type_candidat': 'Q5' if aleatoire.random() < 0.9 else 'Q43229',
+                    'label': f"Candidat synthétique {qid[1:]}", 'nb_id_externes': aleatoire.randint(0, 30)
+                })
+                relations.append({
+                    'tms_id': tms_id, 'qid': qid,
+                    'score_api': round(aleatoire.uniform(40, 100), 1),
+                    'score_flag': aleatoire.randint(-5, 5),
+                    'score_flag_nom': aleatoire.choice((-1, 0, 1)),
+                    'score_flag_date_naissance': aleatoire.choice((-1, 0, 1, None)),
+                    'score_flag_date_mort': aleatoire.choice((-1, 0, 1, None)),
+                    'score_flag_lieu_naissance': aleatoire.choice((-1, 0, 1, None)),
+                    'score_flag_lieu_mort': aleatoire.choice((-1, 0, 1, None))
+                })
+
+        # Un seul calcul de hachage : il est volontairement coûteux
+        mdp = generate_password_hash(mot_de_passe)
+        _inserer(Utilisateurs, [
+            {'email': email_relecteur(numero), 'mdp': mdp} for numero in range(1, nb_relecteurs + 1)
+        ])
+        _inserer(TableTMS, entites)
+        _inserer(Constituent, constituants)
+        _inserer(TableCandidats, candidats)
+        _inserer(RelationsTMSCandidats, relations)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return False, f"Erreur lors de la génération des données : {str(e)}"
+
+    succes, message = TableTMS.calculer_priorites()
+    if not succes:
+        return False, message
+    succes, message = StatistiquesDomaines.reconstruire()
+    if not succes:
+        return False, message
+    return True, (
+        f"{nb_entites} entité(s) TMS, {len(candidats)} candidat(s) et {nb_relecteurs} relecteur(s) générés"
+    )
@@ -0,0 +1,413 @@
+"""
+Test de charge de la boucle de relecture : connexion -> /validation (et cartes des candidats)
+-> valider / refuser / passer -> /historique, avec plusieurs relecteurs simulés en parallèle.
+
+À lancer depuis le dossier Code_source_2AMO, sur une base Postgres locale dédiée (elle est vidée) :
+
+    python -m charge.simulation --base "postgresql://postgres@localhost/alignement_charge?options=-csearch_path%3Dapp_alignement" --relecteurs 5 20 50
+
+L'application Flask est lancée dans le processus (serveur werkzeug multi-threads) et interroge
+un point d'accès SPARQL factice local (charge/sparql_factice.py) : aucun accès réseau n'est nécessaire.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+# Champ caché du jeton CSRF, quel que soit l'ordre de ses attributs (form.hidden_tag() les trie : id, name, type, value)
+MOTIF_CHAMP_CSRF = re.compile(r'<input\b[^>]*\bname="csrf_token"[^>]*>')
+MOTIF_VALEUR = re.compile(r'\bvalue="([^"]*)"')
+MOTIF_TMS_ID = re.compile(r'/validation/passer/(\d+)')
+MOTIF_CARTE = re.compile(r'data-url="([^"]+)"')
+MOTIF_QID = re.compile(r'name="candidats_selectionnes"\s+value="([^"]+)"')
+MOTIF_ERREUR = re.compile(r'class="alert alert-danger"')
+
+# Répartition des décisions des relecteurs simulés
+POIDS_DECISIONS = {'valider': 0.5, 'refuser': 0.3, 'passer': 0.2}
+
+# Routes des décisions (formulaires de la page de validation)
+ROUTES_DECISIONS = {
+    'valider': "/validation/valider/{tms_id}",
+    'refuser': "/validation/refuser-tous-candidats/{tms_id}",
+    'passer': "/validation/passer/{tms_id}",
+}
+
+
+def lire_jeton_csrf(html):
+    """Retourne la valeur du premier champ csrf_token de la page (None si la page n'en contient pas)."""
+    champ = MOTIF_CHAMP_CSRF.search(html)
+    valeur = MOTIF_VALEUR.search(champ.group(0)) if champ else None
+    return valeur.group(1) if valeur else None
+
+
+def percentile(durees_triees, rang):
+    """Percentile (méthode du rang le plus proche) d'une liste de durées triées."""
+    if not durees_triees:
+        return 0.0
+    indice = max(0, math.ceil(rang / 100 * len(durees_triees)) - 1)
+    return durees_triees[indice]
+
+
+class Resultats:
+    """
+    Une classe pour collecter, depuis les threads des relecteurs, les durées par route,
+    les erreurs, les décisions et les conflits de verrous.
+
+    Un conflit est compté lorsqu'une entité TMS est affichée à un relecteur alors qu'un autre
+    relecteur l'a encore à l'écran (attribution double), ou lorsqu'une décision est refusée
+    par l'application (message d'erreur affiché sur la page suivante).
+    """
+
+    def __init__(self):
+        self.durees = defaultdict(list)
+        self.erreurs = defaultdict(int)
+        self.nb_decisions = 0
+        self.attributions_doubles = 0
+        self.decisions_refusees = 0
+        self.files_vides = 0
+        self._entites_affichees = {}
+        self._verrou = threading.Lock()
+
+    def enregistrer(self, route, duree, erreur=False):
+        with self._verrou:
+            self.durees[route].append(duree)
+            if erreur:
+                self.erreurs[route] += 1
+
+    def afficher_entite(self, tms_id, relecteur):
+        with self._verrou:
+            detenteur = self._entites_affichees.get(tms_id)
+            if detenteur is not None and detenteur != relecteur:
+                self.attributions_doubles += 1
+            self._entites_affichees[tms_id] = relecteur
+
+    def quitter_entite(self, tms_id, relecteur):
+        with self._verrou:
+            if self._entites_affichees.get(tms_id) == relecteur:
+                del self._entites_affichees[tms_id]
+
+    def compter(self, attribut):
+        with self._verrou:
+            setattr(self, attribut, getattr(self, attribut) + 1)
+
+
+class Relecteur:
+    """
+    Un relecteur simulé : une session HTTP (cookies, jeton CSRF) qui enchaîne les décisions
+    jusqu'à l'échéance ou jusqu'à ce que sa file de validation soit vide.
+    """
+
+    def __init__(self, url_base, email, mot_de_passe, resultats, aleatoire, pause_max, frequence_historique):
+        self.url_base = url_base.rstrip('/')
+        self.email = email
+        self.mot_de_passe = mot_de_passe
+        self.resultats = resultats
+        self.aleatoire = aleatoire
+        self.pause_max = pause_max
+        self.frequence_historique = frequence_historique
+        self.session = requests.Session()
+
+    def _requete(self, methode, route, chemin, **kwargs):
+        """Envoie une requête, enregistre sa durée sous le nom de route et retourne la réponse (None en cas d'erreur réseau)."""
+        debut = time.perf_counter()
+        try:
+            response = self.session.request(methode, self.url_base + chemin, allow_redirects=False, timeout=60, **kwargs)
+        except requests.exceptions.RequestException:
+            self.resultats.enregistrer(route, time.perf_counter() - debut, erreur=True)
+            return None
+        self.resultats.enregistrer(route, time.perf_counter() - debut, erreur=response.status_code >= 400)
+        return response
+
+    def connecter(self):
+        """Se connecte avec le formulaire /connexion. Retourne True si la connexion a réussi."""
+        page = self._requete("GET", "GET /connexion", "/connexion")
+        jeton = lire_jeton_csrf(page.text) if page is not None else None
+        if jeton is None:
+            return False
+        response = self._requete("POST", "POST /connexion", "/connexion", data={
+            'csrf_token': jeton, 'email': self.email, 'password': self.mot_de_passe
+        })
+        return response is not None and response.status_code == 302
+
+    def deconnecter(self):
+        """Se déconnecte pour libérer le bail d'entités du relecteur."""
+        self._requete("GET", "GET /deconnexion", "/deconnexion")
+
+    def relire(self, echeance):
+        """Enchaîne les décisions jusqu'à l'échéance (time.monotonic) ou jusqu'à une file vide."""
+        nb_decisions = 0
+        while time.monotonic() < echeance:
+            page = self._requete("GET", "GET /validation", "/validation")
+            if page is None or page.status_code != 200:
+                continue
+            if MOTIF_ERREUR.search(page.text):
+                # Message d'erreur de la décision précédente (entité déjà traitée, verrou perdu...)
+                self.resultats.compter('decisions_refusees')
+
+            tms_id = MOTIF_TMS_ID.search(page.text)
+            if tms_id is None:
+                self.resultats.compter('files_vides')
+                return
+            tms_id = int(tms_id.group(1))
+            self.resultats.afficher_entite(tms_id, self.email)
+
+            # Cartes des candidats, chargées par la page une fois affichée
+            for url_carte in MOTIF_CARTE.findall(page.text):
+                self._requete("GET", "GET /validation/candidat", url_carte)
+
+            if self.pause_max:
+                time.sleep(self.aleatoire.uniform(0, self.pause_max))
+
+            decision = self.aleatoire.choices(list(POIDS_DECISIONS), weights=list(POIDS_DECISIONS.values()))[0]
+            qids = MOTIF_QID.findall(page.text)
+            if decision == 'valider' and not qids:
+                decision = 'passer'
+            donnees = {'csrf_token': lire_jeton_csrf(page.text)}
+            if decision == 'valider':
+                donnees['candidats_selectionnes'] = [self.aleatoire.choice(qids)]
+
+            self.resultats.quitter_entite(tms_id, self.email)
+            response = self._requete(
+                "POST", f"POST {ROUTES_DECISIONS[decision].split('/{')[0]}",
+                ROUTES_DECISIONS[decision].format(tms_id=tms_id), data=donnees
+            )
+            if response is None or response.status_code != 302:
+                continue
+            self.resultats.compter('nb_decisions')
+            nb_decisions += 1
+
+            if self.frequence_historique and nb_decisions % self.frequence_historique == 0:
+                self._requete("GET", "GET /historique", "/historique")
+
+
+def lire_metriques(url_base, jeton):
+    """
+    Lit (avec le jeton METRIQUES_JETON) les compteurs de sélection dans la file et de contention des verrous exposés par /metrics.
+
+    Returns:
+        dict: nom de la métrique -> somme des valeurs de tous ses labels
+    """
+    noms = ("alignement_selection_file_secondes_total", "alignement_selection_file_total",
+            "alignement_contention_verrous_total", "alignement_requetes_repetees_total")
+    valeurs = dict.fromkeys(noms, 0.0)
+    try:
+        texte = requests.get(url_base.rstrip('/') + "/metrics", headers={'Authorization': f"Bearer {jeton}"}, timeout=10).text
+    except requests.exceptions.RequestException:
+        return valeurs
+    for ligne in texte.splitlines():
+        if ligne.startswith('#') or not ligne.strip():
+            continue
+        nom_labels, _, valeur = ligne.rpartition(' ')
+        nom = nom_labels.split('{')[0]
+        if nom in valeurs:
+            valeurs[nom] += float(valeur)
+    return valeurs
+
+
+def executer_scenario(url_base, nb_relecteurs, mot_de_passe, duree, pause_max, frequence_historique, graine):
+    """
+    Lance nb_relecteurs relecteurs simulés en parallèle pendant duree secondes.
+
+    Returns:
+        dict: Rapport du scénario (débit, latences par route, erreurs, conflits de verrous)
+    """
+    from .donnees import email_relecteur
+
+    resultats = Resultats()
+    relecteurs = [
+        Relecteur(url_base, email_relecteur(numero), mot_de_passe, resultats,
+                  random.Random(graine + numero), pause_max, frequence_historique)
+        for numero in range(1, nb_relecteurs + 1)
+    ]
+    connectes = [relecteur for relecteur in relecteurs if relecteur.connecter()]
+    if len(connectes) < nb_relecteurs:
+        print(f"⚠️ {nb_relecteurs - len(connectes)} relecteur(s) sur {nb_relecteurs} n'ont pas pu se connecter")
+    metriques_avant = lire_metriques(url_base, os.environ['METRIQUES_JETON'])
+
+    debut = time.monotonic()
+    echeance = debut + duree
+    threads = [
+        threading.Thread(target=relecteur.relire, args=(echeance,), name=f"relecteur{numero}")
+        for numero, relecteur in enumerate(connectes, start=1)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duree_reelle = time.monotonic() - debut
+
+    metriques_apres = lire_metriques(url_base, os.environ['METRIQUES_JETON'])
+    for relecteur in connectes:
+        relecteur.deconnecter()
+
+    routes = {}
+    for route, durees in sorted(resultats.durees.items()):
+        durees_triees = sorted(durees)
+        routes[route] = {
+            'requetes': len(durees_triees),
+            'erreurs': resultats.erreurs.get(route, 0),
+            'p50_ms': round(percentile(durees_triees, 50) * 1000, 1),
+            'p95_ms': round(percentile(durees_triees, 95) * 1000, 1),
+            'p99_ms': round(percentile(durees_triees, 99) * 1000, 1),
+            'max_ms': round(durees_triees[-1] * 1000, 1),
+        }
+
+    # Décisions redirigées avec un message d'erreur (entité déjà traitée, verrou perdu...) non comptées
+    nb_decisions = max(0, resultats.nb_decisions - resultats.decisions_refusees)
+    ecart = {nom: metriques_apres[nom] - metriques_avant[nom] for nom in metriques_avant}
+    nb_selections = ecart["alignement_selection_file_total"]
+    return {
+        'relecteurs': nb_relecteurs,
+        'relecteurs_connectes': len(connectes),
+        'duree_secondes': round(duree_reelle, 1),
+        'decisions': nb_decisions,
+        'decisions_par_minute': round(nb_decisions / duree_reelle * 60, 1) if duree_reelle else 0.0,
+        'files_vides': resultats.files_vides,
+        'conflits_verrous': {
+            'attributions_doubles': resultats.attributions_doubles,
+            'decisions_refusees': resultats.decisions_refusees,
+            'verrous_perdus_serveur': int(ecart["alignement_contention_verrous_total"]),
+        },
+        'selection_file_ms_moyenne': round(
+            ecart["alignement_selection_file_secondes_total"] / nb_selections * 1000, 2
+        ) if nb_selections else None,
+        'requetes_sql_repetees': int(ecart["alignement_requetes_repetees_total"]),
+        'routes': routes,
+    }
+
+
+def afficher_rapport(rapport):
+    """Affiche le rapport d'un scénario sous forme de tableau."""
+    conflits = rapport['conflits_verrous']
+    print(f"\n=== {rapport['relecteurs']} relecteur(s) ({rapport['relecteurs_connectes']} connecté(s)), "
+          f"{rapport['duree_secondes']} s ===")
+    print(f"Décisions : {rapport['decisions']} ({rapport['decisions_par_minute']} par minute), "
+          f"files vides : {rapport['files_vides']}")
+    print(f"Conflits de verrous : {conflits['attributions_doubles']} attribution(s) double(s), "
+          f"{conflits['decisions_refusees']} décision(s) refusée(s), "
+          f"{conflits['verrous_perdus_serveur']} verrou(s) perdu(s) (serveur)")
+    if rapport['selection_file_ms_moyenne'] is not None:
+        print(f"Sélection dans la file : {rapport['selection_file_ms_moyenne']} ms en moyenne")
+    if rapport['requetes_sql_repetees']:
+        print(f"Requêtes SQL répétées (N+1 probables) : {rapport['requetes_sql_repetees']}")
+    print(f"{'route':<40} {'requêtes':>9} {'erreurs':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for route, valeurs in rapport['routes'].items():
+        print(f"{route:<40} {valeurs['requetes']:>9} {valeurs['erreurs']:>8} {valeurs['p50_ms']:>9} "
+              f"{valeurs['p95_ms']:>9} {valeurs['p99_ms']:>9} {valeurs['max_ms']:>9}")
+
+
+def verifier_base_dediee(uri_base):
+    """
+    Refuse une base configurée pour l'application (fichier .env ou variables d'environnement) :
+    les tests de charge vident les tables de la base.
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    from dotenv import dotenv_values
+    chemin_env = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
+    configurees = dict(dotenv_values(chemin_env)) if os.path.exists(chemin_env) else {}
+    for variable in ('SQLALCHEMY_DATABASE_URI', 'SQLALCHEMY_BINDS_DONNEES_TMS'):
+        if uri_base in (configurees.get(variable), os.environ.get(variable)):
+            return False, f"La base {variable} de l'application ne peut pas être utilisée pour les tests de charge"
+    return True, "Base dédiée"
+
+
+def configurer_environnement(args, url_sparql):
+    """
+    Fixe les variables d'environnement lues par app/config.py, avant l'import de l'application :
+    base de test (pour les deux binds), point d'accès SPARQL factice, dumps désactivés, jeton aléatoire de /metrics.
+    """
+    os.environ['SQLALCHEMY_DATABASE_URI'] = args.base
+    os.environ['SQLALCHEMY_BINDS_DONNEES_TMS'] = args.base
+    os.environ['SPARQL_ENDPOINT'] = url_sparql
+    os.environ['DOSSIER_DUMPS_CANDIDATS'] = ""
+    os.environ['METRIQUES_JETON'] = secrets.token_urlsafe(16)
+    os.environ.setdefault('SECRET_KEY', secrets.token_hex(16))
+    os.environ.setdefault('ACTIONS_PER_PAGE', "10")
+    os.environ.setdefault('TIMER_INACTIVITE_MINUTES', "15")
+    os.environ.setdefault('PERMANENT_SESSION_LIFETIME_MINUTES', "60")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de la boucle de relecture de l'application d'alignement.")
+    parser.add_argument("--base", required=True,
+                        help="URI d'une base Postgres locale dédiée aux tests de charge (vidée à chaque scénario), "
+                             "avec search_path sur app_alignement")
+    parser.add_argument("--relecteurs", type=int, nargs="+", default=[5, 20, 50],
+                        help="Nombre de relecteurs simultanés de chaque scénario (5 20 50 par défaut)")
+    parser.add_argument("--duree", type=int, default=60, help="Durée de chaque scénario en secondes (60 par défaut)")
+    parser.add_argument("--entites", type=int, default=5000, help="Nombre d'entités TMS générées (5000 par défaut)")
+    parser.add_argument("--candidats", type=int, default=3, help="Nombre de candidats par entité TMS (3 par défaut)")
+    parser.add_argument("--latence-sparql-ms", type=int, nargs=2, default=[50, 200], metavar=("MIN", "MAX"),
+                        help="Latence simulée du point d'accès SPARQL factice (50 200 par défaut, 0 0 pour aucune)")
+    parser.add_argument("--pause-max", type=float, default=0.0,
+                        help="Temps de réflexion maximal d'un relecteur avant sa décision, en secondes (0 par défaut)")
+    parser.add_argument("--historique", type=int, default=10,
+                        help="Consultation de /historique toutes les N décisions (10 par défaut, 0 pour aucune)")
+    parser.add_argument("--port", type=int, default=5055, help="Port de l'application lancée localement (5055 par défaut)")
+    parser.add_argument("--graine", type=int, default=0, help="Graine des données et des décisions aléatoires")
+    parser.add_argument("--sortie", help="Fichier JSON où enregistrer les rapports des scénarios")
+    args = parser.parse_args()
+
+    succes, message = verifier_base_dediee(args.base)
+    if not succes:
+        print(message)
+        sys.exit(1)
+
+    from .sparql_factice import demarrer_sparql_factice
+    serveur_sparql, url_sparql = demarrer_sparql_factice(latence_ms=tuple(args.latence_sparql_ms))
+    configurer_environnement(args, url_sparql)
+
+    from werkzeug.serving import make_server
+    from app.app import app
+    from .donnees import preparer_base, generer_donnees
+
+    mot_de_passe = secrets.token_urlsafe(12)
+    with app.app_context():
+        succes, message = preparer_base()
+        print(message)
+        if not succes:
+            sys.exit(1)
+
+    # Pas de journal par requête : il fausserait les mesures et masquerait le rapport
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    serveur_app = make_server("127.0.0.1", args.port, app, threaded=True)
+    threading.Thread(target=serveur_app.serve_forever, name="application", daemon=True).start()
+    url_base = f"http://127.0.0.1:{args.port}"
+
+    rapports = []
+    try:
+        for nb_relecteurs in args.relecteurs:
+            # Même jeu de données et file complète au début de chaque scénario
+            with app.app_context():
+                succes, message = generer_donnees(args.entites, args.candidats, nb_relecteurs, mot_de_passe, args.graine)
+            print(message)
+            if not succes:
+                sys.exit(1)
+            rapport = executer_scenario(url_base, nb_relecteurs, mot_de_passe, args.duree,
+                                        args.pause_max, args.historique, args.graine)
+            afficher_rapport(rapport)
+            rapports.append(rapport)
+    finally:
+        serveur_app.shutdown()
+        serveur_sparql.shutdown()
+
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as f:
+            json.dump(rapports, f, ensure_ascii=False, indent=2)
+        print(f"\nRapports enregistrés dans {args.sortie}")
+
+
+if __name__ == "__main__":
+    main()
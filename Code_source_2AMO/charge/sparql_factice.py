@@ -0,0 +1,112 @@
+# Module sans dépendance à Flask : point d'accès SPARQL factice utilisé par les tests de charge (charge/simulation.py)
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PREFIXE_ENTITE = 'http://www.wikidata.org/entity/'
+
+# QIDs demandés : clause VALUES ?item { wd:Q1 wd:Q2 ... } des requêtes de utils/requetes_sparql.py
+MOTIF_VALUES = re.compile(r"VALUES\s+\?item\s*\{([^}]*)\}")
+MOTIF_QID = re.compile(r"wd:(Q\d+)")
+
+
+def construire_resultat(qid, type_candidat):
+    """
+    Construit une ligne de résultat SPARQL synthétique, avec les variables des requêtes
+    construire_requete_q5 et construire_requete_autres. Les valeurs dépendent uniquement du QID.
+
+    Args:
+        qid (str): QID du candidat
+        type_candidat (str): 'Q5' pour les personnes, 'autres' sinon
+
+    Returns:
+        dict: Variable -> {"type", "value"} au format application/sparql-results+json
+    """
+    numero = int(qid[1:])
+    valeurs = {
+        'itemLabel': f"Candidat synthétique {numero}",
+        'description': f"entité synthétique générée pour les tests de charge ({qid})",
+        'autresLabels': f"Candidat {numero}; C. synthétique {numero}",
+    }
+    if type_candidat == 'Q5':
+        annee = 1780 + numero % 120
+        valeurs.update({
+            'types': "être humain",
+            'datesNaissance': f"{annee}-0{1 + numero % 9}-1{numero % 10}",
+            'datesMort': f"{annee + 40 + numero % 40}",
+            'lieuxNaissance': ["Paris", "Lyon", "Bruxelles", "Genève"][numero % 4],
+            'lieuxMort': ["Paris", "Marseille", "Londres"][numero % 3],
+            'occupations': "peintre; graveur" if numero % 2 else "sculpteur",
+            'nationalites': "France",
+            'genreLabel': "masculin" if numero % 3 else "féminin",
+            'pereLabel': f"Père du candidat {numero}",
+            'enfants': f"Enfant {numero}-1; Enfant {numero}-2",
+            'eleveDe': f"Maître du candidat {numero}",
+        })
+    else:
+        valeurs.update({
+            'types': "atelier; entreprise",
+            'pays': "France",
+            'sieges': "Paris",
+            'datesFondation': f"{1800 + numero % 100}",
+            'datesDissolution': f"{1900 + numero % 50}",
+            'entitesRemplacees': f"Ancien atelier {numero}",
+        })
+
+    resultat = {'item': {'type': 'uri', 'value': f"{PREFIXE_ENTITE}{qid}"}}
+    for variable, valeur in valeurs.items():
+        resultat[variable] = {'type': 'literal', 'value': valeur}
+    return resultat
+
+
+class GestionnaireSparql(BaseHTTPRequestHandler):
+    """Répond aux requêtes GET ?query=... avec une ligne de résultat synthétique par QID demandé."""
+
+    def do_GET(self):
+        requete = parse_qs(urlsplit(self.path).query).get('query', [''])[0]
+        clause = MOTIF_VALUES.search(requete)
+        qids = MOTIF_QID.findall(clause.group(1)) if clause else []
+        type_candidat = 'Q5' if 'datesNaissance' in requete else 'autres'
+
+        # Latence simulée du point d'accès Wikidata
+        latence_min, latence_max = self.server.latence_ms
+        if latence_max > 0:
+            time.sleep(random.uniform(latence_min, latence_max) / 1000)
+
+        corps = json.dumps({
+            'head': {'vars': []},
+            'results': {'bindings': [construire_resultat(qid, type_candidat) for qid in qids]}
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/sparql-results+json')
+        self.send_header('Content-Length', str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, format, *args):
+        # Pas de journal par requête : il fausserait les mesures
+        pass
+
+
+def demarrer_sparql_factice(hote='127.0.0.1', port=0, latence_ms=(50, 200)):
+    """
+    Lance le point d'accès SPARQL factice dans un thread en arrière-plan.
+
+    Args:
+        hote (str): Adresse d'écoute
+        port (int): Port d'écoute (0 pour un port libre choisi par le système)
+        latence_ms (tuple): Latence minimale et maximale simulée par requête, en millisecondes
+
+    Returns:
+        tuple: (serveur: ThreadingHTTPServer, url: str du point d'accès)
+    """
+    serveur = ThreadingHTTPServer((hote, port), GestionnaireSparql)
+    serveur.daemon_threads = True
+    serveur.latence_ms = latence_ms
+    thread = threading.Thread(target=serveur.serve_forever, name="sparql_factice", daemon=True)
+    thread.start()
+    return serveur, f"http://{hote}:{serveur.server_port}/sparql"
@@ -0,0 +1,5 @@
+-- Priorités précalculées de la file de validation (TableTMS.requete_file_validation)
+-- Après application : flask --app run calculer-priorites
+ALTER TABLE app_alignement.table_tms
+  ADD COLUMN IF NOT EXISTS priorite_max_flag int4 NULL,
+  ADD COLUMN IF NOT EXISTS priorite_moyenne numeric NULL;
@@ -0,0 +1,49 @@
+-- Une ligne par décision (valider, refuser, passer), à laquelle font référence les lignes de l'historique
+CREATE TABLE IF NOT EXISTS app_alignement.decisions (
+  id_decision int8 GENERATED ALWAYS AS IDENTITY( MINVALUE 0 NO MAXVALUE START 0 NO CYCLE) NOT NULL,
+  id_utilisateur int4 NOT NULL,
+  tms_id int4 NOT NULL,
+  type_decision varchar(20) NOT NULL,
+  date_heure_decision timestamp DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  nb_valides int4 DEFAULT 0 NOT NULL,
+  nb_refuses int4 DEFAULT 0 NOT NULL,
+  nb_passes int4 DEFAULT 0 NOT NULL,
+  CONSTRAINT decisions_pkey PRIMARY KEY (id_decision),
+  CONSTRAINT decisions_utilisateur_fk FOREIGN KEY (id_utilisateur) REFERENCES app_alignement.utilisateurs(id_utilisateur) ON DELETE CASCADE,
+  CONSTRAINT decisions_tms_fk FOREIGN KEY (tms_id) REFERENCES app_alignement.table_tms(tms_id)
+);
+
+ALTER TABLE app_alignement.historique
+  ADD COLUMN IF NOT EXISTS id_decision int8 NULL
+  REFERENCES app_alignement.decisions(id_decision) ON DELETE CASCADE;
+
+-- Reprise de l'historique existant : une décision par utilisateur, entité TMS et minute,
+-- les passages étant séparés des validations/refus. Les lignes sans utilisateur ou sans date
+-- (colonnes nullables de historique, obligatoires dans decisions) ne sont pas reprises et gardent id_decision à NULL
+INSERT INTO app_alignement.decisions (id_utilisateur, tms_id, type_decision, date_heure_decision, nb_valides, nb_refuses, nb_passes)
+SELECT h.id_utilisateur,
+  r.tms_id,
+  CASE WHEN h."action" = 'passe' THEN 'passer' WHEN bool_or(h."action" = 'valide') THEN 'valider' ELSE 'refuser' END,
+  min(h.date_heure_action),
+  count(*) FILTER (WHERE h."action" = 'valide'),
+  count(*) FILTER (WHERE h."action" = 'refuse'),
+  count(*) FILTER (WHERE h."action" = 'passe')
+FROM app_alignement.historique h
+JOIN app_alignement.relations_tms_candidats r ON r.id_match = h.id_match
+WHERE h.id_decision IS NULL
+  AND h.id_utilisateur IS NOT NULL
+  AND h.date_heure_action IS NOT NULL
+GROUP BY h.id_utilisateur, r.tms_id, date_trunc('minute', h.date_heure_action), h."action" = 'passe'
+ORDER BY min(h.date_heure_action);
+
+UPDATE app_alignement.historique h
+SET id_decision = d.id_decision
+FROM app_alignement.relations_tms_candidats r, app_alignement.decisions d
+WHERE r.id_match = h.id_match
+  AND d.id_utilisateur = h.id_utilisateur
+  AND d.tms_id = r.tms_id
+  AND date_trunc('minute', d.date_heure_decision) = date_trunc('minute', h.date_heure_action)
+  AND (d.type_decision = 'passer') = (h."action" = 'passe')
+  AND h.id_utilisateur IS NOT NULL
+  AND h.date_heure_action IS NOT NULL
+  AND h.id_decision IS NULL;
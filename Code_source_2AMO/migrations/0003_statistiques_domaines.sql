@@ -0,0 +1,8 @@
+-- Nombre d'entités TMS par domaine et par statut (page /preferences)
+-- Après application : flask --app run reconstruire-statistiques
+CREATE TABLE IF NOT EXISTS app_alignement.statistiques_domaines (
+  domaine text NOT NULL,
+  statut varchar(20) NOT NULL,
+  nb_tms int4 DEFAULT 0 NOT NULL,
+  CONSTRAINT statistiques_domaines_pkey PRIMARY KEY (domaine, statut)
+);
@@ -0,0 +1,30 @@
+-- Index des requêtes principales de l'application (vérification : flask --app run verifier-index)
+
+-- File de validation : entités TMS restant à traiter dans l'ordre de priorité
+CREATE INDEX IF NOT EXISTS table_tms_file_validation_idx
+  ON app_alignement.table_tms (priorite_max_flag DESC, priorite_moyenne DESC, tms_id)
+  WHERE statut_validation IS NULL AND priorite_max_flag IS NOT NULL;
+
+-- Filtre sur les préférences de domaines (opérateur @>)
+CREATE INDEX IF NOT EXISTS table_tms_dossiers_documentation_idx
+  ON app_alignement.table_tms USING gin (dossiers_documentation jsonb_path_ops);
+
+-- Nettoyage des verrous expirés
+CREATE INDEX IF NOT EXISTS table_tms_verrous_idx
+  ON app_alignement.table_tms (date_heure_verrouillage)
+  WHERE date_heure_verrouillage IS NOT NULL;
+
+-- Candidats d'une entité et calcul des priorités
+CREATE INDEX IF NOT EXISTS relations_tms_candidats_tms_id_score_flag_idx
+  ON app_alignement.relations_tms_candidats (tms_id) INCLUDE (score_flag);
+
+-- Historique paginé des décisions d'un utilisateur et actions d'une décision
+CREATE INDEX IF NOT EXISTS decisions_utilisateur_idx
+  ON app_alignement.decisions (id_utilisateur, id_decision DESC);
+CREATE INDEX IF NOT EXISTS historique_decision_idx
+  ON app_alignement.historique (id_decision);
+
+ANALYZE app_alignement.table_tms;
+ANALYZE app_alignement.relations_tms_candidats;
+ANALYZE app_alignement.historique;
+ANALYZE app_alignement.decisions;
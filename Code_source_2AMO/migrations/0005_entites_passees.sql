@@ -0,0 +1,21 @@
+-- Entités TMS passées par chaque utilisateur, exclues de sa file de validation par une anti-jointure
+-- sur la clé primaire (au lieu d'une sous-requête sur l'historique)
+CREATE TABLE IF NOT EXISTS app_alignement.entites_passees (
+  id_utilisateur int4 NOT NULL,
+  tms_id int4 NOT NULL,
+  date_heure_passage timestamp DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  CONSTRAINT entites_passees_pkey PRIMARY KEY (id_utilisateur, tms_id),
+  CONSTRAINT entites_passees_utilisateur_fk FOREIGN KEY (id_utilisateur) REFERENCES app_alignement.utilisateurs(id_utilisateur) ON DELETE CASCADE,
+  CONSTRAINT entites_passees_tms_fk FOREIGN KEY (tms_id) REFERENCES app_alignement.table_tms(tms_id)
+);
+
+-- Reprise des passages enregistrés dans l'historique
+INSERT INTO app_alignement.entites_passees (id_utilisateur, tms_id, date_heure_passage)
+SELECT h.id_utilisateur, r.tms_id, min(h.date_heure_action)
+FROM app_alignement.historique h
+JOIN app_alignement.relations_tms_candidats r ON r.id_match = h.id_match
+WHERE h."action" = 'passe' AND h.id_utilisateur IS NOT NULL
+GROUP BY h.id_utilisateur, r.tms_id
+ON CONFLICT (id_utilisateur, tms_id) DO NOTHING;
+
+ANALYZE app_alignement.entites_passees;
@@ -0,0 +1,4 @@
+-- Entités du bail d'un utilisateur (TableTMS.verrouiller_entite, TableTMS.liberer_bail)
+CREATE INDEX IF NOT EXISTS table_tms_bail_idx
+  ON app_alignement.table_tms (verrouille_par, date_heure_verrouillage)
+  WHERE verrouille_par IS NOT NULL;
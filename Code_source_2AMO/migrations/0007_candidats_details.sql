@@ -0,0 +1,14 @@
+-- Données Wikidata précalculées des candidats (commande remplir-details-candidats),
+-- lues par la page de validation avec les relations de l'entité TMS (jointure sur la clé primaire)
+CREATE TABLE IF NOT EXISTS app_alignement.candidats_details (
+  qid varchar(20) NOT NULL,
+  type_candidat varchar(20) NOT NULL,
+  donnees jsonb NOT NULL,
+  date_mise_a_jour timestamp DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  CONSTRAINT candidats_details_pkey PRIMARY KEY (qid),
+  CONSTRAINT candidats_details_candidat_fk FOREIGN KEY (qid) REFERENCES app_alignement.table_candidats(qid) ON DELETE CASCADE
+);
+
+-- Sélection des données à actualiser
+CREATE INDEX IF NOT EXISTS candidats_details_date_idx
+  ON app_alignement.candidats_details (date_mise_a_jour);
@@ -0,0 +1,79 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Dossier de l'application (import du paquet app), que pytest soit lancé depuis ce dossier ou non
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from charge.sparql_factice import demarrer_sparql_factice
+
+# Base Postgres locale dédiée aux tests (ses tables sont vidées), avec search_path sur app_alignement, par exemple :
+# TEST_SQLALCHEMY_DATABASE_URI="postgresql://postgres@localhost/alignement_tests?options=-csearch_path%3Dapp_alignement"
+# Sans cette variable, les tests qui utilisent la base sont ignorés
+URI_TESTS = os.environ.get("TEST_SQLALCHEMY_DATABASE_URI")
+
+MOT_DE_PASSE = "mot-de-passe-des-tests"
+JETON_METRIQUES = "jeton-des-tests"
+
+# Point d'accès SPARQL factice, sans latence : les tests n'interrogent jamais Wikidata
+serveur_sparql, url_sparql = demarrer_sparql_factice(latence_ms=(0, 0))
+
+# Variables lues par app/config.py à l'import de l'application : les bases du .env ne sont jamais utilisées
+os.environ['SQLALCHEMY_DATABASE_URI'] = URI_TESTS or "postgresql://localhost/base_de_tests_non_configuree"
+os.environ['SQLALCHEMY_BINDS_DONNEES_TMS'] = os.environ['SQLALCHEMY_DATABASE_URI']
+os.environ['SPARQL_ENDPOINT'] = url_sparql
+os.environ['DOSSIER_DUMPS_CANDIDATS'] = ""
+os.environ['METRIQUES_JETON'] = JETON_METRIQUES
+os.environ['BALAYAGE_VERROUS_MINUTES'] = "0"
+os.environ['PRECHARGEMENT_ENTITE_SUIVANTE'] = "False"
+os.environ.setdefault('SECRET_KEY', "cle-des-tests")
+os.environ.setdefault('ACTIONS_PER_PAGE', "10")
+os.environ.setdefault('TIMER_INACTIVITE_MINUTES', "15")
+os.environ.setdefault('PERMANENT_SESSION_LIFETIME_MINUTES', "60")
+
+
+@pytest.fixture(scope="session")
+def application():
+    """Application Flask en mode TESTING (dépassement d'un budget de requêtes SQL = échec), sans CSRF."""
+    from app.app import app
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return app
+
+
+@pytest.fixture(scope="session")
+def base(application):
+    """Base de test : tables des modèles et migrations (ignorée si TEST_SQLALCHEMY_DATABASE_URI n'est pas configurée)."""
+    if not URI_TESTS:
+        pytest.skip("TEST_SQLALCHEMY_DATABASE_URI non configurée (base Postgres de test)")
+    from charge.donnees import preparer_base
+    with application.app_context():
+        succes, message = preparer_base()
+    assert succes, message
+    return application
+
+
+@pytest.fixture
+def donnees(base):
+    """Jeu de données synthétique (30 entités TMS, 3 candidats par entité, 5 relecteurs), régénéré pour chaque test."""
+    from app.app import cache_candidats
+    from charge.donnees import generer_donnees
+    with base.app_context():
+        succes, message = generer_donnees(30, 3, 5, MOT_DE_PASSE)
+    assert succes, message
+    cache_candidats.vider()
+    return base
+
+
+@pytest.fixture
+def connecter(donnees):
+    """Retourne une fonction qui crée un client de test connecté avec le relecteur simulé numero."""
+    from charge.donnees import email_relecteur
+
+    def connecter_relecteur(numero=1):
+        client = donnees.test_client()
+        response = client.post("/connexion", data={'email': email_relecteur(numero), 'password': MOT_DE_PASSE})
+        assert response.status_code == 302, response.get_data(as_text=True)
+        return client
+    return connecter_relecteur
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+import requests
+
+from app.utils.client_http import CircuitOuvertError, ClientHTTP
+
+
+class ReponseFactice:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.headers = {}
+
+    def close(self):
+        pass
+
+
+def client_factice(reponses, **kwargs):
+    """ClientHTTP dont la session renvoie (ou lève) successivement les éléments de reponses."""
+    client = ClientHTTP(max_tentatives=1, attente_base=0, **kwargs)
+    reponses = iter(reponses)
+
+    def request(*args, **kw):
+        reponse = next(reponses)
+        if isinstance(reponse, Exception):
+            raise reponse
+        return reponse
+
+    client.session.request = request
+    return client
+
+
+@pytest.mark.parametrize("erreur", [
+    requests.exceptions.ChunkedEncodingError("réponse tronquée"),
+    requests.exceptions.ContentDecodingError("encodage"),
+    requests.exceptions.TooManyRedirects("redirections"),
+])
+def test_essai_semi_ouvert_en_erreur_libere_le_disjoncteur(erreur):
+    client = client_factice([requests.exceptions.ConnectionError(), erreur, ReponseFactice()],
+                            seuil_echecs=1, delai_reouverture=0.05)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.get("http://exemple.test/sparql")
+    with pytest.raises(CircuitOuvertError):
+        client.get("http://exemple.test/sparql")
+
+    # Requête d'essai en erreur : le disjoncteur se rouvre au lieu de rester bloqué
+    time.sleep(0.06)
+    with pytest.raises(type(erreur)):
+        client.get("http://exemple.test/sparql")
+    assert client.statistiques()["http://exemple.test/sparql"]["etat_disjoncteur"] == 'ouvert'
+
+    time.sleep(0.06)
+    assert client.get("http://exemple.test/sparql").status_code == 200
+    assert client.statistiques()["http://exemple.test/sparql"]["etat_disjoncteur"] == 'ferme'
+
+
+def test_attendre_disjoncteur_reprend_apres_le_delai():
+    client = client_factice([ReponseFactice(429), ReponseFactice(200)],
+                            seuil_echecs=1, delai_reouverture=0.2, attendre_disjoncteur=True)
+    assert client.get("http://exemple.test/api").status_code == 429
+
+    debut = time.monotonic()
+    assert client.get("http://exemple.test/api").status_code == 200
+    assert time.monotonic() - debut >= 0.15
@@ -0,0 +1,71 @@
+import re
+
+import pytest
+from flask import Response, g
+from sqlalchemy import text
+
+from app.app import db
+from app.utils.compteur_requetes import BudgetRequetesDepasse, compter_requetes
+
+
+def nb_requetes(response):
+    return int(response.headers['X-Requetes-SQL'])
+
+
+def test_compter_requetes_signale_les_requetes_repetees(base):
+    with base.app_context():
+        with compter_requetes() as comptage:
+            for tms_id in range(6):
+                db.session.execute(text("SELECT tms_id FROM table_tms WHERE tms_id = :tms_id"), {'tms_id': tms_id})
+            db.session.execute(text("SELECT 1"))
+        db.session.rollback()
+
+    assert comptage.nombre == 7
+    assert comptage.duree > 0
+    assert list(comptage.repetees(5).values()) == [6]
+    assert comptage.repetees(7) == {}
+
+
+def test_budget_depasse_en_mode_testing(base):
+    with base.test_request_context("/validation"):
+        g.budget_requetes_sql = 1
+        db.session.execute(text("SELECT 1"))
+        db.session.execute(text("SELECT 2"))
+        with pytest.raises(BudgetRequetesDepasse):
+            base.process_response(Response())
+        db.session.rollback()
+
+
+def test_budgets_des_routes_de_validation(connecter):
+    client = connecter()
+
+    # En mode TESTING, un dépassement de budget lève BudgetRequetesDepasse pendant la requête
+    page = client.get("/validation")
+    assert page.status_code == 200
+    assert nb_requetes(page) <= 10
+    html = page.get_data(as_text=True)
+
+    for url_carte in re.findall(r'data-url="([^"]+)"', html):
+        carte = client.get(url_carte)
+        assert carte.status_code == 200
+        assert nb_requetes(carte) <= 5
+
+    tms_id = re.search(r'/validation/passer/(\d+)', html).group(1)
+    verrou = client.post("/validation/verrou", data={'tms_id': tms_id})
+    assert verrou.status_code == 200
+    assert nb_requetes(verrou) <= 3
+
+    qid = re.search(r'name="candidats_selectionnes"\s+value="([^"]+)"', html).group(1)
+    decision = client.post(f"/validation/valider/{tms_id}", data={'candidats_selectionnes': [qid]})
+    assert decision.status_code == 302
+    assert nb_requetes(decision) <= 8
+
+    tms_id = re.search(r'/validation/passer/(\d+)', client.get("/validation").get_data(as_text=True)).group(1)
+    decision = client.post(f"/validation/refuser-tous-candidats/{tms_id}")
+    assert decision.status_code == 302
+    assert nb_requetes(decision) <= 8
+
+    tms_id = re.search(r'/validation/passer/(\d+)', client.get("/validation").get_data(as_text=True)).group(1)
+    decision = client.post(f"/validation/passer/{tms_id}")
+    assert decision.status_code == 302
+    assert nb_requetes(decision) <= 8
@@ -0,0 +1,66 @@
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.app import db
+from app.models.base_principale import TableTMS, Utilisateurs
+
+
+def relire_en_parallele(application, ids_utilisateurs, taille_bail):
+    """
+    Fait verrouiller des entités par plusieurs relecteurs en parallèle (une session, donc une connexion,
+    par thread) jusqu'à épuisement de la file. Chaque entité servie est aussitôt traitée (statut "aligne").
+
+    Returns:
+        list: (id_utilisateur, tms_id) de chaque entité servie
+    """
+    depart = threading.Barrier(len(ids_utilisateurs))
+    servies = []
+    erreurs = []
+    verrou = threading.Lock()
+
+    def relecteur(id_utilisateur):
+        try:
+            with application.app_context():
+                depart.wait()
+                while True:
+                    maintenant = datetime.now()
+                    entite = TableTMS.verrouiller_entite(
+                        id_utilisateur, ['tous'], maintenant - timedelta(minutes=15), maintenant, taille_bail
+                    )
+                    if entite is None:
+                        return
+                    assert entite.verrouille_par == id_utilisateur
+                    with verrou:
+                        servies.append((id_utilisateur, entite.tms_id))
+                    db.session.execute(update(TableTMS).where(
+                        TableTMS.tms_id == entite.tms_id
+                    ).values(statut_validation='aligne'))
+                    db.session.commit()
+        except Exception as e:
+            erreurs.append(e)
+
+    threads = [threading.Thread(target=relecteur, args=(id_utilisateur,)) for id_utilisateur in ids_utilisateurs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    assert not erreurs, erreurs
+    return servies
+
+
+@pytest.mark.parametrize("taille_bail", [1, 5])
+def test_aucune_entite_attribuee_a_deux_relecteurs(donnees, taille_bail):
+    with donnees.app_context():
+        ids_utilisateurs = [utilisateur.id_utilisateur for utilisateur in Utilisateurs.query.all()]
+        nb_entites = TableTMS.query.count()
+
+    servies = relire_en_parallele(donnees, ids_utilisateurs, taille_bail)
+
+    # Chaque entité de la file est servie une seule fois, à un seul relecteur
+    attributions = Counter(tms_id for _, tms_id in servies)
+    assert [tms_id for tms_id, nb in attributions.items() if nb > 1] == []
+    assert len(attributions) == nb_entites
@@ -0,0 +1,28 @@
+from sqlalchemy import insert
+
+from app.app import db
+from app.models.base_principale import Decisions, TableTMS, Utilisateurs
+from app.routes.generales import PLAFOND_TOTAL_HISTORIQUE
+from charge.donnees import email_relecteur
+
+
+def ajouter_decisions(application, numero, nb_decisions):
+    """Ajoute nb_decisions décisions "passer" au relecteur simulé numero."""
+    with application.app_context():
+        id_utilisateur = db.session.query(Utilisateurs.id_utilisateur).filter_by(email=email_relecteur(numero)).scalar()
+        tms_id = db.session.query(TableTMS.tms_id).order_by(TableTMS.tms_id).limit(1).scalar()
+        db.session.execute(insert(Decisions), [
+            {'id_utilisateur': id_utilisateur, 'tms_id': tms_id, 'type_decision': "passer"}
+            for _ in range(nb_decisions)
+        ])
+        db.session.commit()
+
+
+def test_total_de_l_historique(connecter):
+    client = connecter()
+    ajouter_decisions(client.application, 1, PLAFOND_TOTAL_HISTORIQUE)
+    assert f"Total des actions : {PLAFOND_TOTAL_HISTORIQUE}\n" in client.get("/historique").get_data(as_text=True)
+
+    # Au-delà du plafond, le total n'est plus compté exactement
+    ajouter_decisions(client.application, 1, 1)
+    assert f"Total des actions : {PLAFOND_TOTAL_HISTORIQUE}+" in client.get("/historique").get_data(as_text=True)
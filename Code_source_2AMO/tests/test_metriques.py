@@ -0,0 +1,16 @@
+from conftest import JETON_METRIQUES
+
+
+def test_metrics_desactivee_sans_jeton(application, monkeypatch):
+    monkeypatch.setitem(application.config, 'METRIQUES_JETON', None)
+    assert application.test_client().get("/metrics").status_code == 404
+
+
+def test_metrics_exige_le_jeton(application):
+    client = application.test_client()
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={'Authorization': "Bearer autre"}).status_code == 401
+
+    response = client.get("/metrics", headers={'Authorization': f"Bearer {JETON_METRIQUES}"})
+    assert response.status_code == 200
+    assert "alignement_requete_duree_secondes" in response.get_data(as_text=True)
@@ -0,0 +1,102 @@
+import re
+
+from app.app import cache_candidats, db
+from app.models.base_principale import RelationsTMSCandidats, TableCandidats, TableTMS
+from app.models.donnees_PRA import Constituent
+from app.utils.requetes_sparql import client_wikidata
+
+
+def entite_affichee(client, url="/validation"):
+    return int(re.search(r'/validation/passer/(\d+)', client.get(url).get_data(as_text=True)).group(1))
+
+
+def requetes_page_validation(client, tms_id):
+    """Nombre de requêtes SQL de la page de validation d'une entité TMS et de chacune de ses cartes de candidats."""
+    page = client.get(f"/validation?tms_id={tms_id}")
+    assert page.status_code == 200
+    cartes = [client.get(url) for url in re.findall(r'data-url="([^"]+)"', page.get_data(as_text=True))]
+    assert cartes and all(carte.status_code == 200 for carte in cartes)
+    return int(page.headers['X-Requetes-SQL']), [int(carte.headers['X-Requetes-SQL']) for carte in cartes]
+
+
+def donner_autres_labels(application, tms_id, labels_entite, labels_candidats):
+    """Remplace les autres labels de l'entité TMS (en base) et ceux de ses candidats (données Wikidata en cache)."""
+    with application.app_context():
+        constituant = db.session.query(Constituent).filter_by(constituentid=tms_id).one()
+        constituant.autres_labels = {'variante': labels_entite}
+        db.session.commit()
+        candidats = db.session.query(TableCandidats.qid, TableCandidats.type_candidat).join(
+            RelationsTMSCandidats, RelationsTMSCandidats.qid == TableCandidats.qid
+        ).filter(RelationsTMSCandidats.tms_id == tms_id).all()
+
+    for qid, type_candidat in candidats:
+        type_candidat = 'Q5' if type_candidat == 'Q5' else 'autres'
+        candidat_raw = dict(cache_candidats.get(qid, type_candidat))
+        candidat_raw['autresLabels'] = "; ".join(labels_candidats)
+        cache_candidats.set(qid, type_candidat, candidat_raw)
+
+
+def test_nombre_de_requetes_independant_du_nombre_de_labels(connecter):
+    client = connecter()
+    tms_id = entite_affichee(client)
+    requetes_avant = requetes_page_validation(client, tms_id)
+
+    # 60 autres labels pour l'entité TMS et 30 pour chacun de ses candidats, dont 10 en commun
+    labels_communs = [f"Label commun {numero}" for numero in range(10)]
+    donner_autres_labels(
+        client.application, tms_id,
+        [f"Variante {numero}" for numero in range(50)] + labels_communs,
+        [f"Autre label {numero}" for numero in range(20)] + labels_communs
+    )
+
+    assert requetes_page_validation(client, tms_id) == requetes_avant
+
+
+def requetes_sparql():
+    return sum(compteurs['requetes'] for compteurs in client_wikidata.statistiques().values())
+
+
+def test_une_requete_sparql_par_type_pour_les_cartes_des_candidats(connecter):
+    client = connecter()
+    cache_candidats.vider()
+    requetes_avant = requetes_sparql()
+
+    page = client.get("/validation")
+    urls_cartes = re.findall(r'data-url="([^"]+)"', page.get_data(as_text=True))
+    assert len(urls_cartes) > 1
+    assert all(client.get(url).status_code == 200 for url in urls_cartes)
+
+    # Récupération groupée à l'affichage de la page : au plus une requête par type (Q5 et autres)
+    assert requetes_sparql() - requetes_avant <= 2
+
+
+def test_maintien_du_verrou_de_l_entite_affichee_par_son_identifiant(connecter):
+    client = connecter()
+    tms_id = entite_affichee(client)
+
+    # Entité libre affichée par son identifiant (par exemple après une annulation) : elle est verrouillée pour l'utilisateur
+    with client.application.app_context():
+        tms_id_libre = db.session.query(TableTMS.tms_id).filter(
+            TableTMS.verrouille_par.is_(None), TableTMS.tms_id != tms_id
+        ).order_by(TableTMS.tms_id).limit(1).scalar()
+    assert entite_affichee(client, f"/validation?tms_id={tms_id_libre}") == tms_id_libre
+
+    etat = client.post("/validation/verrou", data={'tms_id': tms_id_libre}).get_json()
+    assert etat['verrouille'] is True
+    with client.application.app_context():
+        assert db.session.get(TableTMS, tms_id_libre).verrouille_par is not None
+
+
+def test_maintien_du_verrou_d_une_entite_du_bail_d_un_autre_utilisateur(connecter):
+    client, autre_client = connecter(1), connecter(2)
+    entite_affichee(client)
+    tms_id_autre = entite_affichee(autre_client)
+
+    # L'utilisateur a un bail, mais l'entité affichée est verrouillée par un autre utilisateur
+    etat = client.post("/validation/verrou", data={'tms_id': tms_id_autre}).get_json()
+    assert etat == {'verrouille': False, 'secondes_restantes': 0}
+    assert autre_client.post("/validation/verrou", data={'tms_id': tms_id_autre}).get_json()['verrouille'] is True
+
+
+def test_maintien_du_verrou_sans_entite_affichee(connecter):
+    assert connecter().post("/validation/verrou").status_code == 400
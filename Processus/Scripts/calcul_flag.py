@@ -594,6 +594,38 @@ def calcul_flag(table_tms, table_evenement_tms, table_candidats, table_evenement
     print("Calcul des flags terminé\n")
     return table_relation_tms_candidats
 
+def calcul_priorites(table_tms, table_relation_tms_candidats):
+    """
+    Calcule les priorités de la file de validation de chaque entité TMS à partir des score_flag de ses candidats
+    (mêmes règles que TableTMS.calculer_priorites dans l'application)
+    
+    Args:
+        table_tms: DataFrame des entités TMS
+        table_relation_tms_candidats: DataFrame des relations TMS-Candidats avec les scores calculés
+        
+    Returns:
+        DataFrame: Table TMS avec les colonnes priorite_max_flag et priorite_moyenne
+    """
+    tms_col_relations = get_column_case_insensitive(table_relation_tms_candidats, 'TMS_ID')
+    tms_col = get_column_case_insensitive(table_tms, 'TMS_ID')
+    flags = table_relation_tms_candidats[[tms_col_relations, "score_flag"]].copy()
+    
+    # score_flag maximal entre -5 et 5 (les valeurs d'erreur -999 sont ignorées)
+    flags["flag_valide"] = flags["score_flag"].where(flags["score_flag"].between(-5, 5))
+    groupes = flags.groupby(tms_col_relations)
+    priorites = pd.DataFrame({
+        "priorite_max_flag": groupes["flag_valide"].max(),
+        # Somme des score_flag divisée par le nombre de candidats de l'entité
+        "priorite_moyenne": groupes["score_flag"].sum() / groupes.size()
+    })
+    
+    table_tms = table_tms.drop(columns=["priorite_max_flag", "priorite_moyenne"], errors="ignore")
+    table_tms = table_tms.merge(priorites, how="left", left_on=tms_col, right_index=True)
+    table_tms["priorite_max_flag"] = table_tms["priorite_max_flag"].astype("Int64")
+    
+    print("Calcul des priorités terminé\n")
+    return table_tms
+
 ### Programme principal
 if __name__ == "__main__":
     # Validation des fichiers CSV
@@ -637,6 +669,12 @@ if __name__ == "__main__":
     output_file = "table_relation_tms_candidats_with_flags.csv"
     table_relation_tms_candidats.to_csv(output_file, index=False)
     print(f"Résultats sauvegardés dans {output_file}")
+    
+    # Calcul des priorités de la file de validation (le fichier d'entrée table_TMS.csv n'est pas modifié)
+    table_tms = calcul_priorites(table_tms, table_relation_tms_candidats)
+    output_file_tms = "table_TMS_with_priorites.csv"
+    table_tms.to_csv(output_file_tms, index=False)
+    print(f"Priorités sauvegardées dans {output_file_tms}")
 
 # ### Programme principal
 # if __name__ == "__main__":
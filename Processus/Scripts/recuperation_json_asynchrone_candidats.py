@@ -1,27 +1,32 @@
-import requests
 import pandas as pd
 import re
+import sys
 import time
 from pathlib import Path
 import json
 import warnings
-import urllib3
 import shutil
 
+# Client HTTP partagé avec l'application (Code_source_2AMO/app/utils/client_http.py)
+sys.path.append(str(Path(__file__).resolve().parents[2] / "Code_source_2AMO"))
+from app.utils.client_http import ClientHTTP
+
 # Désactivation des avertissements
 warnings.filterwarnings('ignore', category=FutureWarning)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 CSV_FILE = 'alignements_sans_error_complet.csv'
 CACHE_FILE = 'wikidata_cache_asynchrone.json'
 CACHE_BACKUP_FILE = 'wikidata_cache_asynchrone.json.bak'
+ERREURS_FILE = 'qids_en_erreur_asynchrone.json'  # QIDs non récupérés lors du dernier lancement
 DUMP_DIR = Path('json_full_dump_entites')
 DUMP_DIR.mkdir(exist_ok=True)
 REQUEST_DELAY = 0  # Réduit à 0 pour désactiver le délai
 last_request_time = 0
 
-# Utilisation d'une session HTTP pour optimiser les connexions
-session = requests.Session()
+# Client HTTP partagé : connexions persistantes, nouvelles tentatives (429/503 avec Retry-After) et disjoncteur.
+# Le script attend la réouverture du disjoncteur au lieu d'abandonner les QIDs restants
+client = ClientHTTP(verify=False, max_tentatives=5, attente_base=10.0, attente_max=120.0, attendre_disjoncteur=True)
+qids_en_erreur = []
 
 # Chargement du cache existant (liste de QID déjà traités)
 if Path(CACHE_FILE).exists():
@@ -69,15 +74,13 @@ def get_entity_data(qid):
         time.sleep(REQUEST_DELAY - elapsed)
 
     try:
-        response = session.get(entity_url, timeout=30, verify=False)
+        # Les réponses 429 sont retentées par le client (Retry-After ou attente exponentielle)
+        response = client.get(entity_url, timeout=30)
         last_request_time = time.time()
 
-        if response.status_code == 429:
-            print(f"Trop de requêtes pour {qid}, pause de 10s...")
-            time.sleep(10)
-            return get_entity_data(qid)
         if response.status_code != 200:
             print(f"Erreur HTTP {response.status_code} pour {qid}")
+            qids_en_erreur.append(qid)
             return None
 
         data = response.json()
@@ -96,6 +99,7 @@ def get_entity_data(qid):
 
     except Exception as e:
         print(f"Erreur lors de la requête pour {qid}: {str(e)}")
+        qids_en_erreur.append(qid)
         return None
 
 def extract_candidates(candidate_str):
@@ -155,3 +159,9 @@ for idx, (_, row) in enumerate(df_candidats.iterrows(), start=1):
     print(f"\rProgression : {progress}% ({idx}/{len(df_candidats)})", end='', flush=True)
 
 print("\n✅ Récupération terminée.")
+# Les QIDs en erreur ne sont pas ajoutés au cache : ils sont repris au prochain lancement
+with open(ERREURS_FILE, 'w', encoding='utf-8') as f:
+    json.dump(sorted(set(qids_en_erreur)), f, ensure_ascii=False, indent=2)
+if qids_en_erreur:
+    print(f"⚠️ {len(set(qids_en_erreur))} QID(s) non récupéré(s), listés dans {ERREURS_FILE} et repris au prochain lancement")
+print(f"Appels HTTP : {client.statistiques()}")
@@ -1,15 +1,16 @@
 import csv
 import json
 import re
+import sys
 import time
 import os
-import urllib3
-import requests
 from itertools import islice
 from datetime import datetime
+from pathlib import Path
 
-# Désactiver les warnings SSL
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# Client HTTP partagé avec l'application (Code_source_2AMO/app/utils/client_http.py)
+sys.path.append(str(Path(__file__).resolve().parents[2] / "Code_source_2AMO"))
+from app.utils.client_http import ClientHTTP
 
 SPARQL_ENDPOINT = "https://query.wikidata.org/sparql"
 CSV_PATH = "alignements_sans_error_complet.csv"
@@ -18,6 +19,10 @@ DUMP_DIR = "dumps_sparql_lieux_avec_rangs"
 BATCH_SIZE = 50
 HEADERS = {"Accept": "application/sparql-results+json"}
 
+# Connexions persistantes, nouvelles tentatives (429/503 avec Retry-After) et disjoncteur.
+# Le script attend la réouverture du disjoncteur au lieu d'abandonner les lots restants
+client = ClientHTTP(headers=HEADERS, verify=False, max_tentatives=5, attente_max=120.0, timeout=120, attendre_disjoncteur=True)
+
 def extract_qids_from_csv(csv_path):
     qids = set()
     with open(csv_path, newline='', encoding='utf-8') as f:
@@ -79,7 +84,7 @@ def save_cache(success_qids):
         json.dump(sorted(success_qids), f, ensure_ascii=False, indent=2)
 
 def run_sparql_query(query):
-    response = requests.get(SPARQL_ENDPOINT, params={"query": query}, headers=HEADERS, verify=False)
+    response = client.get(SPARQL_ENDPOINT, params={"query": query})
     response.raise_for_status()
     return response.json()
 
@@ -92,6 +97,7 @@ def main():
     print(f"Total QIDs to process: {len(remaining_qids)}")
 
     batch_number = 0
+    batchs_en_erreur = []
     for batch in chunked_iterable(remaining_qids, BATCH_SIZE):
         batch_number += 1
         print(f"Processing batch {batch_number}: {len(batch)} QIDs...")
@@ -110,8 +116,14 @@ def main():
 
         except Exception as e:
             print(f"Erreur lors du traitement du batch {batch_number}: {e}")
+            batchs_en_erreur.append(batch_number)
 
         time.sleep(5)  # Pause de 5 secondes entre les requêtes
 
+    if batchs_en_erreur:
+        # Les QIDs des batchs en erreur ne sont pas ajoutés au cache : ils sont repris au prochain lancement
+        print(f"⚠️ {len(batchs_en_erreur)} batch(s) en erreur ({', '.join(map(str, batchs_en_erreur))}), repris au prochain lancement")
+    print(f"Appels HTTP : {client.statistiques()}")
+
 if __name__ == "__main__":
     main()
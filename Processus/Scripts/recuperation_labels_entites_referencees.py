@@ -0,0 +1,165 @@
+import json
+import os
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+
+# Client HTTP partagé avec l'application (Code_source_2AMO/app/utils/client_http.py)
+sys.path.append(str(Path(__file__).resolve().parents[2] / "Code_source_2AMO"))
+from app.utils.client_http import ClientHTTP
+
+API_ENDPOINT = "https://www.wikidata.org/w/api.php"
+DUMP_DIR = "json_full_dump_entites"
+LABELS_PATH = "labels_entites_referencees.json"
+BATCH_SIZE = 50
+LANGUES = ["fr", "mul", "en"]
+HEADERS = {"User-Agent": "2AMO/0.1 (https://www.musee-orsay.fr/; benoit.deshayes@musee-orsay.fr)"}
+
+# Connexions persistantes, nouvelles tentatives (429/503 avec Retry-After) et disjoncteur.
+# Le script attend la réouverture du disjoncteur au lieu d'abandonner les lots restants
+client = ClientHTTP(headers=HEADERS, verify=False, max_tentatives=5, attente_max=60.0, attendre_disjoncteur=True)
+
+# Propriétés affichées dans l'interface de validation dont les valeurs sont des entités Wikidata
+PROPRIETES = [
+    "P21",    # genre
+    "P31",    # nature de l'élément
+    "P19",    # lieu de naissance
+    "P20",    # lieu de mort
+    "P106",   # occupation
+    "P27",    # nationalité
+    "P22",    # père
+    "P25",    # mère
+    "P3373",  # frère ou soeur
+    "P40",    # enfant
+    "P26",    # conjoint
+    "P802",   # élève
+    "P1066",  # élève de
+    "P1365",  # remplace
+    "P1366",  # remplacé par
+    "P17",    # pays
+    "P159",   # siège
+]
+
+def extraire_qids_references(dossier_json):
+    """
+    Parcourt les dumps JSON des candidats et récupère les QIDs des entités
+    référencées par les propriétés affichées dans l'interface de validation.
+
+    Args:
+        dossier_json (str): Chemin du dossier des dumps JSON des candidats
+
+    Returns:
+        set: QIDs référencés
+    """
+    qids = set()
+    fichiers = [f for f in os.listdir(dossier_json) if f.endswith('.json')]
+    total = len(fichiers)
+
+    for i, fichier in enumerate(fichiers, 1):
+        chemin_fichier = os.path.join(dossier_json, fichier)
+        try:
+            with open(chemin_fichier, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            if 'entities' in data and data['entities']:
+                claims = next(iter(data['entities'].values())).get('claims', {})
+            else:
+                claims = data.get('claims', {})
+
+            for propriete in PROPRIETES:
+                for claim in claims.get(propriete, []):
+                    valeur = claim.get('mainsnak', {}).get('datavalue', {}).get('value')
+                    if isinstance(valeur, dict) and valeur.get('id'):
+                        qids.add(valeur['id'])
+
+        except Exception as e:
+            print(f"Erreur avec le fichier {fichier} : {e}")
+            continue
+
+        progress = (i / total) * 100
+        print(f"Progression : {progress:.1f}% ({i}/{total})", end='\r')
+
+    print()
+    return qids
+
+def chunked_iterable(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            break
+        yield chunk
+
+def load_labels():
+    try:
+        with open(LABELS_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_labels(labels):
+    with open(LABELS_PATH, "w", encoding="utf-8") as f:
+        json.dump(labels, f, ensure_ascii=False, indent=2)
+
+def recuperer_labels(qids):
+    """
+    Récupère les labels (fr, mul, en) d'un lot de QIDs via l'API wbgetentities.
+
+    Args:
+        qids (list): QIDs du lot (50 au maximum)
+
+    Returns:
+        dict: {QID: {langue: label}}
+    """
+    response = client.get(
+        API_ENDPOINT,
+        params={
+            "action": "wbgetentities",
+            "ids": "|".join(qids),
+            "props": "labels",
+            "languages": "|".join(LANGUES),
+            "format": "json"
+        },
+        timeout=30
+    )
+    response.raise_for_status()
+
+    labels = {}
+    for qid, entite in response.json().get('entities', {}).items():
+        labels[qid] = {
+            langue: valeur.get('value')
+            for langue, valeur in entite.get('labels', {}).items()
+        }
+    return labels
+
+def main():
+    qids_references = extraire_qids_references(DUMP_DIR)
+    labels = load_labels()
+    remaining_qids = sorted(qid for qid in qids_references if qid not in labels)
+
+    print(f"Total QIDs référencés : {len(qids_references)}, à récupérer : {len(remaining_qids)}")
+
+    batch_number = 0
+    qids_en_erreur = []
+    for batch in chunked_iterable(remaining_qids, BATCH_SIZE):
+        batch_number += 1
+        print(f"Traitement du lot {batch_number} : {len(batch)} QIDs...")
+
+        try:
+            labels.update(recuperer_labels(batch))
+            save_labels(labels)
+        except Exception as e:
+            print(f"Erreur lors du traitement du lot {batch_number}: {e}")
+            qids_en_erreur.extend(batch)
+
+        time.sleep(1)  # Pause d'une seconde entre les requêtes
+
+    print("✅ Récupération des labels terminée.")
+    if qids_en_erreur:
+        # Les QIDs sans label enregistré sont repris au prochain lancement
+        print(f"⚠️ {len(qids_en_erreur)} QID(s) sans label, repris au prochain lancement : {', '.join(qids_en_erreur)}")
+    print(f"Appels HTTP : {client.statistiques()}")
+
+if __name__ == "__main__":
+    main()